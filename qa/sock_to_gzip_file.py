@@ -1,57 +1,867 @@
-#!/usr/bin/python
-#I love the python Power Glove. It's so bad!
-#Usage: sudo -u suricata ./sock_to_gzip_file.py --output-file="http.log.gz" --listen-sock="http.log.sock"
+#! /usr/bin/env python3
+#
+# Archive Suricata eve output received on a unix socket into compressed files.
+#
+# Usage:
+#   sudo -u suricata ./sock_to_gzip_file.py --output-file=eve.json.gz --listen-sock=eve.sock
+#
+# With suricata.yaml:
+#   outputs:
+#     - eve-log:
+#         filetype: unix_stream
+#         filename: /path/to/eve.sock
+#
+# or, with --socket-type=dgram, filetype: unix_dgram.
+#
+# Several connections can be served at once, and the sink keeps accepting
+# new ones when Suricata restarts and reconnects; the socket is bound again
+# if its path is removed. In datagram mode each datagram is one event, and
+# datagrams are drained in batches before being handed over.
+#
+# Incoming data is cut on line boundaries into blocks of --block-size bytes.
+# Blocks wait in a spill buffer of at most --spill-size bytes, so that a
+# burst does not stall the readers; once it is full, readers stop reading
+# and the backpressure reaches Suricata. Each block is compressed on a worker
+# thread as an independent gzip member (or zstd frame) and the members are
+# written in order. The concatenation is a valid gzip (zstd) file, and member
+# boundaries allow seeking into the archive.
+#
+# With {event_type} in --output-file, the stream is split per event type:
+#   --output-file=/var/log/archive/eve.{event_type}.json.gz
+# writes eve.alert.json.gz, eve.flow.json.gz, ... each with its own blocks,
+# rotation (--type-rotate-size/--type-rotate-interval) and thus retention.
+# The type is found with a byte search in each line, the JSON is not decoded.
+#
+# --fanout-sock copies the incoming stream to another unix stream socket, so
+# that one Suricata output feeds both the archive and a live consumer. The
+# copy never slows the archive down: it is dropped while the consumer is
+# away or falls more than --fanout-buffer behind.
+#
+# zstd output requires the zstandard module.
 
-import socket,os
-import gzip
+import argparse
+import os
+import queue
+import re
+import select
+import signal
+import socket
 import sys
-from optparse import OptionParser
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-if __name__ == "__main__":
-    parser = OptionParser()
-    #Path to the socket
-    parser.add_option("--listen-sock", dest="lsock", type="string", help="Path to the socket we will listen on.")
-    #Path to gzip file we will write
-    parser.add_option("--output-file", dest="output", type="string", help="Path to file name to output gzip file we will write to.")
-
-    #parse the opts
-    (options, args) = parser.parse_args()
-
-    options.usage = "example: sudo -u suricata ./sock_to_gzip_file.py --output-file=\"http.log.gz\" --listen-sock=\"http.log.sock\"\n"
-    #Open the output file
-    if options.output:
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_RECV_SIZE = 4 * 1024 * 1024
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_SPILL_SIZE = 256 * 1024 * 1024
+# Larger datagrams are truncated by the kernel and dropped.
+DEFAULT_MAX_DATAGRAM = 256 * 1024
+# Datagrams read per batch, at most.
+DGRAM_BATCH = 1024
+DEFAULT_FANOUT_BUFFER = 64 * 1024 * 1024
+
+# Routing: lines without a usable event_type, types left out by --types and
+# types beyond MAX_ROUTES go to OTHER_TYPE.
+TYPE_FIELD = b'"event_type":'
+TYPE_PLACEHOLDER = "{event_type}"
+OTHER_TYPE = "other"
+MAX_ROUTES = 64
+# A longer line is dropped and counted: written out in pieces it would be
+# invalid JSON, and routed by pieces its continuation would land in "other".
+MAX_LINE_SIZE = 64 * 1024 * 1024
+# On shutdown, readers keep reading what is already buffered until the
+# connection is idle for READ_TIMEOUT, or for at most DRAIN_TIMEOUT.
+READ_TIMEOUT = 0.5
+DRAIN_TIMEOUT = 5.0
+# How often the accept loop checks the socket path and the stop flag.
+ACCEPT_TIMEOUT = 1.0
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+TYPE_NAME = re.compile(r"^[a-z0-9_]{1,32}$")
+
+# Queued by the flusher so that the writer checks time-based rotation.
+TICK = object()
+
+
+def errprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def parse_size(value):
+    """Parse a byte size such as 512k, 100M or 2G."""
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def parse_duration(value):
+    """Parse a duration such as 30s, 15m, 1h or 1d."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def parse_type_values(values, parse):
+    """Parse repeated TYPE=VALUE options into a dict."""
+    result = {}
+    for item in values or []:
+        name, sep, value = item.partition("=")
+        if not sep or not TYPE_NAME.match(name):
+            raise ValueError("expected TYPE=VALUE, got {!r}".format(item))
+        result[name] = parse(value)
+    return result
+
+
+def event_type_of(line):
+    """Return the event_type of an eve line as bytes (None if absent), without decoding the JSON."""
+    start = line.find(TYPE_FIELD)
+    if start < 0:
+        return None
+    start += len(TYPE_FIELD)
+    if line[start:start + 1] == b" ":
+        start += 1
+    if line[start:start + 1] != b'"':
+        return None
+    end = line.find(b'"', start + 1)
+    if end < 0:
+        return None
+    return line[start + 1:end]
+
+
+def make_compressor(compression, level):
+    """Return a function compressing one block into a standalone member/frame."""
+    if compression == "gzip":
+        def compress(data):
+            compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            return compressor.compress(data) + compressor.flush()
+        return compress
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard module")
+        local = threading.local()
+
+        def compress(data):
+            # ZstdCompressor objects are not thread safe: one per worker.
+            compressor = getattr(local, "compressor", None)
+            if compressor is None:
+                compressor = local.compressor = zstandard.ZstdCompressor(level=level)
+            return compressor.compress(data)
+        return compress
+    return bytes
+
+
+class Stats:
+    """Counters shared by the reader, compression and writer threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes_in = 0
+        self.lines_in = 0
+        self.bytes_out = 0
+        self.blocks = 0
+        self.connections = 0
+        self.total_connections = 0
+        self.files = 0
+        self.datagrams = 0
+        self.truncated = 0
+        self.overlong = 0
+        self.stalls = 0
+        self.spill_peak = 0
+
+    def add_input(self, data):
+        with self.lock:
+            self.bytes_in += len(data)
+            self.lines_in += data.count(b"\n")
+
+    def add_output(self, size):
+        with self.lock:
+            self.bytes_out += size
+            self.blocks += 1
+
+    def snapshot(self):
+        with self.lock:
+            return (self.bytes_in, self.lines_in, self.bytes_out, self.blocks,
+                    self.connections, self.total_connections, self.files,
+                    self.datagrams, self.truncated, self.stalls, self.spill_peak, self.overlong)
+
+
+class SpillBuffer:
+    """Bounded FIFO of uncompressed blocks between the readers and the compression threads.
+
+    put() blocks while the buffer holds more than `limit` bytes: this is
+    where the backpressure starts. A single block larger than the limit is
+    still accepted when the buffer is empty.
+    """
+
+    def __init__(self, limit, stats):
+        self.limit = limit
+        self.stats = stats
+        self.blocks = deque()
+        self.size = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def put(self, route, data):
+        with self.cond:
+            if self.size and self.size + len(data) > self.limit:
+                with self.stats.lock:
+                    self.stats.stalls += 1
+                while self.size and self.size + len(data) > self.limit:
+                    self.cond.wait()
+            self.blocks.append((route, data))
+            self.size += len(data)
+            with self.stats.lock:
+                self.stats.spill_peak = max(self.stats.spill_peak, self.size)
+            self.cond.notify_all()
+
+    def get(self):
+        """Next (route, block), or None once the buffer is closed and empty."""
+        with self.cond:
+            while not self.blocks and not self.closed:
+                self.cond.wait()
+            if not self.blocks:
+                return None
+            item = self.blocks.popleft()
+            self.size -= len(item[1])
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class Output:
+    """Compressed output file, rotated by size and/or age."""
+
+    def __init__(self, path, compression, rotate_size=None, rotate_interval=None, stats=None):
+        self.path = path
+        self.compression = compression
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.stats = stats
+        self.file = None
+        self.current = None
+        self.written = 0
+        self.opened_at = 0
+
+    @property
+    def rotating(self):
+        return bool(self.rotate_size or self.rotate_interval)
+
+    def _segment_path(self):
+        if not self.rotating:
+            return self.path
+        ext = EXTENSIONS[self.compression]
+        base = self.path[:-len(ext)] if ext and self.path.endswith(ext) else self.path
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        candidate = "{}.{}{}".format(base, stamp, ext)
+        n = 1
+        while os.path.exists(candidate):
+            candidate = "{}.{}.{}{}".format(base, stamp, n, ext)
+            n += 1
+        return candidate
+
+    def open(self):
+        self.current = self._segment_path()
+        self.file = open(self.current, "wb")
+        self.written = 0
+        self.opened_at = time.monotonic()
+        if self.stats:
+            with self.stats.lock:
+                self.stats.files += 1
+        errprint("Writing to {}".format(self.current))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def due(self):
+        if self.file is None or self.written == 0:
+            return False
+        if self.rotate_size and self.written >= self.rotate_size:
+            return True
+        if self.rotate_interval and time.monotonic() - self.opened_at >= self.rotate_interval:
+            return True
+        return False
+
+    def write(self, data):
+        if self.file is None:
+            self.open()
+        self.file.write(data)
+        self.written += len(data)
+
+    def maybe_rotate(self):
+        if self.due():
+            self.close()
+            self.open()
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+
+class Forwarder:
+    """Copies the incoming stream to a unix stream socket (--fanout-sock).
+
+    Data is queued up to `limit` bytes and dropped beyond that, and while
+    the consumer is not connected: a live view has no use for a backlog. A
+    consumer that stops reading for DRAIN_TIMEOUT is disconnected.
+    """
+
+    def __init__(self, path, limit):
+        self.path = path
+        self.limit = limit
+        self.chunks = deque()
+        self.size = 0
+        self.connected = False
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.cond = threading.Condition()
+
+    def send(self, data):
+        with self.cond:
+            if not self.connected or self.size + len(data) > self.limit:
+                self.dropped += len(data)
+                return
+            self.chunks.append(data)
+            self.size += len(data)
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         try:
-            f = gzip.open(options.output, 'wb')
-        except Exception,e:
-            print("Error: could not open output file %s:\n%s\n", options.output, e)
-            sys.exit(-1)
-    else:
-        print("Error: --output-file option required and was not specified\n%s" % (options.usage))
-        sys.exit(-1)
-
-    #Open our socket and bind
-    if options.lsock:
-        if os.path.exists(options.lsock):
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(DRAIN_TIMEOUT)
+        return sock
+
+    def _disconnect(self, sock, lost):
+        sock.close()
+        with self.cond:
+            self.connected = False
+            self.dropped += lost + self.size
+            self.chunks.clear()
+            self.size = 0
+
+    def run(self):
+        sock = None
+        warned = False
+        while True:
+            if sock is None:
+                with self.cond:
+                    if self.closed:
+                        break
+                try:
+                    sock = self._connect()
+                except OSError as err:
+                    if not warned:
+                        errprint("Fan-out to {} unavailable: {}".format(self.path, err))
+                        warned = True
+                    with self.cond:
+                        self.cond.wait(ACCEPT_TIMEOUT)
+                    continue
+                errprint("Fan-out connected to {}".format(self.path))
+                warned = False
+                with self.cond:
+                    self.connected = True
+            with self.cond:
+                while not self.chunks and not self.closed:
+                    self.cond.wait()
+                if not self.chunks:
+                    break
+                data = self.chunks.popleft()
+                self.size -= len(data)
             try:
-                os.remove(options.lsock)
-            except OSError:
-                pass
+                sock.sendall(data)
+            except OSError as err:
+                errprint("Fan-out to {} lost: {}".format(self.path, err))
+                self._disconnect(sock, len(data))
+                sock = None
+                continue
+            with self.cond:
+                self.sent += len(data)
+        if sock is not None:
+            sock.close()
+
+
+class Route:
+    """Block being assembled and output file for one event type (or for the whole stream)."""
+
+    def __init__(self, name, output):
+        self.name = name
+        self.output = output
+        self.block = []
+        self.block_size = 0
+
+
+class Sink:
+    """Receives eve records, assembles blocks of lines and writes them compressed, in order."""
+
+    def __init__(self, args):
+        self.args = args
+        self.stats = Stats()
+        self.routing = TYPE_PLACEHOLDER in args.output_file
+        self.routes = {}       # route name -> Route
+        self.type_names = {}   # event_type as found in lines -> route name
+        self.compress = make_compressor(args.compression, args.level)
+        self.pool = ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix="compress")
+        # Blocks waiting for a compression thread; full, it blocks the readers.
+        self.spill = SpillBuffer(args.spill_size, self.stats)
+        # Compressed blocks waiting to be written, in submission order.
+        self.pending = queue.Queue(maxsize=args.threads * 2)
+        self.block_lock = threading.Lock()
+        self.forwarder = Forwarder(args.fanout_sock, args.fanout_buffer) if args.fanout_sock else None
+        self.stopping = threading.Event()
+        self.server = None
+        self.server_inode = None
+
+    # Block assembly
+
+    def _route_locked(self, event_type):
+        name = self.type_names.get(event_type)
+        if name is None:
+            name = event_type.decode("ascii", "replace") if event_type else OTHER_TYPE
+            if (not TYPE_NAME.match(name) or (self.args.types and name not in self.args.types)
+                    or (name not in self.routes and len(self.routes) >= MAX_ROUTES)):
+                name = OTHER_TYPE
+            if len(self.type_names) < MAX_ROUTES * 4:
+                self.type_names[event_type] = name
+        route = self.routes.get(name)
+        if route is None:
+            if self.routing:
+                path = self.args.output_file.replace(TYPE_PLACEHOLDER, name)
+            else:
+                path = self.args.output_file
+            output = Output(path, self.args.compression,
+                            self.args.type_rotate_size.get(name, self.args.rotate_size),
+                            self.args.type_rotate_interval.get(name, self.args.rotate_interval),
+                            self.stats)
+            route = self.routes[name] = Route(name, output)
+        return route
+
+    def add(self, data):
+        """Queue complete lines; submits a block once it is large enough."""
+        self.stats.add_input(data)
+        if self.forwarder is not None:
+            self.forwarder.send(data)
+        if not self.routing:
+            with self.block_lock:
+                self._append_locked(self._route_locked(None), data)
+            return
+        lines = data.split(b"\n")
+        tail = lines.pop()  # empty: readers only pass complete lines
+        if tail:
+            lines.append(tail)
+        groups = {}
+        for line in lines:
+            event_type = event_type_of(line)
+            group = groups.get(event_type)
+            if group is None:
+                group = groups[event_type] = []
+            group.append(line)
+        with self.block_lock:
+            for event_type, group in groups.items():
+                group.append(b"")
+                self._append_locked(self._route_locked(event_type), b"\n".join(group))
+
+    def _append_locked(self, route, data):
+        route.block.append(data)
+        route.block_size += len(data)
+        if route.block_size >= self.args.block_size:
+            self._submit_locked(route)
+
+    def flush_block(self):
+        with self.block_lock:
+            for route in self.routes.values():
+                if route.block:
+                    self._submit_locked(route)
+
+    def _submit_locked(self, route):
+        data = b"".join(route.block)
+        route.block = []
+        route.block_size = 0
+        # Submitting under the lock keeps blocks in arrival order.
+        self.spill.put(route, data)
+
+    # Threads
+
+    def dispatcher(self):
+        """Hands spilled blocks to the compression threads, in order."""
+        while True:
+            item = self.spill.get()
+            if item is None:
+                break
+            route, data = item
+            self.pending.put((route, self.pool.submit(self.compress, data)))
+
+    def writer(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            if item is TICK:
+                with self.block_lock:
+                    routes = list(self.routes.values())
+                for route in routes:
+                    route.output.maybe_rotate()
+                    route.output.flush()
+                continue
+            route, future = item
+            data = future.result()
+            route.output.write(data)
+            self.stats.add_output(len(data))
+            route.output.maybe_rotate()
+        for route in self.routes.values():
+            route.output.close()
+
+    def flusher(self):
+        """Flushes partial blocks so that slow periods still reach the disk, and rotates by time."""
+        while not self.stopping.wait(self.args.flush_interval):
+            self.flush_block()
+            self.pending.put(TICK)
+
+    def reporter(self):
+        previous = self.stats.snapshot()
+        previous_time = time.monotonic()
+        while not self.stopping.wait(self.args.stats_interval):
+            current = self.stats.snapshot()
+            now = time.monotonic()
+            elapsed = now - previous_time
+            bytes_in = current[0] - previous[0]
+            bytes_out = current[2] - previous[2]
+            if self.args.socket_type == "dgram":
+                source = "datagrams: {:.0f}/s, truncated: {}".format(
+                    (current[7] - previous[7]) / elapsed, current[8])
+            else:
+                source = "connections: {} (total {}), overlong lines dropped: {}".format(
+                    current[4], current[5], current[11])
+            if self.routing:
+                source += ", types: {}".format(len(self.routes))
+            if self.forwarder is not None:
+                source += ", fan-out: {:.1f} MB sent, {:.1f} MB dropped".format(
+                    self.forwarder.sent / 1e6, self.forwarder.dropped / 1e6)
+            errprint("in: {:.1f} MB/s ({:.0f} lines/s), out: {:.1f} MB/s, ratio: {}, {}, "
+                     "spill: {:.1f} MB (peak {:.1f} MB, stalls {}), queued blocks: {}, files: {}".format(
+                         bytes_in / elapsed / 1e6, (current[1] - previous[1]) / elapsed,
+                         bytes_out / elapsed / 1e6,
+                         "{:.1f}".format(current[0] / current[2]) if current[2] else "-",
+                         source, self.spill.size / 1e6, current[10] / 1e6, current[9],
+                         self.pending.qsize(), current[6]))
+            previous, previous_time = current, now
+
+    def reader(self, conn, number):
+        buf = bytearray(self.args.recv_size)
+        view = memoryview(buf)
+        carry = b""
+        skipping = False  # inside an overlong line, dropped up to its newline
+        received = 0
+        deadline = None
+        conn.settimeout(READ_TIMEOUT)
+        try:
+            while True:
+                if self.stopping.is_set():
+                    if deadline is None:
+                        deadline = time.monotonic() + DRAIN_TIMEOUT
+                    elif time.monotonic() > deadline:
+                        break
+                try:
+                    n = conn.recv_into(view)
+                except socket.timeout:
+                    if self.stopping.is_set():
+                        break  # drained
+                    continue
+                if n == 0:
+                    break
+                received += n
+                start = 0
+                if skipping:
+                    first = buf.find(b"\n", 0, n)
+                    if first < 0:
+                        continue
+                    skipping = False
+                    start = first + 1
+                end = buf.rfind(b"\n", start, n)
+                if end < 0:
+                    carry += view[start:n]
+                    if len(carry) >= MAX_LINE_SIZE:
+                        with self.stats.lock:
+                            self.stats.overlong += 1
+                        errprint("Connection {}: dropping a line longer than {} bytes".format(number, MAX_LINE_SIZE))
+                        carry = b""
+                        skipping = True
+                    continue
+                self.add(carry + view[start:end + 1])
+                carry = bytes(view[end + 1:n])
+        except OSError as err:
+            errprint("Connection {} error: {}".format(number, err))
+        finally:
+            if carry:
+                # Unterminated last line (peer killed mid-write): keep it, on its own line.
+                self.add(carry + b"\n")
+            conn.close()
+            with self.stats.lock:
+                self.stats.connections -= 1
+            errprint("Connection {} closed after {} bytes".format(number, received))
+
+    def dgram_reader(self):
+        """Reads datagrams in batches: one blocking wait, then non-blocking reads until the queue is empty."""
+        slot = self.args.max_datagram
+        # Room for at least a few datagrams, plus the newline appended to each.
+        buf = bytearray(max(self.args.recv_size, 4 * (slot + 1)))
+        view = memoryview(buf)
+        sock = None
+        deadline = None
+        while True:
+            if sock is not self.server:
+                # Bound again by the accept loop: what is left in the old
+                # socket is lost with it, as it no longer has a path.
+                if sock is not None:
+                    sock.close()
+                sock = self.server
+            if self.stopping.is_set():
+                if deadline is None:
+                    deadline = time.monotonic() + DRAIN_TIMEOUT
+                elif time.monotonic() > deadline:
+                    break
+            try:
+                ready, _, _ = select.select([sock], [], [], READ_TIMEOUT)
+            except (OSError, ValueError):
+                ready = []
+            if not ready:
+                if self.stopping.is_set():
+                    break  # drained
+                continue
+            size = 0
+            count = 0
+            truncated = 0
+            while count < DGRAM_BATCH and len(buf) - size > slot:
+                try:
+                    n, _, flags, _ = sock.recvmsg_into([view[size:size + slot]])
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as err:
+                    errprint("Datagram socket error: {}".format(err))
+                    break
+                if flags & socket.MSG_TRUNC:
+                    truncated += 1  # an incomplete record is not valid JSON
+                    continue
+                if n == 0:
+                    continue
+                size += n
+                count += 1
+                # One datagram is one record: terminate it if needed.
+                if buf[size - 1] != 0x0a:
+                    buf[size] = 0x0a
+                    size += 1
+            with self.stats.lock:
+                self.stats.datagrams += count
+                self.stats.truncated += truncated
+            if truncated:
+                errprint("Dropped {} datagram(s) larger than {} bytes".format(truncated, slot))
+            if size:
+                self.add(bytes(view[:size]))
+        sock.close()
+
+    def bind(self):
+        path = self.args.listen_sock
+        if os.path.lexists(path):
+            os.remove(path)
+        if self.args.socket_type == "dgram":
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.args.recv_size)
+            server.bind(path)
+            server.setblocking(False)
+        else:
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+            server.listen(16)
+            server.settimeout(ACCEPT_TIMEOUT)
+        self.server_inode = os.stat(path).st_ino
+        self.server = server
+        errprint("Listening on {} ({})".format(path, self.args.socket_type))
+
+    def socket_lost(self):
+        """True when our socket path was removed or replaced (e.g. by a cleanup of /var/run)."""
         try:
-            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            s.bind(options.lsock)
-            s.listen(1)
-            conn, addr = s.accept()
-        except Exception,e:
-            print("Error: Failed to bind socket %s\n%s\n", options.lsock, e)
-            sys.exit(-1)
-    else:
-        print("Error: --listen-sock option required and was not specified\n%s" % (options.usage))
-        sys.exit(-1)
-
-    #Read data from the socket and write to the file
-    while 1:
-        data = conn.recv(1024)
-        if not data: break
-        f.write(data)
-    conn.close()
-    f.close()
+            return os.stat(self.args.listen_sock).st_ino != self.server_inode
+        except FileNotFoundError:
+            return True
+
+    def rebind(self):
+        errprint("{} was removed, binding it again".format(self.args.listen_sock))
+        old = self.server
+        try:
+            self.bind()
+        except OSError as err:
+            errprint("Cannot bind {}: {}".format(self.args.listen_sock, err))
+            return
+        if self.args.socket_type == "stream":
+            # Established connections are not affected.
+            old.close()
+
+    def accept_connections(self):
+        readers = []
+        number = 0
+        while not self.stopping.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                if self.socket_lost():
+                    self.rebind()
+                continue
+            except OSError as err:
+                # e.g. EMFILE: keep serving the established connections.
+                errprint("Accept error: {}".format(err))
+                self.stopping.wait(ACCEPT_TIMEOUT)
+                continue
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.args.recv_size)
+            number += 1
+            with self.stats.lock:
+                self.stats.connections += 1
+                self.stats.total_connections += 1
+            errprint("Connection {} opened".format(number))
+            thread = threading.Thread(target=self.reader, args=(conn, number), name="reader", daemon=True)
+            thread.start()
+            readers.append(thread)
+            readers = [t for t in readers if t.is_alive()]
+        self.server.close()
+        return readers
+
+    def receive_datagrams(self):
+        reader = threading.Thread(target=self.dgram_reader, name="reader", daemon=True)
+        reader.start()
+        while not self.stopping.wait(ACCEPT_TIMEOUT):
+            if self.socket_lost():
+                self.rebind()
+        return [reader]
+
+    def serve(self):
+        self.bind()
+        writer = threading.Thread(target=self.writer, name="writer")
+        dispatcher = threading.Thread(target=self.dispatcher, name="dispatcher")
+        threads = [writer, dispatcher]
+        threads.append(threading.Thread(target=self.flusher, name="flusher", daemon=True))
+        if self.args.stats_interval > 0:
+            threads.append(threading.Thread(target=self.reporter, name="reporter", daemon=True))
+        if self.forwarder is not None:
+            forwarder = threading.Thread(target=self.forwarder.run, name="fanout", daemon=True)
+            threads.append(forwarder)
+        for thread in threads:
+            thread.start()
+
+        if self.args.socket_type == "dgram":
+            readers = self.receive_datagrams()
+        else:
+            readers = self.accept_connections()
+
+        # Readers drain their sockets, then everything buffered is written.
+        for thread in readers:
+            thread.join()
+        self.flush_block()
+        self.spill.close()
+        dispatcher.join()
+        self.pool.shutdown(wait=True)
+        self.pending.put(None)
+        writer.join()
+        if self.forwarder is not None:
+            self.forwarder.close()
+            forwarder.join(DRAIN_TIMEOUT)
+        if not self.socket_lost():
+            os.remove(self.args.listen_sock)
+
+    def stop(self, *_):
+        # The accept loop and the readers notice within ACCEPT_TIMEOUT and READ_TIMEOUT.
+        self.stopping.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive eve output from a unix socket into compressed files")
+    parser.add_argument("--listen-sock", required=True, help="Path to the socket we will listen on")
+    parser.add_argument("--socket-type", choices=["stream", "dgram"], default="stream",
+                        help="unix_stream or unix_dgram eve output (default: stream)")
+    parser.add_argument("--output-file", required=True,
+                        help="Output file; with rotation, a timestamp is inserted before the extension. "
+                             "With {event_type} in the name, one file per event type")
+    parser.add_argument("--compression", choices=sorted(EXTENSIONS),
+                        help="Output compression (default: from the output extension, gzip otherwise)")
+    parser.add_argument("--level", type=int, help="Compression level (default: 6 for gzip, 3 for zstd)")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Compression threads")
+    parser.add_argument("--block-size", type=parse_size, default=DEFAULT_BLOCK_SIZE,
+                        help="Uncompressed size of each compressed member (default: 1M)")
+    parser.add_argument("--recv-size", type=parse_size, default=DEFAULT_RECV_SIZE,
+                        help="Receive buffer size per connection (default: 4M)")
+    parser.add_argument("--max-datagram", type=parse_size, default=DEFAULT_MAX_DATAGRAM,
+                        help="Largest datagram accepted in dgram mode (default: 256k)")
+    parser.add_argument("--spill-size", type=parse_size, default=DEFAULT_SPILL_SIZE,
+                        help="Memory for blocks waiting to be compressed before readers block (default: 256M)")
+    parser.add_argument("--rotate-size", type=parse_size, help="Rotate after this many compressed bytes (e.g. 1G)")
+    parser.add_argument("--rotate-interval", type=parse_duration, help="Rotate after this long (e.g. 1h)")
+    parser.add_argument("--types", help="Comma-separated event types routed to their own file, "
+                                         "the others go to 'other' (default: every type)")
+    parser.add_argument("--type-rotate-size", action="append", metavar="TYPE=SIZE",
+                        help="--rotate-size for one event type (repeatable)")
+    parser.add_argument("--type-rotate-interval", action="append", metavar="TYPE=DURATION",
+                        help="--rotate-interval for one event type (repeatable)")
+    parser.add_argument("--fanout-sock", help="Also copy the stream to this unix stream socket")
+    parser.add_argument("--fanout-buffer", type=parse_size, default=DEFAULT_FANOUT_BUFFER,
+                        help="Fan-out data held for a slow consumer before dropping (default: 64M)")
+    parser.add_argument("--flush-interval", type=parse_duration, default=1.0,
+                        help="Write partial blocks after this long (default: 1s)")
+    parser.add_argument("--stats-interval", type=parse_duration, default=10.0,
+                        help="Throughput report interval, 0 to disable (default: 10s)")
+    args = parser.parse_args()
+
+    if args.compression is None:
+        args.compression = "zstd" if args.output_file.endswith(".zst") else "gzip"
+    if args.level is None:
+        args.level = {"gzip": 6, "zstd": 3, "none": 0}[args.compression]
+    if min(args.threads, args.block_size, args.recv_size, args.max_datagram, args.spill_size) < 1:
+        parser.error("--threads, --block-size, --recv-size, --max-datagram and --spill-size must be positive")
+    try:
+        args.type_rotate_size = parse_type_values(args.type_rotate_size, parse_size)
+        args.type_rotate_interval = parse_type_values(args.type_rotate_interval, parse_duration)
+    except ValueError as err:
+        parser.error(str(err))
+    if args.types is not None:
+        args.types = set(name.strip() for name in args.types.split(",") if name.strip())
+    if TYPE_PLACEHOLDER not in args.output_file and (
+            args.types or args.type_rotate_size or args.type_rotate_interval):
+        parser.error("--types and --type-rotate-* require {} in --output-file".format(TYPE_PLACEHOLDER))
+    if args.compression == "zstd" and zstandard is None:
+        parser.error("zstd compression requires the zstandard module")
+
+    sink = Sink(args)
+    signal.signal(signal.SIGINT, sink.stop)
+    signal.signal(signal.SIGTERM, sink.stop)
+    try:
+        sink.serve()
+    except OSError as err:
+        errprint("Error: {}".format(err))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
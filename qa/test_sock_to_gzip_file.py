@@ -0,0 +1,116 @@
+import argparse
+import gzip
+import socket
+import threading
+import time
+
+import pytest
+
+import sock_to_gzip_file
+from sock_to_gzip_file import SpillBuffer, Sink, Stats, event_type_of
+
+
+@pytest.mark.parametrize("line, expected", [
+    (b'{"timestamp":"x","event_type":"alert","src_ip":"1.2.3.4"}', b"alert"),
+    (b'{"timestamp": "x", "event_type": "dns"}', b"dns"),
+    (b'{"timestamp":"x"}', None),
+    (b'{"event_type":42}', None),
+    (b'{"event_type":"unterminated', None),
+])
+def test_event_type_of(line, expected):
+    assert event_type_of(line) == expected
+
+
+def test_spill_buffer_is_fifo_and_drains_after_close():
+    spill = SpillBuffer(100, Stats())
+    spill.put("a", b"1" * 10)
+    spill.put("b", b"2" * 10)
+    spill.close()
+    assert spill.get() == ("a", b"1" * 10)
+    assert spill.get() == ("b", b"2" * 10)
+    assert spill.get() is None
+
+
+def test_spill_buffer_blocks_over_limit():
+    stats = Stats()
+    spill = SpillBuffer(15, stats)
+    spill.put(None, b"x" * 10)
+    done = threading.Event()
+
+    def producer():
+        spill.put(None, b"y" * 10)
+        done.set()
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    assert not done.wait(0.2)
+    assert spill.get() == (None, b"x" * 10)
+    assert done.wait(2)
+    thread.join()
+    assert stats.stalls == 1
+    assert spill.get() == (None, b"y" * 10)
+    # A block larger than the limit still goes through when the buffer is empty
+    spill.put(None, b"z" * 100)
+    assert spill.size == 100
+
+
+def make_sink(tmp_path, output="out.json.gz"):
+    return Sink(argparse.Namespace(
+        listen_sock=str(tmp_path / "sink.sock"), socket_type="stream",
+        output_file=str(tmp_path / output), compression="gzip", level=1, threads=2,
+        block_size=1024 * 1024, recv_size=256, max_datagram=65536, spill_size=1024 * 1024,
+        rotate_size=None, rotate_interval=None, types=None, type_rotate_size={}, type_rotate_interval={},
+        fanout_sock=None, fanout_buffer=0, flush_interval=0.1, stats_interval=0))
+
+
+def run_sink(sink, chunks):
+    """Start the sink, send chunks over one connection, then stop it and wait for the writers."""
+    thread = threading.Thread(target=sink.serve)
+    thread.start()
+    for _ in range(100):
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(sink.args.listen_sock)
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            client.close()
+            time.sleep(0.05)
+    for chunk in chunks:
+        client.sendall(chunk)
+        time.sleep(0.01)
+    client.close()
+    time.sleep(0.2)
+    sink.stop()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def read_output(tmp_path, pattern):
+    lines = []
+    for path in sorted(tmp_path.glob(pattern)):
+        with gzip.open(path, 'rb') as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def test_lines_split_across_reads(tmp_path):
+    sink = make_sink(tmp_path)
+    lines = [b'{"event_type":"dns","i":%d}' % i for i in range(200)]
+    data = b"".join(line + b"\n" for line in lines) + b'{"event_type":"dns","last":1}'
+    # Arbitrary split: lines straddle several sends
+    run_sink(sink, [data[i:i + 37] for i in range(0, len(data), 37)])
+    # The last line has no trailing newline and is still kept
+    assert read_output(tmp_path, "out.json*.gz") == lines + [b'{"event_type":"dns","last":1}']
+
+
+def test_overlong_line_is_dropped_whole(tmp_path, monkeypatch):
+    monkeypatch.setattr(sock_to_gzip_file, 'MAX_LINE_SIZE', 1000)
+    sink = make_sink(tmp_path, "out.{event_type}.json.gz")
+    overlong = b'{"event_type":"alert","pad":"' + b"x" * 5000 + b'"}\n'
+    before, after = b'{"event_type":"dns","i":1}\n', b'{"event_type":"dns","i":2}\n'
+    data = before + overlong + after
+    run_sink(sink, [data[i:i + 300] for i in range(0, len(data), 300)])
+    assert read_output(tmp_path, "out.dns.json*.gz") == [before.strip(), after.strip()]
+    # No piece of the overlong line ends up in "alert" or "other"
+    assert not list(tmp_path.glob("out.alert.*")) and not list(tmp_path.glob("out.other.*"))
+    assert sink.stats.overlong == 1
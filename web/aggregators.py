@@ -0,0 +1,184 @@
+"""Agrégateurs en fenêtre glissante pour les tableaux de bord (top-K, compteurs).
+
+Chaque fenêtre (5 min, 1 h, 24 h...) est découpée en buckets temporels. Les
+événements sont ajoutés au fil de l'eau et les buckets sortis de la fenêtre
+sont retirés, si bien qu'une requête « top 10 de la dernière heure » ne
+dépend que de la taille de l'état, pas du volume de logs.
+
+Le temps de référence est celui des événements (timestamp eve) et non
+l'horloge du serveur: rejouer un pcap ou lire des logs en retard donne des
+fenêtres cohérentes.
+"""
+import heapq
+from collections import Counter, deque
+
+from eve_time import parse_window
+
+# Fenêtres exposées par les endpoints: nom -> taille d'un bucket (secondes)
+DEFAULT_WINDOWS = {
+    '5m': 10,
+    '1h': 60,
+    '24h': 900,
+}
+DEFAULT_WINDOW = '1h'
+
+
+class SpaceSavingCounter:
+    """Résumé Space-Saving à mémoire bornée (Metwally et al.).
+
+    Garde au plus `capacity` clés. Quand une nouvelle clé arrive et que le
+    résumé est plein, elle remplace la clé de plus petit compte et hérite de
+    ce compte (+1): les comptes sont des bornes supérieures, et toute clé de
+    fréquence > total/capacity est garantie d'être présente.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._counts = {}
+        self._heap = []  # (count, key), entrées périmées ignorées paresseusement
+
+    def add(self, key, count=1):
+        counts = self._counts
+        if key in counts:
+            counts[key] += count
+        elif len(counts) < self.capacity:
+            counts[key] = count
+        else:
+            victim, victim_count = self._pop_min()
+            del counts[victim]
+            counts[key] = victim_count + count
+        heapq.heappush(self._heap, (counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, k) for k, c in counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self._counts.get(key) == count:
+                return key, count
+
+    def items(self):
+        return self._counts.items()
+
+    def most_common(self, n):
+        return heapq.nlargest(n, self._counts.items(), key=lambda item: item[1])
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class SlidingWindowTopK:
+    """Compteur par clé sur une fenêtre glissante de window_seconds.
+
+    Mode exact: un Counter par bucket et un Counter des totaux maintenu
+    incrémentalement (ajout à l'arrivée, soustraction à l'expiration).
+    Mode sketch (sketch_capacity > 0): chaque bucket est un résumé
+    Space-Saving borné et le top-K est obtenu en fusionnant les buckets, ce
+    qui borne la mémoire à (nb buckets x capacité) quelle que soit la
+    cardinalité des clés (ex: dns.rrname).
+    """
+
+    def __init__(self, window_seconds, bucket_seconds, sketch_capacity=0):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.sketch_capacity = sketch_capacity
+        self._buckets = deque()  # (bucket_start, Counter | SpaceSavingCounter)
+        self._totals = Counter() if not sketch_capacity else None
+        # Fusion des buckets (mode sketch) et top-K, recalculés après un ajout ou une expiration
+        self._merged_cache = None
+        self._top_cache = None
+
+    def _new_bucket(self):
+        if self.sketch_capacity:
+            return SpaceSavingCounter(self.sketch_capacity)
+        return Counter()
+
+    def add(self, key, timestamp):
+        """Ajoute une occurrence de key à l'instant timestamp (epoch)."""
+        bucket_start = int(timestamp // self.bucket_seconds) * self.bucket_seconds
+        buckets = self._buckets
+        if not buckets or bucket_start > buckets[-1][0]:
+            buckets.append((bucket_start, self._new_bucket()))
+            self._expire(bucket_start)
+            bucket = buckets[-1][1]
+        else:
+            if bucket_start <= buckets[-1][0] - self.window_seconds:
+                # Événement trop ancien pour la fenêtre courante
+                return
+            bucket = None
+            # Événement légèrement en retard: chercher son bucket depuis la fin
+            for index in range(len(buckets) - 1, -1, -1):
+                start = buckets[index][0]
+                if start == bucket_start:
+                    bucket = buckets[index][1]
+                    break
+                if start < bucket_start:
+                    buckets.insert(index + 1, (bucket_start, self._new_bucket()))
+                    bucket = buckets[index + 1][1]
+                    break
+            if bucket is None:
+                buckets.appendleft((bucket_start, self._new_bucket()))
+                bucket = buckets[0][1]
+        if self.sketch_capacity:
+            bucket.add(key)
+        else:
+            bucket[key] += 1
+            self._totals[key] += 1
+        self._merged_cache = None
+        self._top_cache = None
+
+    def _expire(self, newest_start):
+        horizon = newest_start - self.window_seconds
+        buckets = self._buckets
+        while buckets and buckets[0][0] <= horizon:
+            _, expired = buckets.popleft()
+            if self._totals is not None:
+                self._totals.subtract(expired)
+                for key in expired:
+                    if self._totals[key] <= 0:
+                        del self._totals[key]
+
+    def _merged(self):
+        if self._totals is not None:
+            return self._totals
+        merged = self._merged_cache
+        if merged is None:
+            merged = Counter()
+            for _, bucket in self._buckets:
+                for key, count in bucket.items():
+                    merged[key] += count
+            self._merged_cache = merged
+        return merged
+
+    def most_common(self, n=10):
+        """Retourne [(clé, compte)] des n clés les plus fréquentes sur la fenêtre."""
+        cache = self._top_cache
+        if cache is not None and cache[0] >= n:
+            return cache[1][:n]
+        top = heapq.nlargest(n, self._merged().items(), key=lambda item: item[1])
+        self._top_cache = (n, top)
+        return top
+
+    def cardinality(self):
+        """Nombre de clés distinctes (approximatif en mode sketch)."""
+        return len(self._merged())
+
+
+class MultiWindowTopK:
+    """Regroupe plusieurs SlidingWindowTopK (ex: 5m, 1h, 24h) alimentés ensemble."""
+
+    def __init__(self, windows=None, sketch_capacity=0):
+        windows = windows or DEFAULT_WINDOWS
+        self.windows = {
+            name: SlidingWindowTopK(parse_window(name), bucket_seconds, sketch_capacity)
+            for name, bucket_seconds in windows.items()
+        }
+
+    def add(self, key, timestamp):
+        for window in self.windows.values():
+            window.add(key, timestamp)
+
+    def get(self, window_name):
+        """Retourne l'agrégateur de la fenêtre demandée. Lève KeyError si inconnue."""
+        return self.windows[window_name]
@@ -1,11 +1,36 @@
 import os
 import socket
+import stat
 import json
 import logging
 import subprocess # AJOUT pour exécuter des commandes externes
 import time # AJOUT pour SSE
-from collections import Counter, deque # AJOUT: deque pour lire les dernières lignes efficacement
+import threading
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify, send_from_directory, Response # AJOUT Response pour SSE
+from werkzeug.http import http_date
+from werkzeug.security import safe_join
+from eve_tailer import EveStatsState, EveTailer, capture_point
+from log_follower import get_follower, stop_all_followers
+from stream_filters import StreamFilter
+from unix_client import SuricataCommandError, SuricataSocketPool
+from sse import SSEEncoder, SSEStream, format_event, negotiate_encoding
+from logset import LogSet, compression_of, set_index_dir
+from log_access import (DEFAULT_PAGE_LINES, MAX_PAGE_LINES, MAX_TAIL_BYTES, LogDownload, RangeNotSatisfiable,
+                        iter_file, iter_gzip, log_mimetype, parse_range, read_line_page, read_offset_page,
+                        tail_start)
+from eve_decode import EventTypePrefilter, loads
+from aggregators import DEFAULT_WINDOW, DEFAULT_WINDOWS
+from shared_state import SingleWriterCoordinator
+from eve_store import EveStore, EveStoreWriter
+from eve_time import parse_window
+from eve_index import EveIndex, EveIndexer, SearchQuery
+from flow_index import FlowIndex, FlowIndexer, MAX_EVENTS_PER_FLOW
+from stats_cache import StatsCache
+from stats_series import DEFAULT_RESOLUTION, RESOLUTIONS
+from iface_poller import InterfaceStatsPoller
+from sensors import MergedStatsState, load_sensors, parse_sensor_names
 
 # Assuming the Flask app is run from the /app/web directory as set in Dockerfile.webinterface
 # We need to serve static files (HTML, CSS, JS) from the 'web' directory relative to the CWD
@@ -31,62 +56,115 @@ logger = logging.getLogger(__name__)
 # For dev container, it might be relative to the workspace if Suricata runs there
 DEFAULT_SOCKET_PATH = '/var/run/suricata/suricata-command.socket' # ADJUST IF NEEDED
 SURICATA_SOCKET_PATH = os.environ.get('SURICATA_SOCKET_PATH', DEFAULT_SOCKET_PATH)
+# Nombre maximal de connexions simultanées gardées ouvertes vers le socket de commande
+SURICATA_SOCKET_POOL_SIZE = int(os.environ.get('SURICATA_SOCKET_POOL_SIZE', '4'))
+# Taille maximale acceptée pour une réponse du socket de commande (octets)
+SURICATA_SOCKET_MAX_MESSAGE_SIZE = int(os.environ.get('SURICATA_SOCKET_MAX_MESSAGE_SIZE', str(64 * 1024 * 1024)))
+# Délai maximal (secondes) d'une commande; vide = pas de limite (un reload-rules peut être long)
+SURICATA_SOCKET_TIMEOUT = float(os.environ.get('SURICATA_SOCKET_TIMEOUT') or 0) or None
+
+# Intervalle de scrutation des followers de logs (secondes), filet de sécurité si inotify est indisponible
+EVE_TAIL_POLL_INTERVAL = float(os.environ.get('EVE_TAIL_POLL_INTERVAL', '1.0'))
+# Nombre maximal de lignes en attente par client SSE (les plus anciennes sont jetées au-delà)
+STREAM_CLIENT_QUEUE_SIZE = int(os.environ.get('STREAM_CLIENT_QUEUE_SIZE', '1000'))
+# Délai (secondes) sans écriture avant l'envoi d'un commentaire heartbeat SSE
+STREAM_KEEPALIVE_INTERVAL = 15
+# Taille maximale d'un lot d'événements en mode batch (?batch_ms=)
+STREAM_DEFAULT_BATCH_SIZE = 500
+# Lecture inverse d'eve.json via mmap plutôt que par seek/read de blocs
+EVE_READER_USE_MMAP = os.environ.get('EVE_READER_USE_MMAP', '0') == '1'
+# Quantité maximale relue depuis la fin d'eve.json quand l'état en mémoire est vide
+EVE_FALLBACK_MAX_BYTES = 256 * 1024 * 1024
+# Capacité du résumé Space-Saving pour les top DNS/SNI (0 = comptage exact)
+STATS_SKETCH_CAPACITY = int(os.environ.get('STATS_SKETCH_CAPACITY', '0'))
+# Répertoire partagé entre workers (ex: /dev/shm/suricata-web): un seul worker suit eve.json
+# et publie un instantané des statistiques pour les autres. Vide = état local au processus.
+STATS_SHARED_DIR = os.environ.get('STATS_SHARED_DIR', '')
+STATS_PUBLISH_INTERVAL = float(os.environ.get('STATS_PUBLISH_INTERVAL', '1.0'))
+# Nombre de réponses de statistiques gardées en cache (fenêtres, sondes et widgets distincts, LRU)
+STATS_CACHE_MAX_ENTRIES = int(os.environ.get('STATS_CACHE_MAX_ENTRIES', '256'))
+# Stockage colonnaire des événements pour les fenêtres historiques (?window=7d); vide = désactivé
+# (à placer sur un volume de données, ex: /var/lib/suricata-web/eve_store)
+EVE_STORE_DIR = os.environ.get('EVE_STORE_DIR', '')
+EVE_STORE_RETENTION_DAYS = int(os.environ.get('EVE_STORE_RETENTION_DAYS', '7'))
+# Mémoire (octets) des colonnes du stockage gardées en cache par worker (LRU)
+EVE_STORE_CACHE_BYTES = int(os.environ.get('EVE_STORE_CACHE_BYTES', str(64 * 1024 * 1024)))
+# Historique ingéré au premier démarrage (sans point de reprise)
+EVE_STORE_BACKFILL_BYTES = int(os.environ.get('EVE_STORE_BACKFILL_BYTES', str(64 * 1024 * 1024)))
+# Index des points de reprise des archives .gz/.zst (voir logset.py), partagé entre workers et
+# conservé après un redémarrage; vide = dans STATS_SHARED_DIR, ou en mémoire sans celui-ci
+LOG_INDEX_DIR = os.environ.get('LOG_INDEX_DIR', os.path.join(STATS_SHARED_DIR, 'log-index') if STATS_SHARED_DIR else '')
+# Intervalle (secondes) d'extension de l'index de recherche par le writer
+EVE_INDEX_INTERVAL = float(os.environ.get('EVE_INDEX_INTERVAL', '1.0'))
+# Index flow_id -> positions pour /api/flow/<flow_id> (nombre de flux, expiration en secondes, historique relu au démarrage)
+EVE_FLOW_INDEX_SIZE = int(os.environ.get('EVE_FLOW_INDEX_SIZE', '500000'))
+EVE_FLOW_INDEX_TTL = float(os.environ.get('EVE_FLOW_INDEX_TTL', '3600'))
+EVE_FLOW_BACKFILL_BYTES = int(os.environ.get('EVE_FLOW_BACKFILL_BYTES', str(64 * 1024 * 1024)))
+# Intervalle de relevé iface-list/iface-stat par le socket de commande (secondes, 0 = désactivé)
+IFACE_STATS_INTERVAL = float(os.environ.get('IFACE_STATS_INTERVAL', '10'))
+# Registre des sondes (fichier JSON, voir sensors.py); vide = une seule sonde sur SURICATA_SOCKET_PATH et logs/eve.json
+SURICATA_SENSORS_FILE = os.environ.get('SURICATA_SENSORS_FILE', '')
+try:
+    SENSORS = load_sensors(SURICATA_SENSORS_FILE, SURICATA_SOCKET_PATH)
+    SENSORS_CONFIG_ERROR = None
+except ValueError as e:
+    # Un fichier de sondes invalide n'empêche pas l'interface de démarrer: sonde par défaut, erreur dans /api/sensors
+    logger.error(f"Invalid sensors configuration, falling back to the default sensor: {e}")
+    SENSORS = load_sensors('', SURICATA_SOCKET_PATH)
+    SENSORS_CONFIG_ERROR = str(e)
+# Sonde principale: stockage colonnaire, recherche et index des flux
+PRIMARY_SENSOR = SENSORS[0]
+
+def get_sensor(name=None):
+    """Sonde du registre (la sonde principale par défaut). Lève KeyError si le nom est inconnu."""
+    if name is None:
+        return PRIMARY_SENSOR
+    for sensor in SENSORS:
+        if sensor.name == name:
+            return sensor
+    raise KeyError(name)
+
+def selected_sensors(names=None):
+    """Sondes désignées par un tuple de noms (parse_sensor_names), toutes pour None."""
+    if names is None:
+        return list(SENSORS)
+    return [sensor for sensor in SENSORS if sensor.name in names]
+
+def sensor_eve_path(sensor=None):
+    """Chemin de l'eve.json d'une sonde (la sonde principale par défaut)."""
+    return (sensor or PRIMARY_SENSOR).resolve_eve_path(os.path.join(app.root_path, LOGS_FOLDER_PATH), EVE_JSON_FILE)
 
 # --- Helper Function --- 
-def send_unix_command(command_data):
-    """Sends a command to the Suricata Unix socket and returns the response."""
-    if not os.path.exists(SURICATA_SOCKET_PATH):
-        logger.error(f"Socket file not found at {SURICATA_SOCKET_PATH}")
-        return {"status": "error", "message": f"Socket file not found at {SURICATA_SOCKET_PATH}. Is Suricata running and configured for Unix socket?"}
+_command_pools = {}
+_command_pool_lock = threading.Lock()
+
+def get_command_pool(sensor=None):
+    """Retourne le pool de connexions persistantes vers le socket de commande d'une sonde."""
+    sensor = sensor or PRIMARY_SENSOR
+    with _command_pool_lock:
+        pool = _command_pools.get(sensor.name)
+        if pool is None:
+            pool = _command_pools[sensor.name] = SuricataSocketPool(
+                sensor.socket_path, max_connections=SURICATA_SOCKET_POOL_SIZE, timeout=SURICATA_SOCKET_TIMEOUT,
+                max_message_size=SURICATA_SOCKET_MAX_MESSAGE_SIZE)
+        return pool
+
+def send_unix_command(command_data, sensor=None):
+    """Sends a command to the Suricata Unix socket and returns the response.
+       Connections are pooled and kept alive between calls (see unix_client.py).
+    """
+    sensor = sensor or PRIMARY_SENSOR
+    if not os.path.exists(sensor.socket_path):
+        logger.error(f"Socket file not found at {sensor.socket_path}")
+        return {"status": "error", "message": f"Socket file not found at {sensor.socket_path}. Is Suricata running and configured for Unix socket?"}
 
     try:
-        client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        logger.info(f"Connecting to socket: {SURICATA_SOCKET_PATH}")
-        client_socket.connect(SURICATA_SOCKET_PATH)
-        logger.info("Connected to socket")
-
-        # Initial handshake (optional but good practice based on suricatasc examples)
-        # Some versions might not require this
-        try:
-            client_socket.sendall(json.dumps({"version": "0.1"}).encode('utf-8'))
-            initial_response = client_socket.recv(4096).decode('utf-8')
-            logger.info(f"Handshake response: {initial_response}")
-            # Handle potential handshake errors if necessary
-        except Exception as handshake_err:
-            logger.warning(f"Handshake failed (might be optional): {handshake_err}")
-
-        # Send the actual command
-        logger.info(f"Sending command: {command_data}")
-        client_socket.sendall(json.dumps(command_data).encode('utf-8'))
-
-        # Receive the response (potentially in chunks)
-        response_data = b""
-        while True:
-            chunk = client_socket.recv(4096)
-            if not chunk:
-                break
-            response_data += chunk
-            # Simple check if response seems complete (ends with '}')
-            if response_data.strip().endswith(b'}'):
-                 break
-            # Add a small delay or more robust end-of-message detection if needed
-            # For simplicity, we break if we receive something ending in '}'
-
-        logger.info(f"Raw response received: {response_data.decode('utf-8', errors='ignore')}")
-        client_socket.close()
-
-        if not response_data:
-             logger.warning("Received empty response from socket")
-             return {"status": "error", "message": "Received empty response from Suricata."}
-
-        try:
-            response_json = json.loads(response_data.decode('utf-8'))
-            return {"status": "success", "data": response_json}
-        except json.JSONDecodeError as json_err:
-            logger.error(f"Failed to decode JSON response: {json_err}")
-            logger.error(f"Raw response was: {response_data.decode('utf-8', errors='ignore')}")
-            return {"status": "error", "message": "Failed to decode JSON response from Suricata.", "raw_response": response_data.decode('utf-8', errors='ignore')}
-
+        logger.info(f"Sending command to sensor {sensor.name}: {command_data}")
+        response_json = get_command_pool(sensor).execute(command_data)
+        return {"status": "success", "data": response_json}
+    except SuricataCommandError as e:
+        logger.error(f"Suricata command error: {e}")
+        return {"status": "error", "message": str(e)}
     except socket.error as e:
         logger.error(f"Socket error: {e}")
         return {"status": "error", "message": f"Socket communication error: {e}"}
@@ -108,21 +186,129 @@ def index():
 # No need for explicit routes for them if they are in the static_folder.
 
 # --- Log File Serving ---
+def log_path(filename):
+    """Chemin d'un fichier du répertoire des logs, None si le nom en sort."""
+    return safe_join(os.path.join(app.root_path, LOGS_FOLDER_PATH), filename)
+
+def parse_log_page_args(args):
+    """('line', from_line, count), ('offset', offset, limit), ou None sans pagination. Lève ValueError."""
+    if 'from_line' in args or 'count' in args:
+        mode, start, size = 'line', int(args.get('from_line', 0)), int(args.get('count', DEFAULT_PAGE_LINES))
+    elif 'offset' in args or 'limit' in args:
+        mode, start, size = 'offset', int(args.get('offset', 0)), int(args.get('limit', DEFAULT_PAGE_LINES))
+        if start < 0:
+            raise ValueError("offset must be >= 0")
+    else:
+        return None
+    if not 0 < size <= MAX_PAGE_LINES:
+        raise ValueError(f"count/limit must be between 1 and {MAX_PAGE_LINES}")
+    return mode, start, size
+
+def build_log_page(filename, args):
+    """(payload, status) d'une page de lignes (?from_line=&count= ou ?offset=&limit=), None sans pagination."""
+    try:
+        page = parse_log_page_args(args)
+    except ValueError as e:
+        return {"error": f"Invalid page parameters: {e}"}, 400
+    if page is None:
+        return None
+    path = log_path(filename)
+    if path is None or not os.path.isfile(path):
+        return {"error": f"Log file {filename} not found."}, 404
+    mode, start, size = page
+    if mode == 'line':
+        payload = read_line_page(path, start, size)
+    else:
+        payload = read_offset_page(path, start, size)
+    payload["file"] = filename
+    logger.info(f"Returning {len(payload['lines'])} lines of {filename} ({mode} page at {start}).")
+    return payload, 200
+
+def build_log_download(filename, args, range_header=None, accept_encoding=None):
+    """Téléchargement en flux d'un fichier de logs (LogDownload).
+
+    Range (une plage) -> 206; ?tail_bytes=N -> les N derniers octets à partir
+    d'un début de ligne (fichiers non compressés seulement: sur une archive
+    ce seraient des octets compressés); sinon le fichier entier. Les erreurs
+    (répertoire, fichier illisible) sont détectées ici, avant l'envoi d'un
+    200 dont le générateur échouerait. Les réponses complètes sont
+    compressées en gzip à la volée si le client l'accepte (?gzip=0 pour
+    désactiver). ?download=1 propose l'enregistrement du fichier.
+    """
+    def error(message, status, headers=None):
+        return LogDownload(status, 'application/json', headers, [json.dumps({"error": message}).encode()])
+
+    path = log_path(filename)
+    if path is None:
+        return error(f"Log file {filename} not found.", 404)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        logger.warning(f"Log file not found: {filename}")
+        return LogDownload(200, 'text/plain') # Le frontend gère le fichier vide
+    if not stat.S_ISREG(st.st_mode):
+        return error(f"Log file {filename} not found.", 404)
+    if not os.access(path, os.R_OK):
+        return error(f"Log file {filename} is not readable.", 403)
+    size = st.st_size
+    headers = {"Accept-Ranges": "bytes", "Last-Modified": http_date(st.st_mtime), "Cache-Control": "no-cache"}
+    if args.get('download') == '1':
+        headers["Content-Disposition"] = f'attachment; filename="{os.path.basename(filename)}"'
+
+    status = 200
+    if 'tail_bytes' in args:
+        if compression_of(filename) is not None:
+            return error("tail_bytes is not supported on compressed files; download the whole file instead.", 400)
+        try:
+            tail_bytes = int(args['tail_bytes'])
+        except ValueError:
+            tail_bytes = 0
+        if not 0 < tail_bytes <= MAX_TAIL_BYTES:
+            return error(f"tail_bytes must be between 1 and {MAX_TAIL_BYTES}", 400)
+        start, end = tail_start(path, size, tail_bytes), size
+        # Offset de départ, pour continuer avec ?offset= ou Range
+        headers["X-Log-Offset"] = str(start)
+    else:
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return error("Requested range not satisfiable.", 416, {"Content-Range": f"bytes */{size}"})
+        if byte_range is None:
+            start, end = 0, size
+        else:
+            start, end = byte_range[0], byte_range[1] + 1
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+    chunks = iter_file(path, start, end)
+    if (status == 200 and args.get('gzip') != '0' and compression_of(filename) is None
+            and negotiate_encoding(accept_encoding) == 'gzip'):
+        chunks = iter_gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    else:
+        headers["Content-Length"] = str(end - start)
+    logger.info(f"Serving {filename} bytes {start}-{end} of {size} (status {status}).")
+    return LogDownload(status, log_mimetype(filename, EVE_JSON_FILE), headers, chunks)
+
 @app.route('/logs/<path:filename>')
 def serve_log(filename):
-    """Serve log files (eve.json, suricata.log) from the mounted logs directory."""
+    """Serve log files (eve.json, suricata.log, rotated files) from the mounted logs directory.
+       Streamed in chunks, with Range, ?tail_bytes=, and line pages (?from_line=&count=, ?offset=&limit=).
+    """
     logs_dir = os.path.join(app.root_path, LOGS_FOLDER_PATH)
     logger.info(f"Attempting to serve log file: {filename} from {logs_dir}")
     if not os.path.exists(logs_dir):
          logger.error(f"Logs directory not found at {logs_dir}")
          return jsonify({"error": "Logs directory not configured or not found on server."}), 404
-    try:
-        # Force mimetype pour eve.json pour éviter les problèmes de rendu navigateur
-        mimetype = 'application/json' if filename == EVE_JSON_FILE else 'text/plain'
-        return send_from_directory(logs_dir, filename, mimetype=mimetype)
-    except FileNotFoundError:
-        logger.warning(f"Log file not found: {filename} in {logs_dir}")
-        return "", 200 # Le frontend gère le fichier vide
+    page = build_log_page(filename, request.args)
+    if page is not None:
+        payload, status = page
+        return jsonify(payload), status
+    download = build_log_download(filename, request.args, request.headers.get('Range'),
+                                  request.headers.get('Accept-Encoding'))
+    return Response(download.chunks, status=download.status, mimetype=download.mimetype,
+                    headers=download.headers, direct_passthrough=True)
 
 # --- API Endpoint --- 
 @app.route('/api/command', methods=['POST'])
@@ -137,13 +323,61 @@ def handle_command():
         suricata_command['arguments'] = data['arguments']
 
     logger.info(f"Received API request for command: {suricata_command}")
-    result = send_unix_command(suricata_command)
-
+    if len(SENSORS) == 1 and 'sensors' not in data:
+        result = send_unix_command(suricata_command)
+
+        if result['status'] == 'success':
+            return jsonify(result['data']) # Return Suricata's direct response
+        else:
+            # Return the error message from our helper function
+            return jsonify({"return": "FAILED", "message": result['message']}), 500
+
+    payload, status = build_command_fanout(suricata_command, data.get('sensors'))
+    return jsonify(payload), status
+
+def parse_command_sensors(value):
+    """Sondes visées par une commande: liste de noms ou chaîne 'a,b' (toutes si absent). Lève ValueError."""
+    if isinstance(value, list):
+        if not all(isinstance(name, str) for name in value):
+            raise ValueError("'sensors' must be a list of sensor names")
+        value = ','.join(value)
+    elif value is not None and not isinstance(value, str):
+        raise ValueError("'sensors' must be a list of sensor names")
+    return selected_sensors(parse_sensor_names(value, SENSORS))
+
+def command_result(result):
+    """Résultat d'une sonde dans une réponse multi-sondes (réponse Suricata ou FAILED)."""
     if result['status'] == 'success':
-        return jsonify(result['data']) # Return Suricata's direct response
-    else:
-        # Return the error message from our helper function
-        return jsonify({"return": "FAILED", "message": result['message']}), 500
+        return result['data']
+    return {"return": "FAILED", "message": result['message']}
+
+def build_command_fanout(command_data, sensor_names=None):
+    """Envoie la commande aux sondes en parallèle: ({"sensors": {nom: réponse}}, status).
+
+    Le statut est 500 seulement si toutes les sondes ont échoué.
+    """
+    try:
+        sensors = parse_command_sensors(sensor_names)
+    except ValueError as e:
+        return {"return": "FAILED", "message": str(e)}, 400
+    with ThreadPoolExecutor(max_workers=len(sensors)) as executor:
+        results = list(executor.map(lambda sensor: send_unix_command(command_data, sensor), sensors))
+    status = 200 if any(result['status'] == 'success' for result in results) else 500
+    return {"sensors": {sensor.name: command_result(result) for sensor, result in zip(sensors, results)}}, status
+
+def build_sensors():
+    """Sondes configurées, disponibilité des fenêtres historiques (stockage colonnaire activé) et
+    erreur éventuelle du fichier de sondes (config_error: la sonde par défaut est utilisée)."""
+    payload = {"sensors": [sensor.to_dict() for sensor in SENSORS], "primary": PRIMARY_SENSOR.name,
+               "historical_stats": _eve_store is not None}
+    if SENSORS_CONFIG_ERROR:
+        payload["config_error"] = SENSORS_CONFIG_ERROR
+    return payload
+
+@app.route('/api/sensors', methods=['GET'])
+def get_sensors():
+    """Liste des sondes configurées (nom, socket, disponibilité du socket); la première est la principale."""
+    return jsonify(build_sensors())
 
 # --- NOUVEAUX ENDPOINTS POUR LA CONFIGURATION DES RÈGLES ---
 
@@ -178,35 +412,31 @@ def write_config_file(filename, content):
         logger.error(f"Error writing config file {filepath}: {e}")
         raise
 
-@app.route('/api/config/<filename>', methods=['GET'])
-def get_config_file(filename):
-    """Get the content of enable.conf, disable.conf or suricata.yaml."""
+ALLOWED_CONFIG_FILES = ('enable.conf', 'disable.conf', 'suricata.yaml')
+
+def build_config_read(filename):
+    """Retourne (payload, status) pour la lecture d'un fichier de configuration."""
     # AJOUT: Autoriser suricata.yaml
-    allowed_files = ('enable.conf', 'disable.conf', 'suricata.yaml')
-    if filename not in allowed_files:
-        return jsonify({"error": "Invalid config filename specified."}), 400
+    if filename not in ALLOWED_CONFIG_FILES:
+        return {"error": "Invalid config filename specified."}, 400
     try:
         content = read_config_file(filename)
-        return jsonify({"filename": filename, "content": content})
+        return {"filename": filename, "content": content}, 200
     except Exception as e:
-        return jsonify({"error": f"Failed to read {filename}: {e}"}), 500
+        return {"error": f"Failed to read {filename}: {e}"}, 500
+
+def build_config_save(filename, data):
+    """Valide et écrit un fichier de configuration; retourne (payload, status)."""
+    if filename not in ALLOWED_CONFIG_FILES:
+        return {"error": "Invalid config filename specified."}, 400
 
-@app.route('/api/config/<filename>', methods=['POST'])
-def save_config_file(filename):
-    """Save content to enable.conf, disable.conf or suricata.yaml."""
-    # AJOUT: Autoriser suricata.yaml
-    allowed_files = ('enable.conf', 'disable.conf', 'suricata.yaml')
-    if filename not in allowed_files:
-        return jsonify({"error": "Invalid config filename specified."}), 400
-    
-    data = request.get_json()
     if data is None or 'content' not in data:
-        return jsonify({"error": "Invalid request. 'content' field missing."}), 400
+        return {"error": "Invalid request. 'content' field missing."}, 400
 
     content = data['content']
     # Basic sanity check (optional): ensure content is string
     if not isinstance(content, str):
-         return jsonify({"error": "Invalid content format, must be a string."}), 400
+         return {"error": "Invalid content format, must be a string."}, 400
 
     try:
         # Si on sauvegarde suricata.yaml, on pourrait ajouter une validation YAML basique?
@@ -220,14 +450,26 @@ def save_config_file(filename):
             except yaml.YAMLError as yaml_err:
                  logger.error(f"Invalid YAML syntax detected in suricata.yaml: {yaml_err}")
                  # Renvoyer une erreur spécifique pour YAML invalide
-                 return jsonify({"error": f"Invalid YAML syntax: {yaml_err}"}), 400 
+                 return {"error": f"Invalid YAML syntax: {yaml_err}"}, 400 
             except Exception as e:
                  logger.error(f"Error during YAML validation: {e}") # Autre erreur potentielle
 
         write_config_file(filename, content)
-        return jsonify({"status": "success", "message": f"{filename} saved successfully."})
+        return {"status": "success", "message": f"{filename} saved successfully."}, 200
     except Exception as e:
-        return jsonify({"error": f"Failed to save {filename}: {e}"}), 500
+        return {"error": f"Failed to save {filename}: {e}"}, 500
+
+@app.route('/api/config/<filename>', methods=['GET'])
+def get_config_file(filename):
+    """Get the content of enable.conf, disable.conf or suricata.yaml."""
+    payload, status = build_config_read(filename)
+    return jsonify(payload), status
+
+@app.route('/api/config/<filename>', methods=['POST'])
+def save_config_file(filename):
+    """Save content to enable.conf, disable.conf or suricata.yaml."""
+    payload, status = build_config_save(filename, request.get_json(silent=True))
+    return jsonify(payload), status
 
 # --- NOUVEL ENDPOINT POUR DÉCLENCHER SURICATA-UPDATE --- 
 @app.route('/api/run-suricata-update', methods=['POST'])
@@ -275,18 +517,55 @@ def run_suricata_update():
         return jsonify({"status": "error", "message": f"An unexpected error occurred: {e}"}), 500
 
 # --- ENDPOINT POUR LE STREAMING DES LOGS (SSE) --- 
-@app.route('/api/logs/stream')
-def stream_logs():
-    """Endpoint SSE pour streamer les nouvelles lignes du fichier log spécifié."""
-    # Récupérer le nom du fichier depuis les arguments de la requête
-    logfile_name = request.args.get('logfile', 'eve.json') # Par défaut eve.json
-    allowed_logs = ('eve.json', 'suricata.log')
+ALLOWED_STREAM_LOGS = ('eve.json', 'suricata.log')
 
-    if logfile_name not in allowed_logs:
+def resolve_stream_log(logfile_name):
+    """Retourne (nom, chemin) du log à streamer; eve.json si le nom n'est pas autorisé."""
+    if logfile_name not in ALLOWED_STREAM_LOGS:
         logger.warning(f"Log stream request for invalid file: {logfile_name}. Defaulting to eve.json")
         logfile_name = 'eve.json'
-        
-    log_path = os.path.join(app.root_path, LOGS_FOLDER_PATH, logfile_name)
+    return logfile_name, os.path.join(app.root_path, LOGS_FOLDER_PATH, logfile_name)
+
+def parse_stream_options(args, accept_encoding):
+    """Construit (SSEStream, encodage) à partir des paramètres du flux. Lève ValueError si invalides."""
+    stream_filter = StreamFilter.from_args(args)
+    # Mode lot: une trame toutes les batch_ms millisecondes ou tous les batch_size événements
+    batch_ms = int(args.get('batch_ms', 0))
+    batch_size = int(args.get('batch_size', STREAM_DEFAULT_BATCH_SIZE))
+    heartbeat_interval = float(args.get('heartbeat', STREAM_KEEPALIVE_INTERVAL))
+    if batch_ms < 0 or batch_size <= 0 or heartbeat_interval <= 0:
+        raise ValueError("batch_ms must be >= 0, batch_size and heartbeat must be positive")
+
+    # Compression: 'auto' (par défaut) compresse en mode lot si le client l'accepte
+    compress = args.get('compress', 'auto')
+    encoding = None
+    if compress == '1' or (compress == 'auto' and batch_ms > 0):
+        encoding = negotiate_encoding(accept_encoding)
+    stream = SSEStream(stream_filter, batch_ms=batch_ms, batch_size=batch_size, heartbeat_interval=heartbeat_interval)
+    return stream, encoding
+
+def stream_response_headers(encoding):
+    headers = {
+        'Cache-Control': 'no-cache',
+        # Désactiver la mise en tampon des proxys (nginx) pour les flux SSE
+        'X-Accel-Buffering': 'no',
+    }
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        headers['Vary'] = 'Accept-Encoding'
+    return headers
+
+@app.route('/api/logs/stream')
+def stream_logs():
+    """Endpoint SSE pour streamer les nouvelles lignes du fichier log spécifié.
+       Filtrage, échantillonnage et limitation de débit sont appliqués côté
+       serveur selon les paramètres décrits dans stream_filters.py.
+       ?batch_ms=&batch_size= regroupe les événements en trames 'batch'
+       (tableau JSON), compressées si le client accepte gzip/deflate
+       (?compress=auto|1|0). ?heartbeat= règle l'intervalle des heartbeats.
+    """
+    # Récupérer le nom du fichier depuis les arguments de la requête
+    logfile_name, log_path = resolve_stream_log(request.args.get('logfile', 'eve.json')) # Par défaut eve.json
     logger.info(f"Starting log stream for {log_path}")
 
     if not os.path.exists(log_path):
@@ -295,90 +574,78 @@ def stream_logs():
              yield f"data: {json.dumps({'error': f'Log file {logfile_name} not found'})}\n\n"
         return Response(error_generator(), mimetype='text/event-stream')
 
+    try:
+        stream, encoding = parse_stream_options(request.args, request.headers.get('Accept-Encoding'))
+    except ValueError as e:
+        logger.warning(f"Invalid log stream parameters: {e}")
+        message = f'Invalid stream parameters: {e}'
+        def filter_error_generator():
+             yield f"data: {json.dumps({'error': message})}\n\n"
+        return Response(filter_error_generator(), mimetype='text/event-stream')
+    encoder = SSEEncoder(encoding)
+
+    # Un seul follower par fichier, partagé par tous les clients connectés
+    subscription = get_follower(log_path, poll_interval=EVE_TAIL_POLL_INTERVAL).subscribe(STREAM_CLIENT_QUEUE_SIZE)
+
+    def frames():
+        yield from stream.opening()
+        while True:
+            lines = subscription.get(timeout=stream.timeout())
+            if subscription.closed:
+                yield format_event(json.dumps({'error': 'Log stream stopped by server.'}))
+                break
+            dropped = subscription.take_dropped()
+            if dropped:
+                logger.warning(f"Slow SSE client on {logfile_name}: {dropped} lines dropped")
+            yield from stream.on_lines(lines, dropped)
+
     def generate():
-        # Utiliser tail -f pour suivre le fichier. '-n 0' pour ne pas envoyer l'historique.
-        # On lit depuis la fin du fichier.
         try:
-            # D'abord, positionner à la fin
-            with open(log_path, 'r') as f:
-                 f.seek(0, os.SEEK_END)
-                 # logger.info("Positioned at the end of the log file.")
-            
-            # Lancer tail -f --follow=name --retry pour gérer la rotation
-            # Le conteneur doit avoir `tail` (normalement présent dans les images debian/python slim)
-            proc = subprocess.Popen([
-                    'tail', '-n', '0', '--follow=name', '--retry', log_path
-                 ], 
-                 stdout=subprocess.PIPE, 
-                 stderr=subprocess.PIPE, 
-                 text=True)
-            
-            logger.info(f"tail -f process started for {log_path}")
-            
-            while True:
-                 line = proc.stdout.readline()
-                 if not line:
-                      # Vérifier si le processus tail a terminé (peut arriver en cas d'erreur)
-                      poll_status = proc.poll()
-                      if poll_status is not None:
-                          stderr_output = proc.stderr.read()
-                          logger.error(f"tail process exited with code {poll_status}. Stderr: {stderr_output}")
-                          yield f"data: {json.dumps({'error': f'Log stream failed. Tail process exited (code {poll_status}).'})}\n\n"
-                          break # Sortir de la boucle while
-                      # Si pas de ligne mais processus tourne toujours, juste attendre
-                      # time.sleep(0.1)
-                      continue 
-                 
-                 # Envoyer la ligne au client au format SSE
-                 # Tenter de valider/parser le JSON avant de l'envoyer?
-                 try:
-                     json.loads(line) # Juste pour valider
-                     yield f"data: {line.strip()}\n\n"
-                 except json.JSONDecodeError:
-                     logger.warning(f"Streaming non-JSON line: {line.strip()}")
-                     # Envoyer quand même? Ou seulement les lignes JSON valides?
-                     # Pour l'instant, on envoie tout ce que tail sort.
-                     yield f"data: {json.dumps({'raw_line': line.strip()})}\n\n" 
-                 
+            for frame in frames():
+                yield encoder.encode(frame)
+            yield encoder.close()
         except Exception as e:
-             logger.error(f"Error during log streaming: {e}", exc_info=True)
-             yield f"data: {json.dumps({'error': f'Log stream encountered an error: {e}'})}\n\n"
+            logger.error(f"Error during log streaming: {e}", exc_info=True)
+            yield encoder.encode(format_event(json.dumps({'error': f'Log stream encountered an error: {e}'})))
         finally:
-            if 'proc' in locals() and proc.poll() is None:
-                 logger.info("Terminating tail process.")
-                 proc.terminate()
-                 try:
-                     proc.wait(timeout=2)
-                 except subprocess.TimeoutExpired:
-                     proc.kill()
+            subscription.close()
             logger.info("Log stream stopped.")
-            
+
     # Renvoyer la réponse avec le générateur et le bon mimetype
-    return Response(generate(), mimetype='text/event-stream')
+    response = Response(generate(), mimetype='text/event-stream', headers=stream_response_headers(encoding))
+    # Libérer l'abonnement même si le client part avant la première lecture
+    response.call_on_close(subscription.close)
+    return response
 
 # --- ENDPOINTS POUR LES STATISTIQUES (Mis à jour et Nouveaux) --- 
 
-def parse_eve_json_lines(filepath, max_lines=2000, event_filter=None):
-    """Lit les N dernières lignes d'eve.json et parse le JSON.
-       Retourne une liste d'événements décodés.
-       Peut filtrer par event_type si spécifié.
+def parse_eve_json_lines(filepath, max_lines=2000, event_filter=None, max_bytes=None):
+    """Lit eve.json depuis la fin et retourne les max_lines derniers événements décodés.
+       La lecture continue dans les fichiers tournés et compressés (eve.json.1, eve.json.2.gz...).
+       Si event_filter est spécifié, retourne les max_lines derniers événements de ce type.
+       Avec event_filter, les lignes d'un autre type sont écartées avant décodage.
+       La lecture s'arrête dès que le compte est atteint (ou après max_bytes lus).
+       Les événements sont retournés dans l'ordre chronologique.
     """
     try:
-        with open(filepath, 'r') as f:
-            # Utiliser deque pour garder seulement les N dernières lignes en mémoire
-            # Ceci est plus efficace que de lire tout le fichier pour les gros logs
-            last_lines = deque(f, maxlen=max_lines)
-        
         events = []
-        for line in last_lines:
+        if max_lines <= 0:
+            return events
+        prefilter = EventTypePrefilter((event_filter,)) if event_filter is not None else None
+        for line in LogSet(filepath).iter_lines_reverse(max_bytes=max_bytes, use_mmap=EVE_READER_USE_MMAP):
+            if prefilter is not None and not prefilter.matches(line):
+                continue
             try:
-                event = json.loads(line)
-                if event_filter is None or event.get('event_type') == event_filter:
-                    events.append(event)
-            except json.JSONDecodeError:
-                logger.warning(f"Skipping malformed JSON line in {filepath}: {line.strip()}")
+                event = loads(line)
+            except ValueError:
+                logger.warning(f"Skipping malformed JSON line in {filepath}: {line[:200]!r}")
                 continue
-        logger.info(f"Parsed {len(events)} events (type: {event_filter or 'any'}) from last {max_lines} lines of {filepath}")
+            if event_filter is None or event.get('event_type') == event_filter:
+                events.append(event)
+                if len(events) >= max_lines:
+                    break
+        events.reverse()
+        logger.info(f"Parsed last {len(events)} events (type: {event_filter or 'any'}) from {filepath}")
         return events
     except FileNotFoundError:
         logger.error(f"Eve JSON file not found at {filepath}")
@@ -387,49 +654,171 @@ def parse_eve_json_lines(filepath, max_lines=2000, event_filter=None):
         logger.error(f"Error reading/parsing {filepath}: {e}")
         return []
 
-@app.route('/api/stats/top_signatures', methods=['GET'])
-def get_top_signatures():
-    """Lit eve.json et retourne les top 10 signatures d'alerte (MODIFIÉ pour utiliser parse_eve_json_lines)."""
-    eve_path = os.path.join(app.root_path, LOGS_FOLDER_PATH, EVE_JSON_FILE)
-    logger.info(f"Attempting to read alert statistics from: {eve_path}")
-
-    # Lire ~5000 dernières lignes pour trouver des alertes
-    events = parse_eve_json_lines(eve_path, max_lines=5000, event_filter='alert') 
+# --- État partagé alimenté par le tailer eve.json (un par sonde) ---
+_eve_states = {}
+_eve_tailers = {}
+_eve_store_writer = None
+_eve_indexer = None
+_flow_indexer = None
+_iface_pollers = {}
+_eve_store = EveStore(EVE_STORE_DIR, cache_bytes=EVE_STORE_CACHE_BYTES) if EVE_STORE_DIR else None
+set_index_dir(LOG_INDEX_DIR)
+_stats_coordinators = {}
+_eve_tailer_lock = threading.Lock()
+
+def start_eve_tailer(sensor=None):
+    """Attache le tailer au follower de l'eve.json d'une sonde et retourne l'état qu'il alimente."""
+    global _eve_store_writer, _eve_indexer, _flow_indexer
+    sensor = sensor or PRIMARY_SENSOR
+    if sensor.name not in _eve_tailers:
+        follower = get_follower(sensor_eve_path(sensor), poll_interval=EVE_TAIL_POLL_INTERVAL)
+        state = _eve_states[sensor.name] = EveStatsState(sketch_capacity=STATS_SKETCH_CAPACITY)
+        # L'amorçage (relecture de la fin du fichier) est synchrone: la
+        # première requête a déjà des données
+        tailer = _eve_tailers[sensor.name] = EveTailer(follower, state)
+        tailer.start()
+        if _eve_store is not None and sensor is PRIMARY_SENSOR:
+            # Le rattrapage du stockage colonnaire se fait en arrière-plan
+            _eve_store_writer = EveStoreWriter(EVE_STORE_DIR, follower, retention_days=EVE_STORE_RETENTION_DAYS,
+                                               backfill_bytes=EVE_STORE_BACKFILL_BYTES)
+            _eve_store_writer.start()
+        if sensor is PRIMARY_SENSOR:
+            # Index de recherche construit ici seulement, publié pour les autres workers
+            _eve_indexer = EveIndexer(EveIndex(sensor_eve_path(sensor), shared_dir=eve_index_dir()),
+                                      interval=EVE_INDEX_INTERVAL)
+            _eve_indexer.start()
+            # Index flow_id -> positions du writer (relecture de l'historique hors verrou du follower)
+            _flow_indexer = FlowIndexer(follower, FlowIndex(EVE_FLOW_INDEX_SIZE, EVE_FLOW_INDEX_TTL),
+                                        backfill_bytes=EVE_FLOW_BACKFILL_BYTES)
+            _flow_indexer.start()
+        if IFACE_STATS_INTERVAL > 0:
+            poller = _iface_pollers[sensor.name] = InterfaceStatsPoller(
+                lambda command_data: get_command_pool(sensor).execute(command_data),
+                state, interval=IFACE_STATS_INTERVAL)
+            poller.start()
+    return _eve_states[sensor.name]
+
+def sensor_shared_dir(sensor):
+    """Répertoire partagé des données publiées par le writer d'une sonde (STATS_SHARED_DIR défini)."""
+    return STATS_SHARED_DIR if len(SENSORS) == 1 else os.path.join(STATS_SHARED_DIR, sensor.name)
+
+def eve_index_dir():
+    """Répertoire où le writer publie l'index de recherche, None sans STATS_SHARED_DIR."""
+    return os.path.join(sensor_shared_dir(PRIMARY_SENSOR), 'eve-index') if STATS_SHARED_DIR else None
+
+def sensor_state(sensor):
+    """État d'une sonde (appelé sous _eve_tailer_lock)."""
+    if not STATS_SHARED_DIR:
+        return start_eve_tailer(sensor)
+    coordinator = _stats_coordinators.get(sensor.name)
+    if coordinator is None:
+        # Une élection par sonde: les writers peuvent être des workers différents
+        coordinator = _stats_coordinators[sensor.name] = SingleWriterCoordinator(
+            sensor_shared_dir(sensor), lambda: start_eve_tailer(sensor), publish_interval=STATS_PUBLISH_INTERVAL)
+        coordinator.start()
+    return coordinator.state()
+
+def get_eve_state(sensors=None):
+    """Retourne l'état des statistiques à utiliser pour répondre aux requêtes.
+
+    Sans STATS_SHARED_DIR, le tailer est attaché au premier appel. Avec,
+    seul le worker élu writer suit eve.json; les autres lisent son instantané.
+    sensors: tuple de noms (parse_sensor_names), toutes les sondes pour None;
+    plusieurs sondes sont présentées fusionnées (MergedStatsState).
+    """
+    selected = selected_sensors(sensors)
+    with _eve_tailer_lock:
+        states = {sensor.name: sensor_state(sensor) for sensor in selected}
+    if len(states) == 1:
+        return next(iter(states.values()))
+    return MergedStatsState(states)
+
+def parse_stats_window(args):
+    """Retourne la fenêtre demandée ou None si elle est invalide.
+
+    5m, 1h et 24h sont servies par les agrégats en mémoire; toute autre durée
+    ('7d', '48h'...) l'est par le stockage colonnaire s'il est activé.
+    """
+    window = args.get('window', DEFAULT_WINDOW)
+    if window in DEFAULT_WINDOWS:
+        return window
+    if _eve_store is None:
+        return None
+    try:
+        return window if parse_window(window) > 0 else None
+    except ValueError:
+        return None
+
+def invalid_window_payload():
+    allowed = ', '.join(DEFAULT_WINDOWS)
+    if _eve_store is not None:
+        allowed += " or any duration such as 7d, 48h (historical)"
+    return {"error": f"Invalid window. Allowed values: {allowed}"}
+
+# Les fonctions build_* calculent le contenu des endpoints de stats sous forme
+# (payload, code HTTP), indépendamment du serveur (Flask ou mode asyncio).
+
+# Top-K exposés: nom d'endpoint -> (event_type, méthode de EveStatsState, colonne du stockage, description pour les logs)
+TOP_STATS = {
+    'top_signatures': ('alert', 'top_signatures', 'signature', 'alert signatures'),
+    'top_dns': ('dns', 'top_dns', 'rrname', 'DNS query names'),
+    'top_tls_sni': ('tls', 'top_tls_sni', 'sni', 'TLS SNIs'),
+}
+
+def historical_top(column, window, n=10):
+    """Top-n d'une colonne du stockage sur la fenêtre, relative au dernier événement stocké."""
+    end = _eve_store.latest_timestamp()
+    if end is None:
+        return [], 0
+    return _eve_store.top(column, end - parse_window(window), end + 1e-6, n)
+
+def build_top_stats(name, window, state=None):
+    """Top 10 de l'agrégateur `name` sur la fenêtre donnée: {"labels", "values", "window"}."""
+    event_type, method, column, description = TOP_STATS[name]
+    if window in DEFAULT_WINDOWS:
+        top_10, unique_count = getattr(state or get_eve_state(), method)(10, window)
+    else:
+        top_10, unique_count = historical_top(column, window)
 
-    if not events:
+    if not top_10:
         # Pas forcément une erreur, peut juste être vide
-        logger.info("No 'alert' events found in recent log lines.")
-        return jsonify({"labels": [], "values": []})
-
-    signature_counts = Counter()
-    for event in events:
-         # Vérifier la structure
-        if 'alert' in event and isinstance(event['alert'], dict) and 'signature' in event['alert']:
-             signature_counts[event['alert']['signature']] += 1
+        logger.info(f"No '{event_type}' events found in the last {window}.")
+        return {"labels": [], "values": [], "window": window}, 200
 
-    top_10 = signature_counts.most_common(10)
     labels = [item[0] for item in top_10]
     values = [item[1] for item in top_10]
 
-    logger.info(f"Found {len(signature_counts)} unique alert signatures in recent lines.")
-    return jsonify({"labels": labels, "values": values})
+    logger.info(f"Found {unique_count} unique {description} in the last {window}.")
+    return {"labels": labels, "values": values, "window": window}, 200
 
-@app.route('/api/stats/latest_counters', methods=['GET'])
-def get_latest_counters():
-    """Extrait les compteurs du DERNIER événement 'stats' trouvé dans eve.json."""
-    eve_path = os.path.join(app.root_path, LOGS_FOLDER_PATH, EVE_JSON_FILE)
-    logger.info(f"Attempting to read latest 'stats' event from: {eve_path}")
+def read_stats_events(max_lines, sensors=None):
+    """Derniers événements 'stats' lus sur disque (quand le tailer n'en a vu aucun).
 
-    # Lire les ~500 dernières lignes (les stats sont fréquentes)
-    events = parse_eve_json_lines(eve_path, max_lines=500, event_filter='stats')
+    Seulement pour une sonde unique: une somme de relectures partielles
+    n'aurait pas de sens.
+    """
+    selected = selected_sensors(sensors)
+    if len(selected) != 1:
+        return []
+    eve_path = sensor_eve_path(selected[0])
+    return parse_eve_json_lines(eve_path, max_lines=max_lines, event_filter='stats', max_bytes=EVE_FALLBACK_MAX_BYTES)
 
-    if not events:
+def build_latest_counters(state=None, stats_events=None, sensors=None):
+    """Extrait les compteurs du DERNIER événement 'stats' vu par le tailer.
+
+    stats_events: événements 'stats' déjà relus sur disque, utilisés si le
+    tailer n'en a vu aucun (sinon ils sont relus ici).
+    """
+    latest_stats_event = (state or get_eve_state(sensors)).get_latest_stats()
+    if latest_stats_event is None:
+        # Aucun 'stats' dans la fenêtre d'amorçage: chercher le dernier sur disque
+        events = stats_events if stats_events is not None else read_stats_events(1, sensors)
+        latest_stats_event = events[-1] if events else None
+
+    if latest_stats_event is None:
         logger.warning("No 'stats' events found in recent log lines.")
-        return jsonify({"error": "No recent stats events found."}), 404
+        return {"error": "No recent stats events found."}, 404
 
-    # Le dernier événement dans la liste est le plus récent trouvé dans les lignes lues
-    latest_stats_event = events[-1] 
-    
     # Extraire les sections intéressantes (capture, decoder, flow, app_layer)
     stats_data = latest_stats_event.get('stats', {})
     counters = {
@@ -441,100 +830,349 @@ def get_latest_counters():
     }
     
     logger.info(f"Returning latest counters from timestamp: {counters.get('timestamp')}")
-    return jsonify(counters)
-
-@app.route('/api/stats/top_dns', methods=['GET'])
-def get_top_dns():
-    """Analyse les événements DNS récents pour trouver les noms de domaine les plus demandés."""
-    eve_path = os.path.join(app.root_path, LOGS_FOLDER_PATH, EVE_JSON_FILE)
-    logger.info(f"Attempting to read DNS query statistics from: {eve_path}")
+    return counters, 200
+
+def build_capture_history(state=None, stats_events=None, sensors=None):
+    """Historique récent des paquets capturés/perdus à partir des événements stats."""
+    history = (state or get_eve_state(sensors)).get_capture_history()
+    if not history:
+        # Aucun 'stats' dans la fenêtre d'amorçage: relire les derniers sur disque
+        events = stats_events if stats_events is not None else read_stats_events(CAPTURE_HISTORY_FALLBACK_EVENTS, sensors)
+        for event in events:
+            point = capture_point(event)
+            if point is not None:
+                history.append(point)
+
+    if not history:
+        logger.warning("No 'stats' events found for capture history.")
+        return {"timestamps": [], "packets": [], "drops": []}, 200
 
-    # Lire ~2000 dernières lignes pour trouver des requêtes DNS
-    events = parse_eve_json_lines(eve_path, max_lines=2000, event_filter='dns') 
+    # kernel_packets/kernel_drops: compteurs spécifiques à l'interface de capture
+    timestamps = [point[0] for point in history]
+    packets = [point[1] for point in history]
+    drops = [point[2] for point in history]
 
-    if not events:
-        logger.info("No 'dns' events found in recent log lines.")
-        return jsonify({"labels": [], "values": []})
+    logger.info(f"Returning capture history with {len(timestamps)} data points.")
+    return {"timestamps": timestamps, "packets": packets, "drops": drops}, 200
+
+# Nombre d'événements 'stats' relus sur disque pour capture_history
+CAPTURE_HISTORY_FALLBACK_EVENTS = 500
+
+# Réponses des endpoints de stats, recalculées seulement quand de nouveaux
+# événements ont été ingérés (voir stats_cache.py)
+_stats_cache = StatsCache(max_entries=STATS_CACHE_MAX_ENTRIES)
+
+def stats_version(window=None, sensors=None):
+    """Version des données d'un endpoint de stats: change dès qu'un événement est ingéré."""
+    if window is not None and window not in DEFAULT_WINDOWS:
+        return _eve_store.version()
+    return get_eve_state(sensors).version
+
+def build_cached_stats(name, window=None, sensors=None):
+    """CachedResponse de l'endpoint de stats `name` (top_*, latest_counters, capture_history)."""
+    if name in TOP_STATS:
+        compute = lambda: build_top_stats(name, window, get_eve_state(sensors))
+    elif name == 'latest_counters':
+        compute = lambda: build_latest_counters(get_eve_state(sensors), sensors=sensors)
+    else:
+        compute = lambda: build_capture_history(get_eve_state(sensors), sensors=sensors)
+    return _stats_cache.get((name, window, sensors), stats_version(window, sensors), compute)
+
+def conditional_response(entry):
+    """Réponse HTTP d'une CachedResponse: 304 si le client a déjà cette version."""
+    if entry.not_modified(request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')):
+        return Response(status=304, headers=entry.headers)
+    return Response(entry.body, status=entry.status, mimetype='application/json', headers=entry.headers)
+
+def build_stats_rates(resolution, threads=False, state=None):
+    """Débits (paquets/s, pertes/s...), deltas et % de pertes calculés à partir des événements stats."""
+    series = (state or get_eve_state()).get_stats_series(resolution, threads)
+    logger.info(f"Returning {len(series['timestamps'])} stats rate points at {resolution} resolution.")
+    return series, 200
+
+def build_interface_stats(resolution, state=None):
+    """Débits, pertes et déséquilibre par interface de capture (relevés iface-stat)."""
+    series = (state or get_eve_state()).get_interface_series(resolution)
+    logger.info(f"Returning {len(series['timestamps'])} interface stats points for "
+                f"{len(series['interfaces'])} interface(s) at {resolution} resolution.")
+    return series, 200
+
+def build_cached_interface_stats(resolution, sensors=None):
+    return _stats_cache.get(('interfaces', resolution, sensors), stats_version(sensors=sensors),
+                            lambda: build_interface_stats(resolution, get_eve_state(sensors)))
+
+def build_cached_rates(resolution, threads=False, sensors=None):
+    return _stats_cache.get(('rates', resolution, threads, sensors), stats_version(sensors=sensors),
+                            lambda: build_stats_rates(resolution, threads, get_eve_state(sensors)))
+
+def parse_stats_request(args, historical=True):
+    """Retourne (fenêtre, sondes, None) ou (None, None, payload d'erreur) pour les paramètres ?window=&sensors=."""
+    window = parse_stats_window(args) if historical else None
+    if historical and window is None:
+        return None, None, invalid_window_payload()
+    try:
+        sensors = parse_sensor_names(args.get('sensors'), SENSORS)
+    except ValueError as e:
+        return None, None, {"error": str(e)}
+    if window is not None and window not in DEFAULT_WINDOWS and sensors and PRIMARY_SENSOR.name not in sensors:
+        return None, None, {"error": f"Historical windows are only available for sensor '{PRIMARY_SENSOR.name}'."}
+    return window, sensors, None
+
+def parse_resolution(args):
+    """Retourne (résolution, None) ou (None, payload d'erreur) pour ?resolution=."""
+    resolution = args.get('resolution', DEFAULT_RESOLUTION)
+    if resolution not in RESOLUTIONS:
+        return None, {"error": f"Invalid resolution. Allowed values: {', '.join(RESOLUTIONS)}"}
+    return resolution, None
+
+def top_stats_response(name):
+    window, sensors, error = parse_stats_request(request.args)
+    if error:
+        return jsonify(error), 400
+    return conditional_response(build_cached_stats(name, window, sensors))
+
+def counters_stats_response(name):
+    _, sensors, error = parse_stats_request(request.args, historical=False)
+    if error:
+        return jsonify(error), 400
+    return conditional_response(build_cached_stats(name, sensors=sensors))
 
-    dns_counts = Counter()
-    for event in events:
-        # Compter seulement les requêtes (type query) et si rrname existe
-        if event.get('dns', {}).get('type') == 'query' and 'rrname' in event.get('dns', {}):
-            dns_counts[event['dns']['rrname']] += 1
+@app.route('/api/stats/top_signatures', methods=['GET'])
+def get_top_signatures():
+    """Retourne les top 10 signatures d'alerte sur la fenêtre ?window= (5m, 1h, 24h, ou durée historique: 7d...)."""
+    return top_stats_response('top_signatures')
 
-    top_10 = dns_counts.most_common(10)
-    labels = [item[0] for item in top_10]
-    values = [item[1] for item in top_10]
+@app.route('/api/stats/latest_counters', methods=['GET'])
+def get_latest_counters():
+    """Extrait les compteurs du DERNIER événement 'stats' vu par le tailer."""
+    return counters_stats_response('latest_counters')
 
-    logger.info(f"Found {len(dns_counts)} unique DNS query names in recent lines.")
-    return jsonify({"labels": labels, "values": values})
+@app.route('/api/stats/top_dns', methods=['GET'])
+def get_top_dns():
+    """Retourne les noms de domaine les plus demandés sur la fenêtre ?window= (5m, 1h, 24h, ou durée historique: 7d...)."""
+    return top_stats_response('top_dns')
 
 @app.route('/api/stats/top_tls_sni', methods=['GET'])
 def get_top_tls_sni():
-    """Analyse les événements TLS récents pour trouver les SNI les plus fréquents."""
-    eve_path = os.path.join(app.root_path, LOGS_FOLDER_PATH, EVE_JSON_FILE)
-    logger.info(f"Attempting to read TLS SNI statistics from: {eve_path}")
-
-    # Lire ~2000 dernières lignes pour trouver des événements TLS
-    events = parse_eve_json_lines(eve_path, max_lines=2000, event_filter='tls') 
-
-    if not events:
-        logger.info("No 'tls' events found in recent log lines.")
-        return jsonify({"labels": [], "values": []})
-
-    sni_counts = Counter()
-    for event in events:
-        # Vérifier si tls.sni existe
-        if 'sni' in event.get('tls', {}):
-            sni_counts[event['tls']['sni']] += 1
-
-    top_10 = sni_counts.most_common(10)
-    labels = [item[0] for item in top_10]
-    values = [item[1] for item in top_10]
-
-    logger.info(f"Found {len(sni_counts)} unique TLS SNIs in recent lines.")
-    return jsonify({"labels": labels, "values": values})
+    """Retourne les SNI les plus fréquents sur la fenêtre ?window= (5m, 1h, 24h, ou durée historique: 7d...)."""
+    return top_stats_response('top_tls_sni')
 
 # --- NOUVEL ENDPOINT POUR L'HISTORIQUE DES PAQUETS --- 
 @app.route('/api/stats/capture_history', methods=['GET'])
 def get_capture_history():
     """Récupère l'historique récent des paquets capturés/perdus à partir des événements stats."""
-    eve_path = os.path.join(app.root_path, LOGS_FOLDER_PATH, EVE_JSON_FILE)
-    logger.info(f"Attempting to read capture history from: {eve_path}")
+    return counters_stats_response('capture_history')
+
+@app.route('/api/stats/rates', methods=['GET'])
+def get_stats_rates():
+    """Débits et deltas des compteurs, par bucket: ?resolution=1s|1m|1h&threads=1 (détail et résumé par thread)."""
+    _, sensors, error = parse_stats_request(request.args, historical=False)
+    resolution, resolution_error = parse_resolution(request.args)
+    if error or resolution_error:
+        return jsonify(error or resolution_error), 400
+    threads = request.args.get('threads') == '1'
+    return conditional_response(build_cached_rates(resolution, threads, sensors))
+
+@app.route('/api/stats/interfaces', methods=['GET'])
+def get_interface_stats():
+    """Débits et pertes par interface (iface-stat, toutes les IFACE_STATS_INTERVAL s): ?resolution=1s|1m|1h."""
+    _, sensors, error = parse_stats_request(request.args, historical=False)
+    resolution, resolution_error = parse_resolution(request.args)
+    if error or resolution_error:
+        return jsonify(error or resolution_error), 400
+    return conditional_response(build_cached_interface_stats(resolution, sensors))
+
+# --- TABLEAU DE BORD: TOUS LES WIDGETS EN UNE REQUÊTE ---
+# Widgets de /api/dashboard (noms des endpoints /api/stats/ correspondants)
+DASHBOARD_WIDGETS = ('top_signatures', 'top_dns', 'top_tls_sni', 'latest_counters', 'capture_history')
+
+def parse_dashboard_widgets(args):
+    """Widgets demandés par ?include=a,b et/ou ?exclude=c (tous par défaut). Lève ValueError si un nom est inconnu."""
+    def names(param):
+        values = [name.strip() for name in args.get(param, '').split(',') if name.strip()]
+        unknown = [name for name in values if name not in DASHBOARD_WIDGETS]
+        if unknown:
+            raise ValueError(f"Unknown widget(s) in {param}: {', '.join(unknown)}. "
+                             f"Allowed: {', '.join(DASHBOARD_WIDGETS)}")
+        return values
+
+    include = names('include') or DASHBOARD_WIDGETS
+    exclude = names('exclude')
+    return tuple(name for name in DASHBOARD_WIDGETS if name in include and name not in exclude)
+
+def build_dashboard(window, widgets, sensors=None):
+    """Contenu de tous les widgets demandés, calculés sur un même état: {"window", "sensors", "widgets"}.
+
+    Les widgets en erreur (pas d'événement 'stats'...) contiennent {"error": ...}.
+    """
+    state = get_eve_state(sensors)
+    stats_events = None
+    if state.get_latest_stats() is None and ('latest_counters' in widgets or 'capture_history' in widgets):
+        # Une seule relecture du disque pour les deux widgets
+        stats_events = read_stats_events(CAPTURE_HISTORY_FALLBACK_EVENTS, sensors)
+    results = {}
+    for name in widgets:
+        if name in TOP_STATS:
+            payload, _ = build_top_stats(name, window, state)
+        elif name == 'latest_counters':
+            payload, _ = build_latest_counters(state, stats_events, sensors)
+        else:
+            payload, _ = build_capture_history(state, stats_events, sensors)
+        results[name] = payload
+    selected = list(sensors) if sensors else [sensor.name for sensor in SENSORS]
+    return {"window": window, "sensors": selected, "widgets": results}, 200
+
+def build_cached_dashboard(window, widgets, sensors=None):
+    """CachedResponse de /api/dashboard (invalidée comme celles des endpoints de stats)."""
+    version = stats_version(sensors=sensors)
+    if window not in DEFAULT_WINDOWS:
+        version = (version, stats_version(window))
+    return _stats_cache.get(('dashboard', window, widgets, sensors), version,
+                            lambda: build_dashboard(window, widgets, sensors))
+
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    """Tous les widgets de la page en une requête: ?window=1h&sensors=nic0,nic1&include=top_dns&exclude=..."""
+    window, sensors, error = parse_stats_request(request.args)
+    if error:
+        return jsonify(error), 400
+    try:
+        widgets = parse_dashboard_widgets(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return conditional_response(build_cached_dashboard(window, widgets, sensors))
 
-    # Lire un nombre suffisant de lignes pour avoir plusieurs points de stats
-    # Ajuster max_lines en fonction de la fréquence des stats (souvent toutes les 8-10s)
-    # 500 lignes -> ~40-50 points de stats si log toutes les 10s ?
-    events = parse_eve_json_lines(eve_path, max_lines=500, event_filter='stats')
+# --- RECHERCHE DANS L'HISTORIQUE EVE ---
+_eve_index = None
+_eve_index_lock = threading.Lock()
 
-    if not events:
-        logger.warning("No 'stats' events found for capture history.")
-        return jsonify({"timestamps": [], "packets": [], "drops": []})
+def get_eve_index():
+    """Index de recherche d'eve.json et de ses fichiers tournés.
+
+    Il est construit en arrière-plan par le writer (start_eve_tailer); les
+    autres workers relisent ce qu'il publie dans STATS_SHARED_DIR.
+    """
+    global _eve_index
+    if not STATS_SHARED_DIR:
+        with _eve_tailer_lock:
+            start_eve_tailer()
+    if _eve_indexer is not None:
+        return _eve_indexer.index
+    with _eve_index_lock:
+        if _eve_index is None:
+            _eve_index = EveIndex(sensor_eve_path(), shared_dir=eve_index_dir(), writer=False)
+        return _eve_index
+
+def build_event_search(args):
+    """Retourne (payload, status) pour /api/events/search."""
+    try:
+        query = SearchQuery.from_args(args)
+    except ValueError as e:
+        return {"error": f"Invalid search parameters: {e}"}, 400
+    result = get_eve_index().search(query)
+    logger.info(f"Event search returned {result['count']} events ({result['scanned_blocks']} blocks scanned"
+                f"{'' if result['complete'] else ', indexing in progress'}).")
+    return result, 200
+
+@app.route('/api/events/search', methods=['GET'])
+def search_events():
+    """Recherche d'événements par plage de temps et champs (voir eve_index.SearchQuery).
+       La pagination se fait avec ?cursor= (valeur next_cursor de la page précédente).
+       complete=false: l'indexation n'a pas encore couvert tout l'historique (résultats partiels).
+    """
+    payload, status = build_event_search(request.args)
+    return jsonify(payload), status
 
-    timestamps = []
-    packets = []
-    drops = []
+# --- CORRÉLATION PAR FLOW_ID ---
 
-    for event in events:
-        stats_data = event.get('stats', {})
-        capture_data = stats_data.get('capture', {})
-        timestamp = event.get("timestamp")
-        # Utiliser kernel_packets/kernel_drops ou le total pkts/drop ?
-        # kernel_* semble plus spécifique à l'interface de capture
-        pkt_count = capture_data.get('kernel_packets') 
-        drop_count = capture_data.get('kernel_drops')
-
-        # On a besoin du timestamp et des compteurs pour ajouter un point
-        if timestamp is not None and pkt_count is not None and drop_count is not None:
-            # Convertir le timestamp ISO en quelque chose que Chart.js time adapter comprend
-            # Le format ISO 8601 est généralement bien géré par les adapters
-            timestamps.append(timestamp)
-            packets.append(pkt_count)
-            drops.append(drop_count)
+def build_flow_bundle(flow_id):
+    """Retourne (payload, status): tous les événements du flux (alert, flow, http, tls, dns, fileinfo...).
 
-    logger.info(f"Returning capture history with {len(timestamps)} data points.")
-    return jsonify({"timestamps": timestamps, "packets": packets, "drops": drops})
+    Le writer sert les flux récents depuis son index flow_id -> positions
+    (démarré avec le tailer); les autres workers, et le writer pour un flux
+    dont l'index ne connaît qu'une partie (évincé, commencé avant le
+    démarrage, fichier compressé depuis), passent par l'index de recherche
+    partagé, dont les filtres de Bloom limitent la lecture aux blocs
+    contenant le flux. Les deux résultats sont alors fusionnés sans doublon.
+    """
+    index = get_eve_index()
+    flow_indexer = _flow_indexer
+    events, complete = flow_indexer.events(flow_id) if flow_indexer is not None else ([], False)
+    source = "flow_index"
+    if not complete:
+        found = index.search(SearchQuery(flow_ids={flow_id}, limit=MAX_EVENTS_PER_FLOW))["events"]
+        if events:
+            # Même ligne lue par les deux index: même contenu
+            seen = {json.dumps(event, sort_keys=True) for event in events}
+            events += [event for event in found if json.dumps(event, sort_keys=True) not in seen]
+            events.sort(key=lambda event: event.get('timestamp', ''))
+            source = "flow_index+search"
+        else:
+            events = found
+            source = "search"
+    if not events:
+        return {"error": f"No events found for flow_id {flow_id}."}, 404
+    event_types = {}
+    for event in events:
+        event_type = event.get('event_type')
+        event_types[event_type] = event_types.get(event_type, 0) + 1
+    logger.info(f"Returning {len(events)} events for flow {flow_id} (source: {source}).")
+    return {"flow_id": flow_id, "count": len(events), "event_types": event_types,
+            "events": events, "source": source}, 200
+
+@app.route('/api/flow/<int:flow_id>', methods=['GET'])
+def get_flow(flow_id):
+    """Retourne tous les événements corrélés à un flow_id, triés par timestamp."""
+    payload, status = build_flow_bundle(flow_id)
+    return jsonify(payload), status
+
+# --- Cycle de vie (serveur de production: voir wsgi.py et gunicorn.conf.py) ---
+_shutdown_done = False
+
+def create_app():
+    """Prépare l'application pour un serveur WSGI et la retourne.
+
+    Démarre les tâches de fond (suivi d'eve.json ou élection du writer des
+    statistiques) dès le chargement du worker plutôt qu'à la première requête.
+    """
+    get_eve_state()
+    atexit.register(shutdown)
+    return app
+
+def shutdown():
+    """Arrêt propre: libère le rôle de writer, détache le tailer, arrête les followers et le pool."""
+    global _shutdown_done, _eve_store_writer, _eve_indexer, _flow_indexer
+    with _eve_tailer_lock:
+        if _shutdown_done:
+            return
+        _shutdown_done = True
+        for coordinator in _stats_coordinators.values():
+            coordinator.stop()
+        _stats_coordinators.clear()
+        for tailer in _eve_tailers.values():
+            tailer.stop()
+        _eve_tailers.clear()
+        if _eve_store_writer is not None:
+            _eve_store_writer.stop()
+            _eve_store_writer = None
+        if _eve_indexer is not None:
+            _eve_indexer.stop()
+            _eve_indexer = None
+        if _flow_indexer is not None:
+            _flow_indexer.stop()
+            _flow_indexer = None
+        for poller in _iface_pollers.values():
+            poller.stop()
+        _iface_pollers.clear()
+    # Les flux SSE en cours reçoivent 'Log stream stopped by server.'
+    stop_all_followers()
+    with _command_pool_lock:
+        for pool in _command_pools.values():
+            pool.close()
+        _command_pools.clear()
+    logger.info("Background tasks stopped.")
 
 if __name__ == '__main__':
-    # Make sure to run with a production server like gunicorn or waitress in production
-    app.run(host='0.0.0.0', port=5001, debug=True) # Use a different port than common defaults 
\ No newline at end of file
+    # Serveur de développement; en production: gunicorn -c gunicorn.conf.py wsgi:application
+    create_app().run(host='0.0.0.0', port=5001, threaded=True,
+                     debug=os.environ.get('FLASK_DEBUG', '0') == '1') # Use a different port than common defaults
@@ -0,0 +1,318 @@
+"""Variante asyncio (ASGI) de l'API web, basée sur Quart.
+
+Expose les mêmes routes et le même contrat JSON que app.py, mais sert les
+flux SSE et les commandes Suricata depuis une boucle d'événements: un client
+SSE connecté coûte une coroutine et non un thread, et les commandes passent
+par un pool de connexions asyncio. L'état partagé (tailer eve, agrégats,
+configuration) reste celui de app.py; les calculs de statistiques,
+synchrones, sont exécutés dans un thread (asyncio.to_thread).
+
+Lancement (depuis web/):
+    hypercorn asgi_app:app --bind 0.0.0.0:5001
+"""
+import asyncio
+import json
+import os
+
+from quart import Quart, request, jsonify, send_from_directory, Response
+
+import app as core
+from log_follower import get_follower
+from sse import SSEEncoder, format_event
+from unix_client import AsyncSuricataSocketPool, SuricataCommandError
+
+logger = core.logger
+
+SURICATA_UPDATE_TIMEOUT = 120
+
+app = Quart(__name__, static_folder=core.STATIC_FOLDER_PATH, static_url_path='')
+# Les flux SSE sont de longue durée: pas de délai maximal de réponse
+app.config['RESPONSE_TIMEOUT'] = None
+app.config['BODY_TIMEOUT'] = None
+
+_command_pools = {}
+
+def get_command_pool(sensor=None):
+    """Retourne le pool asyncio de connexions vers le socket de commande d'une sonde."""
+    sensor = sensor or core.PRIMARY_SENSOR
+    pool = _command_pools.get(sensor.name)
+    if pool is None:
+        pool = _command_pools[sensor.name] = AsyncSuricataSocketPool(
+            sensor.socket_path, max_connections=core.SURICATA_SOCKET_POOL_SIZE, timeout=core.SURICATA_SOCKET_TIMEOUT,
+            max_message_size=core.SURICATA_SOCKET_MAX_MESSAGE_SIZE)
+    return pool
+
+async def send_unix_command(command_data, sensor=None):
+    """Équivalent asynchrone de app.send_unix_command (même format de retour)."""
+    sensor = sensor or core.PRIMARY_SENSOR
+    if not os.path.exists(sensor.socket_path):
+        logger.error(f"Socket file not found at {sensor.socket_path}")
+        return {"status": "error", "message": f"Socket file not found at {sensor.socket_path}. Is Suricata running and configured for Unix socket?"}
+
+    try:
+        logger.info(f"Sending command to sensor {sensor.name}: {command_data}")
+        response_json = await get_command_pool(sensor).execute(command_data)
+        return {"status": "success", "data": response_json}
+    except SuricataCommandError as e:
+        logger.error(f"Suricata command error: {e}")
+        return {"status": "error", "message": str(e)}
+    except asyncio.TimeoutError:
+        logger.error("Timeout waiting for Suricata response")
+        return {"status": "error", "message": "Socket communication error: timed out"}
+    except OSError as e:
+        logger.error(f"Socket error: {e}")
+        return {"status": "error", "message": f"Socket communication error: {e}"}
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+
+@app.before_serving
+async def start_background_tasks():
+    await asyncio.to_thread(core.create_app)
+
+@app.after_serving
+async def stop_background_tasks():
+    for pool in _command_pools.values():
+        pool.close()
+    _command_pools.clear()
+    await asyncio.to_thread(core.shutdown)
+
+# --- Fichiers statiques et logs ---
+@app.route('/')
+async def index():
+    """Serve the main HTML page."""
+    return await send_from_directory(app.static_folder, 'index.html')
+
+async def iterate_in_thread(chunks):
+    """Itère un générateur bloquant (lecture de fichier) sans bloquer la boucle d'événements."""
+    iterator = iter(chunks)
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, None)
+        if chunk is None:
+            break
+        yield chunk
+
+@app.route('/logs/<path:filename>')
+async def serve_log(filename):
+    """Même contrat que app.serve_log (Range, tail_bytes, pages de lignes)."""
+    logs_dir = os.path.join(core.app.root_path, core.LOGS_FOLDER_PATH)
+    if not os.path.exists(logs_dir):
+        logger.error(f"Logs directory not found at {logs_dir}")
+        return jsonify({"error": "Logs directory not configured or not found on server."}), 404
+    page = await asyncio.to_thread(core.build_log_page, filename, request.args)
+    if page is not None:
+        payload, status = page
+        return jsonify(payload), status
+    download = await asyncio.to_thread(core.build_log_download, filename, request.args,
+                                       request.headers.get('Range'), request.headers.get('Accept-Encoding'))
+    response = Response(iterate_in_thread(download.chunks), status=download.status,
+                        mimetype=download.mimetype, headers=download.headers)
+    response.timeout = None
+    return response
+
+# --- API ---
+@app.route('/api/command', methods=['POST'])
+async def handle_command():
+    """Receives a command from the frontend and sends it to Suricata via Unix socket."""
+    data = await request.get_json(silent=True)
+    if not data or 'command' not in data:
+        return jsonify({"status": "error", "message": "Invalid request. 'command' field missing."}), 400
+
+    suricata_command = {"command": data['command']}
+    if 'arguments' in data:
+        suricata_command['arguments'] = data['arguments']
+
+    if len(core.SENSORS) == 1 and 'sensors' not in data:
+        result = await send_unix_command(suricata_command)
+        if result['status'] == 'success':
+            return jsonify(result['data'])
+        return jsonify({"return": "FAILED", "message": result['message']}), 500
+
+    # Même contrat que app.build_command_fanout, envois concurrents sur la boucle
+    try:
+        sensors = core.parse_command_sensors(data.get('sensors'))
+    except ValueError as e:
+        return jsonify({"return": "FAILED", "message": str(e)}), 400
+    results = await asyncio.gather(*(send_unix_command(suricata_command, sensor) for sensor in sensors))
+    status = 200 if any(result['status'] == 'success' for result in results) else 500
+    return jsonify({"sensors": {sensor.name: core.command_result(result)
+                                for sensor, result in zip(sensors, results)}}), status
+
+@app.route('/api/sensors', methods=['GET'])
+async def get_sensors():
+    return jsonify(core.build_sensors())
+
+@app.route('/api/config/<filename>', methods=['GET'])
+async def get_config_file(filename):
+    payload, status = await asyncio.to_thread(core.build_config_read, filename)
+    return jsonify(payload), status
+
+@app.route('/api/config/<filename>', methods=['POST'])
+async def save_config_file(filename):
+    data = await request.get_json(silent=True)
+    payload, status = await asyncio.to_thread(core.build_config_save, filename, data)
+    return jsonify(payload), status
+
+@app.route('/api/run-suricata-update', methods=['POST'])
+async def run_suricata_update():
+    """Exécute suricata-update via docker compose sans bloquer la boucle d'événements."""
+    command = ["docker", "compose", "exec", "suricata", "suricata-update"]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except FileNotFoundError:
+        logger.error("'docker' command not found. Is Docker CLI installed in the web container and docker.sock mounted?")
+        return jsonify({"status": "error", "message": "Docker command not found in web container."}), 500
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), SURICATA_UPDATE_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        logger.error("suricata-update command timed out.")
+        return jsonify({"status": "error", "message": f"suricata-update command timed out after {SURICATA_UPDATE_TIMEOUT} seconds."}), 500
+
+    stdout = stdout.decode('utf-8', errors='replace')
+    stderr = stderr.decode('utf-8', errors='replace')
+    if process.returncode != 0:
+        logger.error(f"Failed to execute suricata-update. Return code: {process.returncode}")
+        return jsonify({
+            "status": "error",
+            "message": "Failed to execute suricata-update. Check backend logs.",
+            "stderr": stderr,
+            "stdout": stdout
+        }), 500
+    logger.info("suricata-update executed successfully.")
+    return jsonify({
+        "status": "success",
+        "message": "suricata-update executed successfully.",
+        "output_summary": stdout[-1000:]
+    })
+
+# --- Flux SSE ---
+@app.route('/api/logs/stream')
+async def stream_logs():
+    """Même contrat que app.stream_logs; chaque client est une coroutine."""
+    logfile_name, log_path = core.resolve_stream_log(request.args.get('logfile', 'eve.json'))
+    if not os.path.exists(log_path):
+        logger.error(f"Cannot start stream: Log file not found at {log_path}")
+        return Response(format_event(json.dumps({'error': f'Log file {logfile_name} not found'})),
+                        mimetype='text/event-stream')
+    try:
+        stream, encoding = core.parse_stream_options(request.args, request.headers.get('Accept-Encoding'))
+    except ValueError as e:
+        logger.warning(f"Invalid log stream parameters: {e}")
+        return Response(format_event(json.dumps({'error': f'Invalid stream parameters: {e}'})),
+                        mimetype='text/event-stream')
+    encoder = SSEEncoder(encoding)
+
+    follower = get_follower(log_path, poll_interval=core.EVE_TAIL_POLL_INTERVAL)
+    subscription = follower.subscribe_async(asyncio.get_running_loop(), core.STREAM_CLIENT_QUEUE_SIZE)
+
+    async def generate():
+        try:
+            for frame in stream.opening():
+                yield encoder.encode(frame)
+            while True:
+                lines = await subscription.get(timeout=stream.timeout())
+                if subscription.closed:
+                    yield encoder.encode(format_event(json.dumps({'error': 'Log stream stopped by server.'})))
+                    break
+                dropped = subscription.take_dropped()
+                if dropped:
+                    logger.warning(f"Slow SSE client on {logfile_name}: {dropped} lines dropped")
+                for frame in stream.on_lines(lines, dropped):
+                    yield encoder.encode(frame)
+            yield encoder.close()
+        except asyncio.CancelledError:
+            # Client déconnecté
+            raise
+        except Exception as e:
+            logger.error(f"Error during log streaming: {e}", exc_info=True)
+            yield encoder.encode(format_event(json.dumps({'error': f'Log stream encountered an error: {e}'})))
+        finally:
+            subscription.close()
+
+    response = Response(generate(), mimetype='text/event-stream', headers=core.stream_response_headers(encoding))
+    response.timeout = None
+    return response
+
+# --- Statistiques ---
+def conditional_response(entry):
+    if entry.not_modified(request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since')):
+        return Response(b'', status=304, headers=entry.headers)
+    return Response(entry.body, status=entry.status, mimetype='application/json', headers=entry.headers)
+
+async def top_stats_response(name):
+    window, sensors, error = core.parse_stats_request(request.args)
+    if error:
+        return jsonify(error), 400
+    return conditional_response(await asyncio.to_thread(core.build_cached_stats, name, window, sensors))
+
+async def counters_stats_response(name):
+    _, sensors, error = core.parse_stats_request(request.args, historical=False)
+    if error:
+        return jsonify(error), 400
+    return conditional_response(await asyncio.to_thread(core.build_cached_stats, name, None, sensors))
+
+@app.route('/api/stats/top_signatures', methods=['GET'])
+async def get_top_signatures():
+    return await top_stats_response('top_signatures')
+
+@app.route('/api/stats/top_dns', methods=['GET'])
+async def get_top_dns():
+    return await top_stats_response('top_dns')
+
+@app.route('/api/stats/top_tls_sni', methods=['GET'])
+async def get_top_tls_sni():
+    return await top_stats_response('top_tls_sni')
+
+@app.route('/api/stats/latest_counters', methods=['GET'])
+async def get_latest_counters():
+    return await counters_stats_response('latest_counters')
+
+@app.route('/api/stats/capture_history', methods=['GET'])
+async def get_capture_history():
+    return await counters_stats_response('capture_history')
+
+@app.route('/api/stats/rates', methods=['GET'])
+async def get_stats_rates():
+    _, sensors, error = core.parse_stats_request(request.args, historical=False)
+    resolution, resolution_error = core.parse_resolution(request.args)
+    if error or resolution_error:
+        return jsonify(error or resolution_error), 400
+    threads = request.args.get('threads') == '1'
+    entry = await asyncio.to_thread(core.build_cached_rates, resolution, threads, sensors)
+    return conditional_response(entry)
+
+@app.route('/api/stats/interfaces', methods=['GET'])
+async def get_interface_stats():
+    _, sensors, error = core.parse_stats_request(request.args, historical=False)
+    resolution, resolution_error = core.parse_resolution(request.args)
+    if error or resolution_error:
+        return jsonify(error or resolution_error), 400
+    return conditional_response(await asyncio.to_thread(core.build_cached_interface_stats, resolution, sensors))
+
+@app.route('/api/dashboard', methods=['GET'])
+async def get_dashboard():
+    window, sensors, error = core.parse_stats_request(request.args)
+    if error:
+        return jsonify(error), 400
+    try:
+        widgets = core.parse_dashboard_widgets(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return conditional_response(await asyncio.to_thread(core.build_cached_dashboard, window, widgets, sensors))
+
+@app.route('/api/events/search', methods=['GET'])
+async def search_events():
+    payload, status = await asyncio.to_thread(core.build_event_search, request.args)
+    return jsonify(payload), status
+
+@app.route('/api/flow/<int:flow_id>', methods=['GET'])
+async def get_flow(flow_id):
+    payload, status = await asyncio.to_thread(core.build_flow_bundle, flow_id)
+    return jsonify(payload), status
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,145 @@
+"""Banc d'essai du décodage des lignes eve (voir eve_decode.py).
+
+    python bench_decode.py                 # échantillon synthétique réaliste
+    python bench_decode.py logs/eve.json   # fichier eve réel (premières lignes)
+
+Compare json.loads, le parseur retenu par eve_decode et les modes
+d'extraction paresseuse de FieldExtractor et le préfiltre par event_type
+d'EventTypePrefilter (leur équivalence avec le décodage complet est
+vérifiée par test_eve_decode.py), puis l'alimentation des statistiques:
+EveStatsState.ingest(json.loads(ligne)) contre ingest_line().
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import eve_decode
+from eve_decode import loads
+from eve_decode import EventTypePrefilter, FieldExtractor, simdjson
+from eve_tailer import EveStatsState
+
+# Champs d'une alerte lus par le tailer
+LAZY_FIELDS = ('event_type', 'timestamp', 'alert.signature')
+
+
+def synthetic_sample(count, seed=1):
+    """Génère des lignes eve au format Suricata (répartition typique des event_type)."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        base = {
+            "timestamp": f"2024-05-01T12:{(i // 600) % 60:02d}:{(i // 10) % 60:02d}.{i % 1000000:06d}+0000",
+            "flow_id": rng.randrange(1 << 50),
+            "in_iface": "eth0",
+            "src_ip": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+            "src_port": rng.randrange(1024, 65535),
+            "dest_ip": f"192.168.{rng.randrange(4)}.{rng.randrange(256)}",
+            "dest_port": rng.choice((53, 80, 443, 8080)),
+            "proto": "TCP",
+            "community_id": "1:" + "".join(rng.choice("abcdefghijklmnop0123456789+/") for _ in range(27)) + "=",
+        }
+        kind = rng.random()
+        if kind < 0.35:
+            base.update(event_type="flow", app_proto="tls", flow={
+                "pkts_toserver": rng.randrange(100), "pkts_toclient": rng.randrange(100),
+                "bytes_toserver": rng.randrange(1 << 20), "bytes_toclient": rng.randrange(1 << 20),
+                "start": base["timestamp"], "end": base["timestamp"], "age": 3, "state": "closed",
+                "reason": "timeout", "alerted": False})
+        elif kind < 0.60:
+            base.update(event_type="dns", proto="UDP", dns={
+                "type": rng.choice(("query", "answer")), "id": rng.randrange(65536),
+                "rrname": f"host{rng.randrange(5000)}.example.com", "rrtype": "A", "tx_id": 0})
+        elif kind < 0.75:
+            base.update(event_type="tls", tls={
+                "subject": "CN=example.org", "issuerdn": "C=US, O=Let's Encrypt, CN=R3",
+                "serial": "04:A1:B2", "fingerprint": "aa:bb:cc:dd:ee:ff:00:11:22:33",
+                "sni": f"site{rng.randrange(2000)}.example.org", "version": "TLS 1.3",
+                "notbefore": "2024-01-01T00:00:00", "notafter": "2024-12-31T00:00:00",
+                "ja3": {"hash": "e7d705a3286e19ea42f587b344ee6865", "string": "771,4865-4866-4867,0-23-65281,29-23-24,0"}})
+        elif kind < 0.85:
+            base.update(event_type="http", http={
+                "hostname": "www.example.com", "url": f"/path/{rng.randrange(10000)}?q=\\u00e9t\\u00e9",
+                "http_user_agent": "Mozilla/5.0 (X11; Linux x86_64)", "http_content_type": "text/html",
+                "http_method": "GET", "protocol": "HTTP/1.1", "status": 200, "length": rng.randrange(100000)})
+        elif kind < 0.93:
+            base.update(event_type="alert", alert={
+                "action": "allowed", "gid": 1, "signature_id": 2000000 + rng.randrange(300), "rev": 3,
+                "signature": f"ET POLICY \"quoted\" rule {rng.randrange(300)}", "category": "Potential Corporate Privacy Violation",
+                "severity": 2, "metadata": {"created_at": ["2020_01_01"], "updated_at": ["2023_06_01"]}},
+                payload_printable="GET / HTTP/1.1\r\nHost: example.com\r\n\r\n")
+        else:
+            base.update(event_type="fileinfo", fileinfo={
+                "filename": "/index.html", "magic": "HTML document, ASCII text", "gaps": False,
+                "state": "CLOSED", "md5": "d41d8cd98f00b204e9800998ecf8427e", "stored": False, "size": 1234, "tx_id": 0})
+        # JSON compact, comme l'écrit Suricata
+        lines.append(json.dumps(base, separators=(',', ':')).encode())
+    return lines
+
+
+def bench(name, func, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    total = sum(len(line) for line in lines)
+    print(f"{name:<28} {len(lines) / best:>12,.0f} lines/s {total / best / 1e6:>9.1f} MB/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('eve_file', nargs='?', help="fichier eve.json (sinon échantillon synthétique)")
+    parser.add_argument('-n', '--lines', type=int, default=50000)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.eve_file:
+        with open(args.eve_file, 'rb') as f:
+            lines = [line.rstrip(b'\n') for _, line in zip(range(args.lines), f) if line.strip()]
+    else:
+        lines = synthetic_sample(args.lines)
+    print(f"{len(lines)} lines, backend: {eve_decode.BACKEND}\n")
+
+    reference = bench("json.loads (stdlib)", json.loads, lines, args.repeat)
+    bench(f"eve_decode.loads ({eve_decode.BACKEND})", eve_decode.loads, lines, args.repeat)
+
+    modes = ['full', 'regex'] + (['simdjson'] if simdjson is not None else [])
+    for mode in modes:
+        extractor = FieldExtractor(LAZY_FIELDS, mode=mode)
+        elapsed = bench(f"lazy 3 fields ({mode})", extractor.extract, lines, args.repeat)
+        print(f"{'':<28} x{reference / elapsed:.1f} vs json.loads")
+
+    print()
+    for types in (('alert',), ('dns', 'tls')):
+        prefilter = EventTypePrefilter(types)
+        wanted = set(types)
+
+        def decode_and_filter(line):
+            return loads(line).get('event_type') in wanted
+
+        def prefilter_then_decode(line):
+            return prefilter.matches(line) and loads(line).get('event_type') in wanted
+
+        label = ','.join(types)
+        reference = bench(f"filter {label} (loads)", decode_and_filter, lines, args.repeat)
+        elapsed = bench(f"filter {label} (prefilter)", prefilter_then_decode, lines, args.repeat)
+        print(f"{'':<28} x{reference / elapsed:.1f} vs loads")
+
+    print()
+    states = [EveStatsState(), EveStatsState()]
+    reference = bench("stats ingest(json.loads)", lambda line: states[0].ingest(json.loads(line)), lines, 1)
+    elapsed = bench("stats ingest_line", states[1].ingest_line, lines, 1)
+    same = all(states[0]._top(a, 50, '24h') == states[1]._top(b, 50, '24h') for a, b in (
+        (states[0].signatures, states[1].signatures), (states[0].dns_queries, states[1].dns_queries),
+        (states[0].tls_sni, states[1].tls_sni)))
+    print(f"{'':<28} x{reference / elapsed:.1f} vs json.loads, identical top-K: {same}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Décodage des lignes eve: parseur le plus rapide disponible et extraction paresseuse.
+
+loads() utilise orjson s'il est installé, sinon pysimdjson, sinon le module
+json standard. Tous acceptent des bytes et lèvent ValueError sur une ligne
+invalide.
+
+FieldExtractor ne récupère que quelques champs ('event_type',
+'alert.signature', 'dns.rrname'...) sans construire le dictionnaire complet
+de l'événement:
+    - 'regex' (par défaut): recherche des clés directement dans les octets
+      de la ligne, sans dépendance; une clé imbriquée est cherchée après
+      l'ouverture de son objet parent, ce qui suppose des feuilles de type
+      chaîne, comme celles écrites par Suricata pour ces champs. Chaque
+      champ coûte une recherche: à réserver à quelques champs;
+    - 'simdjson': document parsé par pysimdjson, champs lus par pointeur
+      JSON (sur des lignes eve de quelques centaines d'octets, le coût des
+      appels Python domine: plus lent que 'full' avec orjson);
+    - 'full': décodage complet par loads() puis parcours.
+
+EventTypePrefilter écarte les lignes d'un autre event_type avant tout
+décodage, par simple recherche de sous-chaîne dans les octets.
+
+Voir bench_decode.py pour comparer les modes sur un échantillon eve.
+"""
+import json
+import re
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+    loads = orjson.loads
+elif simdjson is not None:
+    BACKEND = 'simdjson'
+    loads = simdjson.loads
+else:
+    BACKEND = 'json'
+    loads = json.loads
+
+EXTRACTOR_MODES = ('simdjson', 'regex', 'full')
+
+# Chaîne JSON (boucle déroulée: bien plus rapide que (?:[^"\\]|\\.)*)
+_STRING = rb'"([^"\\]*(?:\\.[^"\\]*)*)"'
+
+
+def _get_path(event, path):
+    value = event
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _regex_for(path):
+    """Expression cherchant la valeur (chaîne) d'un chemin: objets parents puis clé."""
+    prefix = b''.join(re.escape(b'"' + part.encode() + b'"') + rb'\s*:\s*\{.*?' for part in path[:-1])
+    return re.compile(prefix + re.escape(b'"' + path[-1].encode() + b'"') + rb'\s*:\s*' + _STRING, re.DOTALL)
+
+
+def _unescape(raw):
+    if b'\\' not in raw:
+        return raw.decode('utf-8', errors='replace')
+    return json.loads(b'"' + raw + b'"')
+
+
+class FieldExtractor:
+    """Extrait un tuple de valeurs (None si absentes) pour des chemins 'a.b' donnés."""
+
+    def __init__(self, paths, mode=None):
+        self.paths = tuple(paths)
+        self._split = [tuple(path.split('.')) for path in self.paths]
+        if mode is None:
+            mode = 'regex'
+        if mode not in EXTRACTOR_MODES:
+            raise ValueError(f"Unknown extractor mode: {mode!r}")
+        if mode == 'simdjson' and simdjson is None:
+            raise ValueError("pysimdjson is not installed")
+        self.mode = mode
+        self._pointers = ['/' + '/'.join(parts) for parts in self._split]
+        self._patterns = [_regex_for(parts) for parts in self._split]
+        self._local = threading.local()
+        self.extract = getattr(self, '_extract_' + mode)
+
+    def _extract_full(self, line):
+        event = loads(line)
+        if not isinstance(event, dict):
+            return (None,) * len(self._split)
+        return tuple(_get_path(event, parts) for parts in self._split)
+
+    def _extract_regex(self, line):
+        values = []
+        for pattern in self._patterns:
+            match = pattern.search(line)
+            values.append(_unescape(match.group(1)) if match else None)
+        return tuple(values)
+
+    def _extract_simdjson(self, line):
+        # Un Parser simdjson ne peut pas être partagé entre threads
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = simdjson.Parser()
+        document = parser.parse(line)
+        values = []
+        for pointer in self._pointers:
+            try:
+                value = document.at_pointer(pointer)
+            except (KeyError, IndexError, TypeError, ValueError):
+                value = None
+            if not isinstance(value, (str, int, float, bool, type(None))):
+                # Objet ou tableau: le convertir avant que le document ne soit réutilisé
+                value = value.as_dict() if hasattr(value, 'as_dict') else value.as_list()
+            values.append(value)
+        return tuple(values)
+
+
+class EventTypePrefilter:
+    """Reconnaît l'event_type d'une ligne eve brute parmi un ensemble donné, sans la décoder.
+
+    Suricata écrit du JSON compact, event_type parmi les premières clés: une
+    recherche de '"event_type":"' (arrêtée tôt dans la ligne) puis une
+    recherche de la valeur dans un ensemble suffisent. Les lignes mises en
+    forme autrement (espaces autour de ':') passent par une expression
+    régulière. event_type n'apparaît qu'au premier niveau des événements, et
+    les guillemets d'une valeur chaîne sont échappés: une correspondance ne
+    peut pas venir du contenu d'un autre champ.
+    """
+
+    _KEY = b'"event_type":"'
+
+    def __init__(self, event_types):
+        self.event_types = frozenset(event_types)
+        self._types = {t.encode(): t for t in self.event_types}
+        alternatives = b'|'.join(re.escape(t) for t in sorted(self._types))
+        self._pattern = re.compile(rb'"event_type"\s*:\s*"(' + alternatives + rb')"')
+
+    def classify(self, line):
+        """Retourne l'event_type de la ligne s'il fait partie de l'ensemble, None sinon."""
+        start = line.find(self._KEY)
+        if start >= 0:
+            start += len(self._KEY)
+            return self._types.get(line[start:line.find(b'"', start)])
+        match = self._pattern.search(line)
+        return self._types[match.group(1)] if match else None
+
+    def matches(self, line):
+        return self.classify(line) is not None
+
+    def filter(self, lines):
+        """Retourne les lignes dont l'event_type fait partie de l'ensemble."""
+        return [line for line in lines if self.classify(line) is not None]
@@ -0,0 +1,758 @@
+"""Index de recherche sur eve.json et ses fichiers tournés ou compressés (/api/events/search).
+
+Chaque fichier est découpé en blocs de BLOCK_EVENTS événements. Pour chaque
+bloc on garde son offset de début et ses timestamps min/max (index temporel
+creux), et pour chaque champ indexé (event_type, IPs, ports, sid) une liste
+inversée valeur -> numéros de blocs. flow_id et community_id, presque
+uniques par flux, feraient grossir ces listes comme les données: ils sont
+résumés par un filtre de Bloom de BLOOM_BITS bits par bloc. Une requête
+intersecte ces listes, écarte les blocs dont le filtre exclut les valeurs
+cherchées, ne lit que les blocs restants (seek direct à leur offset) et
+vérifie chaque événement de ces blocs.
+
+Les index sont identifiés par inode: quand logrotate renomme eve.json en
+eve.json.1, son index reste valide et seul le chemin change. Les archives
+(eve.json.2.gz, .zst) sont lues via logset.open_log: les offsets des blocs
+sont ceux du contenu décompressé et la lecture d'un bloc repart du point de
+reprise le plus proche.
+
+L'index est construit en arrière-plan (EveIndexer), par étapes bornées, par
+un seul processus: le writer élu (voir shared_state). Avec un répertoire
+partagé, il publie les blocs fermés (SharedFileIndex) et les autres workers
+les relisent au lieu de réindexer. Une recherche n'indexe jamais: la fin non
+indexée du fichier courant est parcourue linéairement (au plus
+TAIL_SCAN_BYTES) et la réponse indique si elle couvre tout l'historique.
+"""
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from array import array
+
+from eve_decode import loads
+from eve_time import parse_eve_timestamp
+from logset import list_log_files, log_size, open_log
+from stream_filters import StreamFilter, _ip_in
+
+logger = logging.getLogger(__name__)
+
+BLOCK_EVENTS = 1024
+READ_SIZE = 1024 * 1024
+# Octets indexés par étape (le verrou de l'index est relâché entre deux étapes)
+INDEX_STEP_BYTES = 4 * 1024 * 1024
+# Fin non indexée du fichier courant parcourue par une recherche
+TAIL_SCAN_BYTES = 16 * 1024 * 1024
+DEFAULT_INDEX_INTERVAL = 1.0
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Champs indexés: nom -> extraction depuis l'événement décodé
+INDEXED_FIELDS = {
+    'event_type': lambda e: e.get('event_type'),
+    'src_ip': lambda e: e.get('src_ip'),
+    'dest_ip': lambda e: e.get('dest_ip'),
+    'src_port': lambda e: e.get('src_port'),
+    'dest_port': lambda e: e.get('dest_port'),
+    'sid': lambda e: e['alert'].get('signature_id') if isinstance(e.get('alert'), dict) else None,
+}
+# Champs à forte cardinalité, résumés par un filtre de Bloom par bloc
+BLOOM_FIELDS = {
+    'flow_id': lambda e: e.get('flow_id'),
+    'community_id': lambda e: e.get('community_id'),
+}
+# 8192 bits et 3 hachages: ~3 % de faux positifs pour 1024 valeurs distinctes par bloc
+BLOOM_BITS = 8192
+BLOOM_BYTES = BLOOM_BITS // 8
+BLOOM_HASHES = 3
+
+
+def bloom_positions(value):
+    """Positions (bits) d'une valeur dans un filtre de bloc, identiques d'un processus à l'autre."""
+    key = str(value).encode('utf-8')
+    h1 = zlib.crc32(key)
+    h2 = zlib.adler32(key) | 1
+    return [(h1 + i * h2) % BLOOM_BITS for i in range(BLOOM_HASHES)]
+
+
+def eve_file_family(path):
+    """Retourne les fichiers texte de la famille de `path` (tournés compris), du plus ancien au plus récent."""
+    return [logfile.path for logfile in list_log_files(path, include_compressed=False)]
+
+
+def parse_time_arg(value):
+    """Accepte un epoch ('1700000000.5') ou un timestamp ISO/eve. Lève ValueError si invalide."""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    timestamp = parse_eve_timestamp(value.replace(' ', 'T', 1))
+    if timestamp is None:
+        raise ValueError(f"Invalid time: {value!r} (expected epoch seconds or ISO 8601)")
+    return timestamp
+
+
+class FileIndex:
+    """Index creux d'un fichier eve (identifié par son inode).
+
+    Avec collect, les valeurs indexées de chaque bloc fermé sont gardées
+    dans closed jusqu'à leur publication (SharedFileIndex.publish).
+    """
+
+    def __init__(self, path, inode, collect=False):
+        self.path = path
+        self.inode = inode
+        self.indexed = 0  # octets indexés (lignes complètes uniquement)
+        self.complete = False  # fichier tourné indexé jusqu'au bout
+        self.block_offsets = array('Q')
+        self.block_min_ts = array('d')
+        self.block_max_ts = array('d')
+        self.postings = {field: {} for field in INDEXED_FIELDS}
+        # Un filtre de BLOOM_BYTES octets par bloc, à la suite
+        self.blooms = {field: bytearray() for field in BLOOM_FIELDS}
+        self.collect = collect
+        self.closed = []  # valeurs des blocs fermés non encore publiés
+        self.published = 0  # nombre de blocs publiés (ou chargés)
+        self.closed_end = 0  # fin du dernier bloc fermé
+        self._open_values = {field: [] for field in INDEXED_FIELDS}
+        self._block_open = False
+        self._block_events = BLOCK_EVENTS  # force un nouveau bloc au premier événement
+
+    def extend(self, max_bytes=None):
+        """Indexe les lignes ajoutées depuis le dernier appel, environ max_bytes au plus.
+
+        Retourne (nombre d'événements indexés, True si la fin du fichier est atteinte).
+        """
+        count = 0
+        with open_log(self.path) as f:
+            size = log_size(f)
+            if size < self.indexed:
+                raise ValueError(f"{self.path} was truncated")
+            f.seek(self.indexed)
+            position = self.indexed
+            pending = b""
+            while position + len(pending) < size:
+                if max_bytes is not None and position - self.indexed >= max_bytes:
+                    break
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    self._add_line(position, line)
+                    position += len(line) + 1
+                    count += 1
+            self.indexed = position
+        return count, position + len(pending) >= size
+
+    def close_block(self, end=None):
+        """Ferme le bloc en cours: il ne changera plus et les lignes suivantes iront dans un nouveau bloc."""
+        if not self._block_open:
+            return
+        self._block_open = False
+        self._block_events = BLOCK_EVENTS
+        self.closed_end = self.indexed if end is None else end
+        if self.collect:
+            self.closed.append(self._open_values)
+            self._open_values = {field: [] for field in INDEXED_FIELDS}
+
+    def _add_line(self, offset, line):
+        if not line.strip():
+            return
+        try:
+            event = loads(line)
+        except ValueError:
+            return
+        if not isinstance(event, dict):
+            return
+        timestamp = parse_eve_timestamp(event.get('timestamp'))
+        if self._block_events >= BLOCK_EVENTS:
+            self.close_block(offset)
+            self.block_offsets.append(offset)
+            self.block_min_ts.append(float('inf'))
+            self.block_max_ts.append(float('-inf'))
+            for bloom in self.blooms.values():
+                bloom.extend(bytes(BLOOM_BYTES))
+            self._block_open = True
+            self._block_events = 0
+        self._block_events += 1
+        block = len(self.block_offsets) - 1
+        if timestamp is not None:
+            if timestamp < self.block_min_ts[block]:
+                self.block_min_ts[block] = timestamp
+            if timestamp > self.block_max_ts[block]:
+                self.block_max_ts[block] = timestamp
+        for field, extract in INDEXED_FIELDS.items():
+            value = extract(event)
+            if value is None:
+                continue
+            blocks = self.postings[field].get(value)
+            if blocks is None:
+                self.postings[field][value] = array('I', [block])
+            elif blocks[-1] != block:
+                blocks.append(block)
+            else:
+                continue
+            if self.collect:
+                self._open_values[field].append(value)
+        for field, extract in BLOOM_FIELDS.items():
+            value = extract(event)
+            if value is None:
+                continue
+            bloom = self.blooms[field]
+            base = block * BLOOM_BYTES
+            for bit in bloom_positions(value):
+                bloom[base + (bit >> 3)] |= 1 << (bit & 7)
+
+    def block_range(self, block):
+        start = self.block_offsets[block]
+        end = self.block_offsets[block + 1] if block + 1 < len(self.block_offsets) else self.indexed
+        return start, end
+
+    def blocks_for(self, field, values):
+        """Ensemble des blocs contenant au moins une des valeurs du champ."""
+        blocks = set()
+        postings = self.postings[field]
+        for value in values:
+            blocks.update(postings.get(value, ()))
+        return blocks
+
+    def filter_bloom(self, field, values, blocks):
+        """Sous-ensemble de blocks dont le filtre de Bloom peut contenir une des valeurs."""
+        bloom = self.blooms[field]
+        probes = [[(bit >> 3, 1 << (bit & 7)) for bit in bloom_positions(value)] for value in values]
+        kept = set()
+        for block in blocks:
+            base = block * BLOOM_BYTES
+            for probe in probes:
+                if all(bloom[base + byte] & mask for byte, mask in probe):
+                    kept.add(block)
+                    break
+        return kept
+
+    def blocks_for_networks(self, field, networks):
+        """Ensemble des blocs contenant une IP du champ appartenant aux réseaux."""
+        blocks = set()
+        for value, value_blocks in self.postings[field].items():
+            if _ip_in(value, networks):
+                blocks.update(value_blocks)
+        return blocks
+
+
+BLOCK_RECORD = struct.Struct('=Qdd')  # offset, timestamp min, timestamp max
+META_FILE = 'meta.json'
+BLOCKS_FILE = 'blocks.bin'
+BLOOMS_FILE = 'blooms.bin'
+POSTINGS_FILE = 'postings.jsonl'
+
+
+class SharedFileIndex:
+    """Blocs fermés d'un FileIndex publiés dans <directory>/<inode>/ par le writer.
+
+    blocks.bin (BLOCK_RECORD par bloc), blooms.bin (un filtre par champ de
+    BLOOM_FIELDS et par bloc) et postings.jsonl (valeurs indexées de chaque
+    bloc, une ligne par bloc) ne font que grandir: un bloc fermé ne change
+    plus. meta.json, remplacé atomiquement après les ajouts, donne le nombre
+    de blocs et les tailles à relire: un lecteur ne voit jamais un bloc à
+    moitié écrit. generation change quand l'index est reconstruit (fichier
+    tronqué) pour que les lecteurs repartent de zéro.
+    """
+
+    def __init__(self, directory, inode):
+        self.directory = os.path.join(directory, str(inode))
+        self.inode = inode
+        self.meta_path = os.path.join(self.directory, META_FILE)
+        self.generation = None
+        self._postings_size = 0  # octets de postings.jsonl publiés (writer) ou relus (lecteurs)
+        self._complete = False
+
+    def _file(self, name):
+        return os.path.join(self.directory, name)
+
+    def read_meta(self):
+        try:
+            with open(self.meta_path, 'rb') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot read shared index {self.meta_path}: {e}")
+            return None
+
+    # --- writer ---
+
+    def create(self, path):
+        """Repart d'un répertoire vide et retourne un index vide à publier."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+        self.generation = f"{os.getpid()}-{time.time_ns()}"
+        self._postings_size = 0
+        index = FileIndex(path, self.inode, collect=True)
+        self._write_meta(index)
+        return index
+
+    def resume(self, path):
+        """Reprend l'index publié par un writer précédent (bascule), ou en crée un."""
+        meta = self.read_meta()
+        if meta is None:
+            return self.create(path)
+        index = FileIndex(path, self.inode, collect=True)
+        try:
+            self._load_into(index, meta)
+            # Écarter ce que l'ancien writer a ajouté après sa dernière publication
+            for name, size in ((BLOCKS_FILE, meta['blocks'] * BLOCK_RECORD.size),
+                               (BLOOMS_FILE, meta['blocks'] * BLOOM_BYTES * len(BLOOM_FIELDS)),
+                               (POSTINGS_FILE, meta['postings_bytes'])):
+                os.truncate(self._file(name), size)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cannot resume shared index {self.directory}, rebuilding it: {e}")
+            return self.create(path)
+        self.generation = meta['generation']
+        return index
+
+    def publish(self, index):
+        """Ajoute les blocs fermés depuis la dernière publication puis met à jour meta.json."""
+        if not index.closed and index.complete == self._complete:
+            return
+        first = index.published
+        blocks = range(first, first + len(index.closed))
+        with open(self._file(BLOCKS_FILE), 'ab') as f:
+            for block in blocks:
+                f.write(BLOCK_RECORD.pack(index.block_offsets[block], index.block_min_ts[block],
+                                          index.block_max_ts[block]))
+        with open(self._file(BLOOMS_FILE), 'ab') as f:
+            for block in blocks:
+                for field in BLOOM_FIELDS:
+                    f.write(index.blooms[field][block * BLOOM_BYTES:(block + 1) * BLOOM_BYTES])
+        with open(self._file(POSTINGS_FILE), 'ab') as f:
+            for values in index.closed:
+                f.write(json.dumps(values).encode('utf-8') + b"\n")
+            self._postings_size = f.tell()
+        index.published += len(index.closed)
+        index.closed.clear()
+        self._write_meta(index)
+
+    def _write_meta(self, index):
+        meta = {
+            'path': index.path,
+            'generation': self.generation,
+            'blocks': index.published,
+            'end': index.closed_end,
+            'postings_bytes': self._postings_size,
+            'complete': index.complete,
+        }
+        self._complete = index.complete
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    # --- lecteurs ---
+
+    def load(self, index=None):
+        """Complète index avec les blocs publiés depuis le dernier appel.
+
+        Retourne l'index (nouveau si aucun n'était chargé ou si l'index
+        publié a été reconstruit), ou None si rien n'est publié.
+        """
+        meta = self.read_meta()
+        if meta is None:
+            return None
+        if index is None or meta['generation'] != self.generation:
+            index = FileIndex(meta['path'], self.inode)
+            self._postings_size = 0
+        try:
+            self._load_into(index, meta)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cannot load shared index {self.directory}: {e}")
+            return index if index.published else None
+        self.generation = meta['generation']
+        return index
+
+    def _load_into(self, index, meta):
+        first, count = index.published, meta['blocks'] - index.published
+        if count > 0:
+            with open(self._file(BLOCKS_FILE), 'rb') as f:
+                f.seek(first * BLOCK_RECORD.size)
+                data = f.read(count * BLOCK_RECORD.size)
+            with open(self._file(BLOOMS_FILE), 'rb') as f:
+                f.seek(first * BLOOM_BYTES * len(BLOOM_FIELDS))
+                blooms = f.read(count * BLOOM_BYTES * len(BLOOM_FIELDS))
+            with open(self._file(POSTINGS_FILE), 'rb') as f:
+                f.seek(self._postings_size)
+                postings = [json.loads(line) for line in
+                            f.read(meta['postings_bytes'] - self._postings_size).splitlines()]
+            if (len(data) != count * BLOCK_RECORD.size or len(postings) != count
+                    or len(blooms) != count * BLOOM_BYTES * len(BLOOM_FIELDS)):
+                raise ValueError("shared index files are shorter than announced")
+            for i, (offset, min_ts, max_ts) in enumerate(BLOCK_RECORD.iter_unpack(data)):
+                block = first + i
+                index.block_offsets.append(offset)
+                index.block_min_ts.append(min_ts)
+                index.block_max_ts.append(max_ts)
+                for j, field in enumerate(BLOOM_FIELDS):
+                    start = (i * len(BLOOM_FIELDS) + j) * BLOOM_BYTES
+                    index.blooms[field].extend(blooms[start:start + BLOOM_BYTES])
+                for field, values in postings[i].items():
+                    field_postings = index.postings[field]
+                    for value in values:
+                        blocks = field_postings.get(value)
+                        if blocks is None:
+                            field_postings[value] = array('I', [block])
+                        else:
+                            blocks.append(block)
+            index.published = meta['blocks']
+            self._postings_size = meta['postings_bytes']
+        index.indexed = index.closed_end = meta['end']
+        index.complete = self._complete = meta['complete']
+
+
+class SearchQuery:
+    """Critères de /api/events/search.
+
+    Paramètres: start, end (epoch ou ISO 8601), event_type, src_ip, dest_ip,
+    ip (IP ou CIDR), port, src_port, dest_port, signature_id, flow_id,
+    community_id, limit, cursor.
+    """
+
+    def __init__(self, start=None, end=None, stream_filter=None, ports=None, src_ports=None,
+                 dest_ports=None, flow_ids=None, community_ids=None, limit=DEFAULT_LIMIT, cursor=None):
+        self.start = start
+        self.end = end
+        self.filter = stream_filter or StreamFilter()
+        self.ports = ports
+        self.src_ports = src_ports
+        self.dest_ports = dest_ports
+        self.flow_ids = flow_ids
+        self.community_ids = community_ids
+        self.limit = limit
+        self.cursor = cursor
+
+    @classmethod
+    def from_args(cls, args):
+        """Construit une requête depuis les paramètres HTTP. Lève ValueError si invalide."""
+        def int_list(name):
+            value = args.get(name, '')
+            return {int(item) for item in value.split(',') if item.strip()} or None
+
+        start = parse_time_arg(args.get('start'))
+        end = parse_time_arg(args.get('end'))
+        if start is not None and end is not None and end < start:
+            raise ValueError("end must be after start")
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+        if not 0 < limit <= MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+        cursor = args.get('cursor')
+        if cursor:
+            inode, _, offset = cursor.partition(':')
+            cursor = (int(inode), int(offset))
+        community_ids = {c.strip() for c in args.get('community_id', '').split(',') if c.strip()} or None
+        return cls(
+            start=start,
+            end=end,
+            # event_type, src_ip, dest_ip, ip et signature_id ont la même sémantique que pour le flux
+            stream_filter=StreamFilter.from_args({
+                name: args.get(name, '') for name in ('event_type', 'src_ip', 'dest_ip', 'ip', 'signature_id')
+            }),
+            ports=int_list('port'),
+            src_ports=int_list('src_port'),
+            dest_ports=int_list('dest_port'),
+            flow_ids=int_list('flow_id'),
+            community_ids=community_ids,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    def candidate_blocks(self, index):
+        """Blocs de l'index pouvant contenir des événements correspondants."""
+        start = self.start if self.start is not None else float('-inf')
+        end = self.end if self.end is not None else float('inf')
+        blocks = {
+            block for block in range(len(index.block_offsets))
+            # Bloc sans timestamp (min > max): on ne peut pas l'exclure
+            if index.block_min_ts[block] > index.block_max_ts[block]
+            or (index.block_max_ts[block] >= start and index.block_min_ts[block] <= end)
+        }
+        f = self.filter
+        constraints = []
+        if f.event_types:
+            constraints.append(index.blocks_for('event_type', f.event_types))
+        if f.signature_ids:
+            constraints.append(index.blocks_for('sid', f.signature_ids))
+        if self.src_ports:
+            constraints.append(index.blocks_for('src_port', self.src_ports))
+        if self.dest_ports:
+            constraints.append(index.blocks_for('dest_port', self.dest_ports))
+        if self.ports:
+            constraints.append(index.blocks_for('src_port', self.ports) | index.blocks_for('dest_port', self.ports))
+        if f.src_networks:
+            constraints.append(index.blocks_for_networks('src_ip', f.src_networks))
+        if f.dest_networks:
+            constraints.append(index.blocks_for_networks('dest_ip', f.dest_networks))
+        if f.any_networks:
+            constraints.append(index.blocks_for_networks('src_ip', f.any_networks)
+                               | index.blocks_for_networks('dest_ip', f.any_networks))
+        for allowed in sorted(constraints, key=len):
+            blocks &= allowed
+            if not blocks:
+                break
+        # Les filtres de Bloom se testent bloc par bloc: sur les blocs restants seulement
+        if self.flow_ids and blocks:
+            blocks = index.filter_bloom('flow_id', self.flow_ids, blocks)
+        if self.community_ids and blocks:
+            blocks = index.filter_bloom('community_id', self.community_ids, blocks)
+        return sorted(blocks)
+
+    def matches(self, event):
+        if self.start is not None or self.end is not None:
+            timestamp = parse_eve_timestamp(event.get('timestamp'))
+            if timestamp is None:
+                return False
+            if self.start is not None and timestamp < self.start:
+                return False
+            if self.end is not None and timestamp > self.end:
+                return False
+        if self.flow_ids and event.get('flow_id') not in self.flow_ids:
+            return False
+        if self.community_ids and event.get('community_id') not in self.community_ids:
+            return False
+        if self.src_ports and event.get('src_port') not in self.src_ports:
+            return False
+        if self.dest_ports and event.get('dest_port') not in self.dest_ports:
+            return False
+        if self.ports and event.get('src_port') not in self.ports and event.get('dest_port') not in self.ports:
+            return False
+        return self.filter.matches_event(event)
+
+
+class EveIndex:
+    """Index de la famille de fichiers d'eve.json.
+
+    Dans le writer, update() l'étend par étapes (appelé par EveIndexer) et,
+    avec shared_dir, publie les blocs fermés. Un lecteur (writer=False)
+    recharge avant chaque recherche ce que le writer a publié.
+    """
+
+    def __init__(self, path, shared_dir=None, writer=True):
+        self.path = path
+        self.shared_dir = shared_dir
+        self.writer = writer
+        self._lock = threading.Lock()
+        self._indexes = {}  # inode -> FileIndex
+        self._shared = {}  # inode -> SharedFileIndex
+
+    def _new_index(self, path, inode):
+        if not self.shared_dir:
+            return FileIndex(path, inode)
+        shared = self._shared[inode] = SharedFileIndex(self.shared_dir, inode)
+        return shared.resume(path)
+
+    def _reset_index(self, path, inode):
+        if not self.shared_dir:
+            return FileIndex(path, inode)
+        return self._shared[inode].create(path)
+
+    def update(self, max_bytes=INDEX_STEP_BYTES):
+        """Indexe environ max_bytes de plus, fichier courant d'abord. Retourne True s'il reste à indexer."""
+        files = list_log_files(self.path)
+        inodes = {logfile.inode for logfile in files}
+        with self._lock:
+            for inode in list(self._indexes):
+                if inode not in inodes:
+                    del self._indexes[inode]
+                    self._shared.pop(inode, None)
+            if self.shared_dir:
+                os.makedirs(self.shared_dir, exist_ok=True)
+                for name in os.listdir(self.shared_dir):
+                    if name.isdigit() and int(name) not in inodes:
+                        shutil.rmtree(os.path.join(self.shared_dir, name), ignore_errors=True)
+        for logfile in reversed(files):
+            live = logfile is files[-1]
+            with self._lock:
+                index = self._indexes.get(logfile.inode)
+                if index is None:
+                    index = self._indexes[logfile.inode] = self._new_index(logfile.path, logfile.inode)
+                index.path = logfile.path  # le fichier a pu être renommé par logrotate
+                if index.complete and not live:
+                    continue
+                try:
+                    count, done = index.extend(max_bytes)
+                except ValueError:
+                    # Fichier tronqué (copytruncate): réindexer depuis le début
+                    index = self._indexes[logfile.inode] = self._reset_index(logfile.path, logfile.inode)
+                    count, done = index.extend(max_bytes)
+                except FileNotFoundError:
+                    continue
+                if done and not live:
+                    # Fichier tourné: son dernier bloc ne grandira plus
+                    index.close_block()
+                    index.complete = True
+                    logger.info(f"Indexed {logfile.path} ({len(index.block_offsets)} blocks)")
+                if self.shared_dir:
+                    self._shared[logfile.inode].publish(index)
+            if count:
+                logger.debug(f"Indexed {count} events from {logfile.path}")
+            if not done:
+                return True
+        return False
+
+    def load_published(self):
+        """Lecteur: recharge les index publiés par le writer dans shared_dir."""
+        try:
+            names = [name for name in os.listdir(self.shared_dir) if name.isdigit()]
+        except FileNotFoundError:
+            names = []
+        inodes = {int(name) for name in names}
+        for inode in list(self._indexes):
+            if inode not in inodes:
+                del self._indexes[inode]
+                self._shared.pop(inode, None)
+        for inode in inodes:
+            shared = self._shared.get(inode)
+            if shared is None:
+                shared = self._shared[inode] = SharedFileIndex(self.shared_dir, inode)
+            index = shared.load(self._indexes.get(inode))
+            if index is not None:
+                self._indexes[inode] = index
+
+    def search(self, query):
+        """Retourne {"events", "count", "next_cursor", "scanned_blocks", "files", "complete"}.
+
+        N'indexe rien: les blocs déjà indexés sont lus, puis au plus
+        TAIL_SCAN_BYTES de la fin non indexée du fichier courant (les plus
+        récents). complete est faux si une partie de l'historique n'a pas
+        été parcourue (indexation en cours). Le verrou n'est pris que pour
+        relever les blocs candidats d'un fichier; les lectures se font sans
+        lui, en parallèle des autres recherches et de l'indexation.
+        """
+        files = list_log_files(self.path)
+        with self._lock:
+            if not self.writer and self.shared_dir:
+                self.load_published()
+        events = []
+        scanned = 0
+        next_cursor = None
+        complete = True
+        if query.cursor is not None:
+            inodes = [logfile.inode for logfile in files]
+            if query.cursor[0] in inodes:
+                files = files[inodes.index(query.cursor[0]):]
+        for logfile in files:
+            live = logfile is files[-1]
+            with self._lock:
+                index = self._indexes.get(logfile.inode)
+                if index is not None:
+                    index.path = logfile.path
+                    # Un bloc fermé ne change plus; le dernier s'arrête à indexed, relevé ici
+                    ranges = [index.block_range(block) for block in query.candidate_blocks(index)]
+                    indexed = index.indexed
+                    if not live and not index.complete:
+                        complete = False
+            if index is None:
+                if not live:
+                    complete = False
+                    continue
+                ranges, indexed = [], 0
+            resume = query.cursor[1] if query.cursor and query.cursor[0] == logfile.inode else 0
+            try:
+                with open_log(logfile.path) as f:
+                    for start, end in ranges:
+                        if end <= resume:
+                            continue
+                        scanned += 1
+                        f.seek(start)
+                        next_cursor = self._match_lines(query, logfile.inode, f.read(end - start),
+                                                        start, resume, events)
+                        if next_cursor:
+                            break
+                    if live and not next_cursor:
+                        # Fin non encore indexée du fichier courant
+                        start = max(indexed, resume)
+                        size = log_size(f)
+                        if size - start > TAIL_SCAN_BYTES:
+                            # Trop long: les TAIL_SCAN_BYTES les plus récents, à partir d'un début de ligne
+                            complete = False
+                            f.seek(size - TAIL_SCAN_BYTES - 1)
+                            data = f.read(TAIL_SCAN_BYTES + 1)
+                            skip = data.find(b"\n") + 1
+                            start = size - TAIL_SCAN_BYTES - 1 + skip
+                            data = data[skip:] if skip else b""
+                        else:
+                            f.seek(start)
+                            data = f.read(max(0, size - start))
+                        data = data[:data.rfind(b"\n") + 1]  # lignes complètes uniquement
+                        next_cursor = self._match_lines(query, logfile.inode, data, start, resume, events)
+            except FileNotFoundError:
+                continue
+            if next_cursor:
+                break
+        return {
+            "events": events,
+            "count": len(events),
+            "next_cursor": next_cursor,
+            "scanned_blocks": scanned,
+            "files": [logfile.path for logfile in files],
+            "complete": complete,
+        }
+
+    @staticmethod
+    def _match_lines(query, inode, data, start, resume, events):
+        """Ajoute à events les événements de data (lu à l'offset start) qui correspondent.
+
+        Retourne le curseur de la page suivante quand la limite est atteinte, sinon None.
+        """
+        prefilter = query.filter.prefilter
+        position = start
+        for line in data.split(b"\n"):
+            line_offset = position
+            position += len(line) + 1
+            if line_offset < resume or not line.strip():
+                continue
+            if prefilter is not None and not prefilter.matches(line):
+                continue
+            try:
+                event = loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict) or not query.matches(event):
+                continue
+            if len(events) >= query.limit:
+                return f"{inode}:{line_offset}"
+            events.append(event)
+        return None
+
+
+class EveIndexer:
+    """Tâche de fond du writer: étend l'index (et le publie) par étapes de INDEX_STEP_BYTES."""
+
+    def __init__(self, index, interval=DEFAULT_INDEX_INTERVAL):
+        self.index = index
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="eve-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                pending = self.index.update()
+            except Exception as e:
+                logger.error(f"Eve indexer error: {e}", exc_info=True)
+                pending = False
+            if not pending:
+                self._stop_event.wait(self.interval)
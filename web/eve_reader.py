@@ -0,0 +1,75 @@
+"""Lecture inverse par blocs des fichiers de logs (eve.json).
+
+Pour répondre à « les N derniers événements », on lit le fichier depuis la
+fin par blocs de taille fixe (ou via mmap) et on s'arrête dès qu'on a assez
+de lignes: le coût dépend de ce qui est retourné et non de la taille du
+fichier.
+"""
+import os
+import mmap
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+def iter_lines_reverse(filepath, block_size=DEFAULT_BLOCK_SIZE, use_mmap=False, max_bytes=None):
+    """Génère les lignes non vides du fichier (bytes, sans '\\n'), de la dernière à la première.
+
+    max_bytes borne la quantité de données lues depuis la fin du fichier.
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        if use_mmap:
+            yield from _iter_lines_reverse_mmap(f, size, max_bytes)
+        else:
+            yield from _iter_lines_reverse_blocks(f, size, block_size, max_bytes)
+
+
+def _iter_lines_reverse_blocks(f, size, block_size, max_bytes):
+    limit = 0 if max_bytes is None else max(0, size - max_bytes)
+    pos = size
+    tail = b""
+    while pos > limit:
+        read_size = min(block_size, pos - limit)
+        pos -= read_size
+        f.seek(pos)
+        lines = (f.read(read_size) + tail).split(b"\n")
+        # Le premier morceau peut être la fin d'une ligne commencée dans le bloc précédent
+        tail = lines[0]
+        for line in reversed(lines[1:]):
+            if line:
+                yield line
+    # Début du fichier atteint: la ligne restante est complète
+    if pos == 0 and tail:
+        yield tail
+
+
+def _iter_lines_reverse_mmap(f, size, max_bytes):
+    limit = 0 if max_bytes is None else max(0, size - max_bytes)
+    with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+        end = size
+        while end > limit:
+            start = mm.rfind(b"\n", limit, end) + 1
+            if start == 0 and limit > 0:
+                # Ligne tronquée par max_bytes
+                return
+            if end > start:
+                yield mm[start:end]
+            end = start - 1
+
+
+def read_last_lines(filepath, max_lines, block_size=DEFAULT_BLOCK_SIZE, use_mmap=False, max_bytes=None):
+    """Retourne les max_lines dernières lignes du fichier, dans l'ordre chronologique."""
+    lines = []
+    if max_lines <= 0:
+        return lines
+    for line in iter_lines_reverse(filepath, block_size=block_size, use_mmap=use_mmap, max_bytes=max_bytes):
+        lines.append(line)
+        if len(lines) >= max_lines:
+            break
+    lines.reverse()
+    return lines
@@ -0,0 +1,563 @@
+"""Stockage colonnaire des événements eve pour les requêtes historiques.
+
+Les événements sont convertis au fil de l'eau en segments horaires (UTC),
+en ajout seul. Un segment est un répertoire 'YYYYmmddHH' contenant une
+colonne par fichier (tableaux typés du module array, ordre natif):
+
+    ts.col                       timestamp epoch (double)
+    src_port.col, dest_port.col  ports (uint16)
+    sid.col                      alert.signature_id (uint32, 0 si absent)
+    event_type.col, proto.col, src_ip.col, dest_ip.col,
+    signature.col, rrname.col, sni.col
+                                 chaînes encodées par dictionnaire (uint32)
+
+Chaque colonne encodée a un fichier <colonne>.dict (une valeur JSON par
+ligne, code = numéro de ligne, 0 = absent), propre au segment: un segment
+est autonome et la rétention consiste à supprimer des répertoires. Les
+dictionnaires sont écrits avant les colonnes, et un lecteur ne considère
+que le nombre de lignes commun à toutes les colonnes: il peut lire pendant
+l'écriture sans verrou.
+
+Une fois ingérés, les événements restent interrogeables après la rotation
+d'eve.json par logrotate. Un point de reprise (inode, offset) permet de
+reprendre l'ingestion au redémarrage, y compris dans le fichier renommé.
+Il porte aussi le nombre de lignes des segments du dernier lot écrit: il
+est enregistré avant l'ajout aux colonnes (position précédente, comptes
+d'avant) puis après (nouvelle position, nouveaux comptes). Au
+redémarrage, les colonnes sont tronquées à ces comptes: un lot
+interrompu par un arrêt brutal est relu une seule fois, sans doublon.
+"""
+import calendar
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+
+from eve_decode import loads
+from eve_time import parse_eve_timestamp
+from logset import list_log_files
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SECONDS = 3600
+SEGMENT_FORMAT = '%Y%m%d%H'
+CHECKPOINT_FILE = 'checkpoint.json'
+DEFAULT_RETENTION_DAYS = 7
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_FLUSH_ROWS = 8192
+# Segments gardés ouverts en écriture (heure courante et événements en retard)
+MAX_OPEN_SEGMENTS = 3
+# Mémoire des colonnes décodées gardées entre deux requêtes, par processus
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Colonnes numériques: nom -> typecode
+NUMERIC_COLUMNS = {
+    'ts': 'd',
+    'src_port': 'H',
+    'dest_port': 'H',
+    'sid': 'I',
+}
+# Colonnes encodées par dictionnaire
+DICT_COLUMNS = ('event_type', 'proto', 'src_ip', 'dest_ip', 'signature', 'rrname', 'sni')
+COLUMN_TYPES = dict(NUMERIC_COLUMNS, **{name: 'I' for name in DICT_COLUMNS})
+
+
+def extract_row(event):
+    """Retourne (timestamp, {colonne: valeur}) pour un événement eve décodé, ou None."""
+    timestamp = parse_eve_timestamp(event.get('timestamp'))
+    if timestamp is None:
+        return None
+    alert = event.get('alert') if isinstance(event.get('alert'), dict) else {}
+    dns = event.get('dns') if isinstance(event.get('dns'), dict) else {}
+    tls = event.get('tls') if isinstance(event.get('tls'), dict) else {}
+    event_type = event.get('event_type')
+    row = {
+        'ts': timestamp,
+        'src_port': _port(event.get('src_port')),
+        'dest_port': _port(event.get('dest_port')),
+        'sid': alert.get('signature_id') if isinstance(alert.get('signature_id'), int) else 0,
+        'event_type': event_type,
+        'proto': event.get('proto'),
+        'src_ip': event.get('src_ip'),
+        'dest_ip': event.get('dest_ip'),
+        'signature': alert.get('signature') if event_type == 'alert' else None,
+        'rrname': dns.get('rrname') if event_type == 'dns' and dns.get('type') == 'query' else None,
+        'sni': tls.get('sni') if event_type == 'tls' else None,
+    }
+    return timestamp, row
+
+
+def _port(value):
+    return value if isinstance(value, int) and 0 <= value <= 0xFFFF else 0
+
+
+def segment_name(timestamp):
+    return time.strftime(SEGMENT_FORMAT, time.gmtime(timestamp))
+
+
+def segment_start(name):
+    return calendar.timegm(time.strptime(name, SEGMENT_FORMAT))
+
+
+class _SegmentWriter:
+    """Tampons en mémoire d'un segment, ajoutés aux fichiers à chaque flush."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.columns = {name: array(typecode) for name, typecode in COLUMN_TYPES.items()}
+        self.codes = {}
+        self.new_values = {}
+        for name in DICT_COLUMNS:
+            values = _load_dictionary(os.path.join(path, name + '.dict'))
+            self.codes[name] = {value: code for code, value in enumerate(values) if code}
+            self.new_values[name] = []
+        # Après un arrêt brutal, tronquer les colonnes au nombre de lignes commun
+        self.rows = _common_rows(path)
+        _truncate_columns(path, self.rows)
+
+    def append(self, row):
+        columns = self.columns
+        for name in NUMERIC_COLUMNS:
+            columns[name].append(row[name])
+        for name in DICT_COLUMNS:
+            value = row[name]
+            if value is None:
+                columns[name].append(0)
+                continue
+            codes = self.codes[name]
+            code = codes.get(value)
+            if code is None:
+                code = len(codes) + 1
+                codes[value] = code
+                self.new_values[name].append(value)
+            columns[name].append(code)
+
+    def pending(self):
+        return len(self.columns['ts'])
+
+    def flush(self):
+        if not self.pending():
+            return
+        # Dictionnaires d'abord: un code lu par un lecteur a toujours sa valeur
+        for name, values in self.new_values.items():
+            if not values:
+                continue
+            dict_path = os.path.join(self.path, name + '.dict')
+            new_file = not os.path.exists(dict_path)
+            with open(dict_path, 'a', encoding='utf-8') as f:
+                if new_file:
+                    f.write('null\n')  # code 0 réservé aux valeurs absentes
+                f.writelines(json.dumps(value) + '\n' for value in values)
+            values.clear()
+        self.rows += self.pending()
+        for name, column in self.columns.items():
+            with open(os.path.join(self.path, name + '.col'), 'ab') as f:
+                column.tofile(f)
+            del column[:]
+
+
+def _load_dictionary(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.endswith('\n')]
+    except FileNotFoundError:
+        return [None]
+
+
+def _truncate_columns(path, rows):
+    for name, typecode in COLUMN_TYPES.items():
+        column_path = os.path.join(path, name + '.col')
+        expected = rows * array(typecode).itemsize
+        if os.path.exists(column_path) and os.path.getsize(column_path) > expected:
+            os.truncate(column_path, expected)
+
+
+def _common_rows(path):
+    rows = None
+    for name, typecode in COLUMN_TYPES.items():
+        try:
+            size = os.path.getsize(os.path.join(path, name + '.col'))
+        except FileNotFoundError:
+            return 0
+        count = size // array(typecode).itemsize
+        rows = count if rows is None else min(rows, count)
+    return rows or 0
+
+
+class EveStoreWriter:
+    """Alimente le stockage colonnaire à partir du LogFollower d'eve.json.
+
+    Les lignes reçues sont décodées et mises en tampon; un thread les écrit
+    toutes les flush_interval secondes (ou dès flush_rows lignes), puis
+    enregistre le point de reprise.
+    """
+
+    def __init__(self, store_dir, follower, retention_days=DEFAULT_RETENTION_DAYS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, flush_rows=DEFAULT_FLUSH_ROWS, backfill_bytes=0):
+        self.store_dir = store_dir
+        self.follower = follower
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.backfill_bytes = backfill_bytes
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._pending = 0
+        self._position = None  # (inode, offset de fin de la dernière ligne ingérée)
+        self._saved_position = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # --- Cycle de vie ---
+    def start(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="eve-store-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self.follower.remove_listener(self._on_lines)
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        try:
+            self._attach()
+        except Exception as e:
+            logger.error(f"Eve store catch-up failed: {e}", exc_info=True)
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.expire()
+            except Exception as e:
+                logger.error(f"Eve store flush failed: {e}", exc_info=True)
+
+    def _attach(self):
+        """Reprend l'ingestion au point de reprise puis s'abonne aux nouvelles lignes.
+
+        Le rattrapage, éventuellement de plusieurs Gio, est lu par blocs et
+        écrit au fil de l'eau (voir LogFollower.add_listener): il ne bloque
+        pas le follower et n'est jamais entièrement en mémoire.
+        """
+        checkpoint = self._load_checkpoint()
+        if checkpoint is not None:
+            inode, offset, rows = checkpoint
+            # Lignes d'un lot écrit après le point de reprise: elles vont être relues
+            for name, count in rows.items():
+                _truncate_columns(os.path.join(self.store_dir, name), count)
+            if inode is not None:
+                self._saved_position = (inode, offset)
+        if self._saved_position is None:
+            self.follower.add_listener(self._on_lines, backfill_bytes=self.backfill_bytes)
+        else:
+            if inode != self.follower.current_inode():
+                # eve.json a tourné depuis l'arrêt: finir le fichier renommé, puis tout le fichier courant
+                self._catch_up_rotated(inode, offset)
+                offset = 0
+            self.follower.add_listener(self._on_lines, from_offset=offset)
+        logger.info(f"Eve store attached to {self.follower.path} ({self.store_dir})")
+
+    def _catch_up_rotated(self, inode, offset):
+        # Un fichier compressé depuis a un autre inode: il ne peut plus être repris
+        for logfile in list_log_files(self.follower.path, include_compressed=False):
+            path = logfile.path
+            if logfile.inode != inode:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    entries = []
+                    position = offset
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        entries.append((position, line.rstrip(b'\r\n')))
+                        position += len(line)
+                        if len(entries) >= self.flush_rows:
+                            self._ingest(entries, inode)
+                            self.flush()
+                            entries = []
+                    self._ingest(entries, inode)
+                    self.flush()
+                logger.info(f"Eve store caught up with rotated file {path}")
+            except OSError as e:
+                logger.warning(f"Cannot catch up with rotated file {path}: {e}")
+            return
+
+    # --- Ingestion ---
+    def _on_lines(self, entries):
+        self._ingest(entries, self.follower.inode)
+        if self._pending >= self.flush_rows:
+            self.flush()
+
+    def _ingest(self, entries, inode):
+        if not entries:
+            return
+        with self._lock:
+            for offset, line in entries:
+                try:
+                    event = loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(event, dict):
+                    continue
+                extracted = extract_row(event)
+                if extracted is None:
+                    continue
+                timestamp, row = extracted
+                self._segment(segment_name(timestamp)).append(row)
+                self._pending += 1
+            offset, line = entries[-1]
+            self._position = (inode, offset + len(line) + 1)
+
+    def _segment(self, name):
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = _SegmentWriter(os.path.join(self.store_dir, name))
+            self._segments[name] = segment
+        return segment
+
+    def flush(self):
+        """Écrit les tampons sur disque, encadrés par deux points de reprise (voir en tête du module).
+
+        Le point de reprise n'est réécrit que s'il a avancé: sa date de
+        modification sert de version du store (EveStore.version) et ne doit
+        pas changer quand aucune ligne n'est arrivée.
+        """
+        with self._lock:
+            batch = {name: segment for name, segment in self._segments.items() if segment.pending()}
+            if batch:
+                self._save_checkpoint(self._saved_position, {name: segment.rows for name, segment in batch.items()})
+                for segment in batch.values():
+                    segment.flush()
+            self._pending = 0
+            if self._position is not None and (self._position != self._saved_position or batch):
+                self._save_checkpoint(self._position, {name: segment.rows for name, segment in batch.items()})
+                self._saved_position = self._position
+            while len(self._segments) > MAX_OPEN_SEGMENTS:
+                del self._segments[min(self._segments)]
+
+    def expire(self):
+        """Supprime les segments plus anciens que la durée de rétention."""
+        if not self.retention_days:
+            return
+        horizon = segment_name(time.time() - self.retention_days * 86400)
+        for name in os.listdir(self.store_dir):
+            if name.isdigit() and len(name) == 10 and name < horizon and name not in self._segments:
+                shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+                logger.info(f"Eve store segment {name} expired")
+
+    def _load_checkpoint(self):
+        try:
+            with open(os.path.join(self.store_dir, CHECKPOINT_FILE), 'r') as f:
+                data = json.load(f)
+            return data['inode'], data['offset'], data.get('rows', {})
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_checkpoint(self, position, rows):
+        """position: (inode, offset), None avant la première écriture; rows: {segment: nombre de lignes}."""
+        inode, offset = position if position is not None else (None, None)
+        path = os.path.join(self.store_dir, CHECKPOINT_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'inode': inode, 'offset': offset, 'rows': rows}, f)
+        os.replace(path + '.tmp', path)
+
+
+class _ColumnCache:
+    """Colonnes et dictionnaires décodés, tous segments confondus, évincés LRU au-delà de max_bytes.
+
+    Sans borne, une fenêtre de 7 jours garderait en mémoire toutes les
+    colonnes de la rétention, dans chaque worker. Une colonne évincée est
+    relue depuis le fichier (en général depuis le cache de pages du noyau).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # clé -> (valeur, taille)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= previous[1]
+        self._entries[key] = (value, size)
+        self.size += size
+        # L'entrée la plus récente est gardée même si elle dépasse la borne seule
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def discard_segment(self, name):
+        for key in [key for key in self._entries if key[0] == name]:
+            self.size -= self._entries.pop(key)[1]
+
+
+class _SegmentReader:
+    """Accès en lecture à un segment; les colonnes décodées sont dans le cache partagé du store."""
+
+    def __init__(self, path, cache):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.cache = cache
+        self.rows = 0
+
+    def refresh(self):
+        self.rows = _common_rows(self.path)
+        return self.rows
+
+    def column(self, name):
+        key = (self.name, 'col', name)
+        column = self.cache.get(key)
+        if column is None:
+            column = array(COLUMN_TYPES[name])
+        if len(column) > self.rows:
+            # Colonne tronquée par le writer après un arrêt brutal
+            del column[self.rows:]
+        elif len(column) < self.rows:
+            with open(os.path.join(self.path, name + '.col'), 'rb') as f:
+                f.seek(len(column) * column.itemsize)
+                column.fromfile(f, self.rows - len(column))
+        self.cache.put(key, column, len(column) * column.itemsize)
+        return column
+
+    def dictionary(self, name):
+        key = (self.name, 'dict', name)
+        dict_path = os.path.join(self.path, name + '.dict')
+        try:
+            size = os.path.getsize(dict_path)
+        except FileNotFoundError:
+            return [None]
+        cached = self.cache.get(key)
+        if cached is None or cached[0] != size:
+            cached = (size, _load_dictionary(dict_path))
+            # Taille approchée: celle du fichier, plus l'objet de chaque valeur
+            self.cache.put(key, cached, size + 64 * len(cached[1]))
+        return cached[1]
+
+
+class EveStore:
+    """Requêtes sur le stockage colonnaire (lecture seule, tout processus)."""
+
+    def __init__(self, store_dir, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self._cache = _ColumnCache(cache_bytes)
+        self._readers = {}
+        self._latest = (None, 0, None)  # (segment, lignes, timestamp max)
+
+    def segment_names(self, start=None, end=None):
+        try:
+            names = sorted(n for n in os.listdir(self.store_dir) if n.isdigit() and len(n) == 10)
+        except FileNotFoundError:
+            return []
+        if start is not None:
+            first = segment_name(start)
+            names = [n for n in names if n >= first]
+        if end is not None:
+            last = segment_name(end)
+            names = [n for n in names if n <= last]
+        return names
+
+    def _reader(self, name):
+        reader = self._readers.get(name)
+        if reader is None:
+            reader = self._readers[name] = _SegmentReader(os.path.join(self.store_dir, name), self._cache)
+        reader.refresh()
+        return reader
+
+    def version(self):
+        """Change quand le writer a ingéré de nouvelles lignes (point de reprise réécrit) et à l'expiration d'un segment."""
+        try:
+            st = os.stat(os.path.join(self.store_dir, CHECKPOINT_FILE))
+            checkpoint = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            checkpoint = None
+        return checkpoint, len(self.segment_names())
+
+    def latest_timestamp(self):
+        """Timestamp du dernier événement stocké (référence des fenêtres historiques)."""
+        with self._lock:
+            for name in reversed(self.segment_names()):
+                reader = self._reader(name)
+                if not reader.rows:
+                    continue
+                cached_name, cached_rows, latest = self._latest
+                if cached_name != name or cached_rows != reader.rows:
+                    timestamps = reader.column('ts')
+                    start = cached_rows if cached_name == name else 0
+                    newest = max(timestamps[start:])
+                    latest = newest if cached_name != name else max(latest, newest)
+                    self._latest = (name, reader.rows, latest)
+                return latest
+        return None
+
+    def count_codes(self, column, start, end):
+        """Compte les valeurs de `column` sur [start, end); retourne Counter {valeur: compte}."""
+        totals = Counter()
+        with self._lock:
+            live = set()
+            for name in self.segment_names(start, end):
+                live.add(name)
+                reader = self._reader(name)
+                if not reader.rows:
+                    continue
+                seg_start = segment_start(name)
+                codes = reader.column(column)
+                if start <= seg_start and seg_start + SEGMENT_SECONDS <= end:
+                    counts = _count(codes)
+                else:
+                    counts = _count_in_range(codes, reader.column('ts'), start, end)
+                dictionary = reader.dictionary(column)
+                for code, count in counts.items():
+                    if code and code < len(dictionary):
+                        totals[dictionary[code]] += count
+            # Oublier les segments supprimés par la rétention
+            for name in list(self._readers):
+                if name not in live and not os.path.isdir(os.path.join(self.store_dir, name)):
+                    del self._readers[name]
+                    self._cache.discard_segment(name)
+        return totals
+
+    def top(self, column, start, end, n=10):
+        """Retourne ([(valeur, compte)] des n plus fréquentes, nb de valeurs distinctes)."""
+        totals = self.count_codes(column, start, end)
+        return totals.most_common(n), len(totals)
+
+
+def _count(codes):
+    if numpy is not None:
+        values = numpy.frombuffer(codes, dtype=numpy.uint32)
+        bins = numpy.bincount(values)
+        nonzero = numpy.flatnonzero(bins)
+        return dict(zip(nonzero.tolist(), bins[nonzero].tolist()))
+    return Counter(codes)
+
+
+def _count_in_range(codes, timestamps, start, end):
+    if numpy is not None:
+        ts = numpy.frombuffer(timestamps, dtype=numpy.float64)
+        values = numpy.frombuffer(codes, dtype=numpy.uint32)[(ts >= start) & (ts < end)]
+        bins = numpy.bincount(values)
+        nonzero = numpy.flatnonzero(bins)
+        return dict(zip(nonzero.tolist(), bins[nonzero].tolist()))
+    return Counter(code for code, ts in zip(codes, timestamps) if start <= ts < end)
@@ -0,0 +1,239 @@
+"""Suivi incrémental d'eve.json pour les endpoints de statistiques.
+
+Le LogFollower partagé d'eve.json (offset + inode) ne lit que les octets
+ajoutés depuis le dernier passage. Les compteurs utilisés par /api/stats/*
+sont maintenus en mémoire dans EveStatsState, si bien que le coût d'une
+requête ne dépend plus de la taille du fichier.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from aggregators import DEFAULT_WINDOW, MultiWindowTopK
+from eve_decode import EventTypePrefilter, FieldExtractor, loads
+from eve_time import parse_eve_timestamp
+from stats_series import (DEFAULT_RESOLUTION, IFACE_COUNTERS, StatsSeries, interface_series_payload,
+                          series_payload)
+
+logger = logging.getLogger(__name__)
+
+# Taille lue au démarrage pour amorcer les compteurs avec l'historique récent
+DEFAULT_BOOTSTRAP_BYTES = 8 * 1024 * 1024
+
+# Champs lus (sans décoder tout l'événement) par EveStatsState.ingest_line, selon l'event_type
+INGEST_FIELDS = {
+    'alert': ('timestamp', 'alert.signature'),
+    'dns': ('timestamp', 'dns.type', 'dns.rrname'),
+    'tls': ('timestamp', 'tls.sni'),
+}
+
+
+def capture_point(event):
+    """Retourne (timestamp, kernel_packets, kernel_drops) pour un événement stats, ou None."""
+    capture_data = event.get('stats', {}).get('capture', {})
+    point = (event.get('timestamp'), capture_data.get('kernel_packets'), capture_data.get('kernel_drops'))
+    if None in point:
+        return None
+    return point
+
+
+class EveStatsState:
+    """État partagé alimenté par le tailer et lu par les endpoints de stats.
+
+    Les top-K sont tenus sur des fenêtres glissantes temporelles (voir
+    aggregators.py). sketch_capacity > 0 active le mode mémoire bornée pour
+    les clés à forte cardinalité (dns.rrname, tls.sni).
+    """
+
+    def __init__(self, windows=None, sketch_capacity=0, stats_history=500):
+        self.lock = threading.Lock()
+        self.signatures = MultiWindowTopK(windows)
+        self.dns_queries = MultiWindowTopK(windows, sketch_capacity=sketch_capacity)
+        self.tls_sni = MultiWindowTopK(windows, sketch_capacity=sketch_capacity)
+        self.latest_stats = None
+        # Points (timestamp, kernel_packets, kernel_drops) pour capture_history
+        self.capture_history = deque(maxlen=stats_history)
+        # Deltas et débits des compteurs, par résolution
+        self.series = StatsSeries()
+        # Débits par interface, relevés par iface-stat (voir iface_poller.py)
+        self.interfaces = StatsSeries(counters=IFACE_COUNTERS, group_counters=IFACE_COUNTERS, group_key='interfaces')
+        # Incrémentée à chaque modification (cache des réponses, voir stats_cache.py)
+        self.version = 0
+        self._prefilter = EventTypePrefilter(list(INGEST_FIELDS) + ['stats'])
+        self._extractors = {event_type: FieldExtractor(fields) for event_type, fields in INGEST_FIELDS.items()}
+
+    def ingest(self, event):
+        """Met à jour les compteurs à partir d'un événement eve décodé."""
+        event_type = event.get('event_type')
+        if event_type == 'stats':
+            self._add_stats(event)
+            return
+        if event_type == 'alert':
+            alert = event.get('alert') if isinstance(event.get('alert'), dict) else {}
+            self._add_alert(event.get('timestamp'), alert.get('signature'))
+        elif event_type == 'dns':
+            dns = event.get('dns') if isinstance(event.get('dns'), dict) else {}
+            self._add_dns(event.get('timestamp'), dns.get('type'), dns.get('rrname'))
+        elif event_type == 'tls':
+            tls = event.get('tls') if isinstance(event.get('tls'), dict) else {}
+            self._add_tls(event.get('timestamp'), tls.get('sni'))
+
+    def ingest_line(self, line):
+        """Comme ingest(), à partir de la ligne brute (bytes).
+
+        L'event_type est reconnu au niveau octet: les autres types (flow,
+        http...) sont ignorés sans décodage, et seuls les champs utiles au
+        type sont extraits. Les événements 'stats', conservés en entier,
+        sont décodés complètement (ValueError si la ligne n'est pas du JSON
+        valide).
+        """
+        event_type = self._prefilter.classify(line)
+        if event_type == 'stats':
+            event = loads(line)
+            if isinstance(event, dict):
+                self._add_stats(event)
+            return
+        extractor = self._extractors.get(event_type)
+        if extractor is not None:
+            getattr(self, '_add_' + event_type)(*extractor.extract(line))
+
+    @staticmethod
+    def _event_time(timestamp):
+        timestamp = parse_eve_timestamp(timestamp)
+        return timestamp if timestamp is not None else time.time()
+
+    def _add_alert(self, timestamp, signature):
+        if signature is not None:
+            with self.lock:
+                self.signatures.add(signature, self._event_time(timestamp))
+                self.version += 1
+
+    def _add_dns(self, timestamp, dns_type, rrname):
+        if dns_type == 'query' and rrname is not None:
+            with self.lock:
+                self.dns_queries.add(rrname, self._event_time(timestamp))
+                self.version += 1
+
+    def _add_tls(self, timestamp, sni):
+        if sni is not None:
+            with self.lock:
+                self.tls_sni.add(sni, self._event_time(timestamp))
+                self.version += 1
+
+    def _add_stats(self, event):
+        with self.lock:
+            self.latest_stats = event
+            self.version += 1
+            self.series.add(event)
+            point = capture_point(event)
+            if point is not None:
+                self.capture_history.append(point)
+
+    def add_interface_stats(self, timestamp, ifaces):
+        """Intègre un relevé iface-stat: {interface: {compteur: valeur cumulée}} à l'instant timestamp."""
+        totals = {}
+        for counters in ifaces.values():
+            for name, value in counters.items():
+                totals[name] = totals.get(name, 0) + value
+        with self.lock:
+            self.interfaces.add_counters(timestamp, totals, ifaces)
+            self.version += 1
+
+    def _top(self, aggregator, n, window):
+        with self.lock:
+            counter = aggregator.get(window)
+            return counter.most_common(n), counter.cardinality()
+
+    def top_signatures(self, n=10, window=DEFAULT_WINDOW):
+        """Retourne ([(signature, compte)], nb de signatures distinctes) sur la fenêtre."""
+        return self._top(self.signatures, n, window)
+
+    def top_dns(self, n=10, window=DEFAULT_WINDOW):
+        return self._top(self.dns_queries, n, window)
+
+    def top_tls_sni(self, n=10, window=DEFAULT_WINDOW):
+        return self._top(self.tls_sni, n, window)
+
+    def get_latest_stats(self):
+        with self.lock:
+            return self.latest_stats
+
+    def get_capture_history(self):
+        with self.lock:
+            return list(self.capture_history)
+
+    def get_stats_buckets(self, resolution=DEFAULT_RESOLUTION):
+        with self.lock:
+            return self.series.buckets(resolution)
+
+    def get_interface_buckets(self, resolution=DEFAULT_RESOLUTION):
+        with self.lock:
+            return self.interfaces.buckets(resolution)
+
+    def get_stats_series(self, resolution=DEFAULT_RESOLUTION, threads=False):
+        """Débits, deltas et % de pertes par bucket de la résolution (voir stats_series.py)."""
+        return series_payload(self.get_stats_buckets(resolution), resolution, threads)
+
+    def get_interface_series(self, resolution=DEFAULT_RESOLUTION):
+        """Débits et % de pertes par interface et au total (relevés iface-stat)."""
+        return interface_series_payload(self.get_interface_buckets(resolution), resolution)
+
+    def snapshot(self, n=10):
+        """Retourne une copie sérialisable (JSON) des top-n et des dernières stats.
+
+        Format lu par shared_state.SnapshotStatsState pour les processus qui
+        n'alimentent pas eux-mêmes l'état.
+        """
+        tops = {}
+        with self.lock:
+            for name, aggregator in (('signatures', self.signatures), ('dns_queries', self.dns_queries),
+                                     ('tls_sni', self.tls_sni)):
+                tops[name] = {
+                    window: [counter.most_common(n), counter.cardinality()]
+                    for window, counter in aggregator.windows.items()
+                }
+            return {
+                'top_n': n,
+                'tops': tops,
+                'latest_stats': self.latest_stats,
+                'capture_history': list(self.capture_history),
+                'stats_series': {resolution: self.series.buckets(resolution) for resolution in self.series.resolutions},
+                'iface_series': {resolution: self.interfaces.buckets(resolution)
+                                 for resolution in self.interfaces.resolutions},
+            }
+
+
+class EveTailer:
+    """Alimente EveStatsState à partir du LogFollower partagé d'eve.json.
+
+    Le suivi du fichier (inode, offset, rotation) est assuré par le follower;
+    le tailer ne fait que décoder les lignes qu'il reçoit. À l'enregistrement,
+    les bootstrap_bytes précédant la fin du fichier sont relus pour amorcer
+    les compteurs avec l'historique récent.
+    """
+
+    def __init__(self, follower, state, bootstrap_bytes=DEFAULT_BOOTSTRAP_BYTES):
+        self.follower = follower
+        self.state = state
+        self.bootstrap_bytes = bootstrap_bytes
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self.follower.add_listener(self._on_lines, backfill_bytes=self.bootstrap_bytes)
+        logger.info(f"Eve tailer attached to {self.follower.path}")
+
+    def stop(self):
+        if self._started:
+            self.follower.remove_listener(self._on_lines)
+            self._started = False
+
+    def _on_lines(self, entries):
+        for _, line in entries:
+            try:
+                self.state.ingest_line(line)
+            except ValueError:
+                logger.warning(f"Skipping malformed JSON line in {self.follower.path}: {line[:200]!r}")
@@ -0,0 +1,53 @@
+"""Utilitaires de temps pour les événements eve (timestamps et durées de fenêtre)."""
+import calendar
+import time
+
+# Cache de la dernière seconde convertie: les événements consécutifs partagent
+# presque toujours le même préfixe 'YYYY-mm-ddTHH:MM:SS'
+_last_prefix = (None, 0)
+
+WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_eve_timestamp(timestamp):
+    """Convertit un timestamp eve ('2024-01-01T12:00:00.123456+0000') en epoch (float).
+
+    Retourne None si le format n'est pas reconnu.
+    """
+    global _last_prefix
+    if not isinstance(timestamp, str) or len(timestamp) < 19:
+        return None
+    prefix = timestamp[:19]
+    cached_prefix, epoch = _last_prefix
+    if prefix != cached_prefix:
+        try:
+            epoch = calendar.timegm(time.strptime(prefix, '%Y-%m-%dT%H:%M:%S'))
+        except ValueError:
+            return None
+        _last_prefix = (prefix, epoch)
+    value = float(epoch)
+
+    rest = timestamp[19:]
+    if rest.startswith('.'):
+        end = 1
+        while end < len(rest) and rest[end].isdigit():
+            end += 1
+        if end > 1:
+            value += float(rest[:end])
+        rest = rest[end:]
+    # Décalage horaire '+0000', '+02:00' ou 'Z'
+    if len(rest) >= 5 and rest[0] in '+-':
+        digits = rest[1:].replace(':', '')
+        try:
+            offset = int(digits[:2]) * 3600 + int(digits[2:4]) * 60
+        except ValueError:
+            return value
+        value -= offset if rest[0] == '+' else -offset
+    return value
+
+
+def parse_window(window):
+    """Convertit une durée '5m', '1h', '24h', '30s' en secondes. Lève ValueError si invalide."""
+    if not window or window[-1] not in WINDOW_UNITS:
+        raise ValueError(f"Invalid window: {window!r}")
+    return int(window[:-1]) * WINDOW_UNITS[window[-1]]
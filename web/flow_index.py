@@ -0,0 +1,211 @@
+"""Index flow_id -> positions des événements dans eve.json (/api/flow/<flow_id>).
+
+Alimenté par le LogFollower d'eve.json: pour chaque ligne, le flow_id est
+extrait au niveau octet (sans décoder le JSON) et la position (inode,
+offset) de la ligne est ajoutée à la liste du flux. Les flux sont gardés
+dans un OrderedDict dans l'ordre de leur dernière activité: les plus
+anciens sont évincés au-delà de max_flows (LRU) ou après ttl secondes sans
+nouvel événement. Retrouver tous les événements d'un flux coûte alors un
+seek par événement, quelle que soit la taille du fichier.
+
+L'index peut ne connaître qu'une partie d'un flux: flux apparu moins de
+ttl secondes après le démarrage (il a pu commencer avant, y compris avant
+l'historique relu), flux évincé puis revenu (ses premières positions sont
+perdues), positions au-delà de MAX_EVENTS_PER_FLOW, ou fichier compressé
+ou supprimé depuis. FlowIndexer.events() le signale
+pour que l'appelant complète avec l'index de recherche. Les flux évincés
+sont retenus dans un filtre de Bloom (deux générations de
+EVICTED_BLOOM_BITS bits): un faux positif ne coûte qu'une recherche de plus.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from eve_decode import loads
+from eve_index import eve_file_family
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_FLOWS = 500000
+DEFAULT_TTL = 3600
+# Nombre maximal de positions gardées par flux (flux très bavards)
+MAX_EVENTS_PER_FLOW = 1000
+# Filtre des flux évincés: taille d'une génération (bits) et nombre de hachages
+EVICTED_BLOOM_BITS = 1 << 23
+EVICTED_BLOOM_HASHES = 3
+
+_FLOW_ID = re.compile(rb'"flow_id":\s*(\d+)')
+
+
+def _evicted_positions(flow_id):
+    key = str(flow_id).encode('ascii')
+    h1 = zlib.crc32(key)
+    h2 = zlib.adler32(key) | 1
+    return [(h1 + i * h2) % EVICTED_BLOOM_BITS for i in range(EVICTED_BLOOM_HASHES)]
+
+
+class FlowIndex:
+    """flow_id -> [(inode, offset)], avec éviction LRU et expiration."""
+
+    def __init__(self, max_flows=DEFAULT_MAX_FLOWS, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_flows = max_flows
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._flows = OrderedDict()  # flow_id -> (dernière activité, positions, flux vu en entier)
+        # Génération courante et précédente; la courante est renouvelée tous les max_flows flux évincés
+        self._evicted = [bytearray(EVICTED_BLOOM_BITS // 8), bytearray(EVICTED_BLOOM_BITS // 8)]
+        self._evicted_count = 0
+
+    def add_many(self, items, whole=True):
+        """Ajoute des (flow_id, inode, offset).
+
+        whole=False marque les flux créés ici comme possiblement incomplets
+        (le flux a pu commencer avant le début du suivi).
+        """
+        now = self.clock()
+        flows = self._flows
+        with self._lock:
+            for flow_id, inode, offset in items:
+                entry = flows.pop(flow_id, None)
+                if entry is None:
+                    entry = (now, [], whole and not self._was_evicted(flow_id))
+                _, positions, flow_whole = entry
+                if len(positions) < MAX_EVENTS_PER_FLOW:
+                    positions.append((inode, offset))
+                else:
+                    flow_whole = False  # positions suivantes perdues
+                flows[flow_id] = (now, positions, flow_whole)
+            while len(flows) > self.max_flows:
+                self._evict(flows.popitem(last=False)[0])
+            self._expire(now)
+
+    def _expire(self, now):
+        horizon = now - self.ttl
+        flows = self._flows
+        while flows:
+            flow_id, (last_seen, _, _) = next(iter(flows.items()))
+            if last_seen >= horizon:
+                break
+            del flows[flow_id]
+            self._evict(flow_id)
+
+    def _evict(self, flow_id):
+        if self._evicted_count >= self.max_flows:
+            self._evicted = [bytearray(EVICTED_BLOOM_BITS // 8), self._evicted[0]]
+            self._evicted_count = 0
+        bloom = self._evicted[0]
+        for bit in _evicted_positions(flow_id):
+            bloom[bit >> 3] |= 1 << (bit & 7)
+        self._evicted_count += 1
+
+    def _was_evicted(self, flow_id):
+        positions = _evicted_positions(flow_id)
+        return any(all(bloom[bit >> 3] & (1 << (bit & 7)) for bit in positions) for bloom in self._evicted)
+
+    def lookup(self, flow_id):
+        """Retourne (positions, entier): entier est faux si des événements du flux ont pu échapper à l'index.
+
+        ([], False) si le flux est inconnu ou expiré.
+        """
+        with self._lock:
+            self._expire(self.clock())
+            entry = self._flows.get(flow_id)
+            return (list(entry[1]), entry[2]) if entry is not None else ([], False)
+
+    def __len__(self):
+        return len(self._flows)
+
+
+class FlowIndexer:
+    """Alimente un FlowIndex à partir du LogFollower d'eve.json et relit les événements indexés."""
+
+    def __init__(self, follower, index, backfill_bytes=0):
+        self.follower = follower
+        self.index = index
+        self.backfill_bytes = backfill_bytes
+        self._paths = {}  # inode -> chemin (les fichiers tournés changent de nom)
+        self._started = False
+        self._whole_after = None
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        # Un flux actif au démarrage se manifeste dans les ttl secondes: avant, un nouveau flux a pu commencer plus tôt
+        self._whole_after = self.index.clock() + self.index.ttl
+        self.follower.add_listener(self._on_lines, backfill_bytes=self.backfill_bytes)
+        logger.info(f"Flow index attached to {self.follower.path}")
+
+    def stop(self):
+        if self._started:
+            self.follower.remove_listener(self._on_lines)
+            self._started = False
+
+    def _on_lines(self, entries):
+        inode = self.follower.inode
+        items = []
+        for offset, line in entries:
+            match = _FLOW_ID.search(line)
+            if match:
+                items.append((int(match.group(1)), inode, offset))
+        if items:
+            self.index.add_many(items, whole=self.index.clock() >= self._whole_after)
+
+    def _path_for(self, inode):
+        if inode == self.follower.inode:
+            return self.follower.path
+        path = self._paths.get(inode)
+        if path is not None:
+            try:
+                if os.stat(path).st_ino == inode:
+                    return path
+            except FileNotFoundError:
+                pass
+        for candidate in eve_file_family(self.follower.path):
+            try:
+                if os.stat(candidate).st_ino == inode:
+                    self._paths[inode] = candidate
+                    return candidate
+            except FileNotFoundError:
+                continue
+        return None
+
+    def events(self, flow_id):
+        """Relit les événements indexés du flux; retourne (événements triés par timestamp, complet).
+
+        complet est faux si l'index ne connaît qu'une partie du flux ou si
+        un fichier n'a pas pu être relu (compressé ou supprimé depuis).
+        """
+        events = []
+        by_inode = {}
+        positions, complete = self.index.lookup(flow_id)
+        for inode, offset in positions:
+            by_inode.setdefault(inode, []).append(offset)
+        for inode, offsets in by_inode.items():
+            path = self._path_for(inode)
+            if path is None:
+                # Fichier compressé ou supprimé par la rotation
+                complete = False
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    for offset in offsets:
+                        f.seek(offset)
+                        try:
+                            event = loads(f.readline())
+                        except ValueError:
+                            complete = False
+                            continue
+                        if isinstance(event, dict) and event.get('flow_id') == flow_id:
+                            events.append(event)
+                        else:
+                            complete = False  # fichier tronqué ou remplacé depuis l'indexation
+            except FileNotFoundError:
+                complete = False
+        events.sort(key=lambda event: event.get('timestamp', ''))
+        return events, complete
@@ -0,0 +1,30 @@
+"""Configuration gunicorn de l'interface web (valeurs surchargées par variables d'environnement).
+
+Chaque client SSE occupe un thread d'un worker 'gthread' pendant toute la
+durée du flux: WEB_THREADS borne le nombre de flux simultanés par worker.
+Avec plusieurs workers, un seul suit eve.json pour les statistiques et
+publie un instantané dans STATS_SHARED_DIR (voir shared_state.py).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_WORKERS', str(min(multiprocessing.cpu_count(), 4))))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '32'))
+# Délai de vie du worker (heartbeat), pas la durée maximale d'une requête en gthread
+timeout = int(os.environ.get('WEB_TIMEOUT', '60'))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '10'))
+keepalive = 5
+# Chaque worker démarre ses propres threads de suivi après le fork
+preload_app = False
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+
+if workers > 1:
+    os.environ.setdefault('STATS_SHARED_DIR', '/dev/shm/suricata-web')
+
+
+def worker_exit(server, worker):
+    """Arrêt propre du worker: followers, rôle de writer et pool de connexions."""
+    import app
+    app.shutdown()
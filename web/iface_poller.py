@@ -0,0 +1,98 @@
+"""Relevé périodique des compteurs des interfaces de capture par le socket de commande.
+
+Toutes les `interval` secondes, iface-list donne les interfaces suivies par
+Suricata, puis iface-stat leurs compteurs cumulés (paquets, pertes, sommes
+de contrôle invalides, contournements). Les relevés alimentent la série par
+interface d'EveStatsState (voir stats_series.py), qui en tire débits et
+déséquilibres entre interfaces.
+
+Ne tourne que dans le processus qui alimente l'état (writer), comme le
+tailer d'eve.json.
+"""
+import logging
+import threading
+import time
+
+from stats_series import IFACE_COUNTERS
+from unix_client import SuricataCommandError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 10.0
+
+# Compteur exposé -> clé de la réponse iface-stat
+IFACE_STAT_FIELDS = {
+    'packets': 'pkts',
+    'drops': 'drop',
+    'invalid_checksums': 'invalid-checksums',
+    'bypassed': 'bypassed',
+}
+assert tuple(IFACE_STAT_FIELDS) == IFACE_COUNTERS
+
+
+class InterfaceStatsPoller:
+    """Interroge iface-list/iface-stat et transmet les relevés à state.add_interface_stats()."""
+
+    def __init__(self, execute, state, interval=DEFAULT_INTERVAL, clock=time.time):
+        self.execute = execute
+        self.state = state
+        self.interval = interval
+        self.clock = clock
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._failing = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='iface-stats-poller', daemon=True)
+        self._thread.start()
+        logger.info(f"Interface stats poller started (every {self.interval}s)")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _message(self, command, arguments=None):
+        command_data = {'command': command}
+        if arguments:
+            command_data['arguments'] = arguments
+        response = self.execute(command_data)
+        if response.get('return') != 'OK':
+            raise SuricataCommandError(f"{command} failed: {response.get('message')}")
+        return response.get('message')
+
+    def poll(self):
+        """Relève les compteurs de toutes les interfaces et les transmet à l'état."""
+        listing = self._message('iface-list')
+        ifaces = listing.get('ifaces', []) if isinstance(listing, dict) else []
+        counters = {}
+        for iface in ifaces:
+            stat = self._message('iface-stat', {'iface': iface})
+            if not isinstance(stat, dict):
+                continue
+            counters[iface] = {
+                name: stat[key] for name, key in IFACE_STAT_FIELDS.items()
+                if isinstance(stat.get(key), (int, float))
+            }
+        self.state.add_interface_stats(self.clock(), counters)
+        return counters
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+                if self._failing:
+                    logger.info("Interface stats polling recovered")
+                self._failing = False
+            except (SuricataCommandError, OSError) as e:
+                # Suricata arrêté ou socket absent: ne le signaler qu'une fois
+                if not self._failing:
+                    logger.warning(f"Interface stats polling failed: {e}")
+                self._failing = True
+            except Exception as e:
+                logger.error(f"Interface stats poller error: {e}", exc_info=True)
+            if self._stop_event.wait(self.interval):
+                return
@@ -0,0 +1,273 @@
+"""Accès par morceaux aux gros fichiers de logs (/logs/<filename>).
+
+Un eve.json de plusieurs Gio ne doit jamais être chargé d'un bloc:
+- téléchargement en flux par blocs de CHUNK_SIZE, avec requêtes Range
+  (bytes=a-b, bytes=a-, bytes=-n) et compression gzip à la volée;
+- mode « tail »: les derniers octets, alignés sur un début de ligne;
+- pages de lignes par numéro (?from_line=&count=) ou par offset
+  (?offset=&limit=).
+
+Les pages par numéro de ligne s'appuient sur un index creux (LineIndex):
+l'offset d'une ligne sur LINE_INDEX_STRIDE, étendu au fil de la croissance
+du fichier. Atteindre la ligne n ne relit qu'au plus LINE_INDEX_STRIDE
+lignes. Les archives tournées (eve.json.2.gz) sont paginées sur leur
+contenu décompressé (voir logset.py).
+"""
+import logging
+import os
+import threading
+import zlib
+from array import array
+
+from logset import compression_of, log_size, open_log
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+READ_SIZE = 1024 * 1024
+LINE_INDEX_STRIDE = 1024
+DEFAULT_PAGE_LINES = 100
+MAX_PAGE_LINES = 5000
+# Au-delà, tail_bytes est refusé (utiliser Range)
+MAX_TAIL_BYTES = 64 * 1024 * 1024
+# Niveau zlib de la compression à la volée: débit avant taux de compression
+DOWNLOAD_GZIP_LEVEL = 1
+
+
+class RangeNotSatisfiable(ValueError):
+    """Plage demandée hors du fichier (réponse 416)."""
+
+
+def parse_range(header, size):
+    """Retourne (début, fin incluse) pour un en-tête Range, ou None s'il doit être ignoré.
+
+    Seule une plage simple est servie: une liste de plages est ignorée
+    (réponse complète, autorisée par la RFC 9110). Lève RangeNotSatisfiable.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if not first:
+        # bytes=-0, ou suffixe demandé sur un fichier vide
+        if suffix <= 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - suffix), size - 1
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def iter_file(path, start, end, chunk_size=CHUNK_SIZE):
+    """Génère le contenu brut de path entre start et end (exclue), par blocs."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def iter_gzip(chunks, level=DOWNLOAD_GZIP_LEVEL):
+    """Compresse un flux de blocs au format gzip, sans vidage intermédiaire."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def tail_start(path, size, tail_bytes):
+    """Offset du premier début de ligne parmi les tail_bytes derniers octets."""
+    start = max(0, size - tail_bytes)
+    if start == 0:
+        return 0
+    with open(path, 'rb') as f:
+        f.seek(start - 1)
+        while start < size:
+            chunk = f.read(min(CHUNK_SIZE, size - start + 1))
+            if not chunk:
+                break
+            newline = chunk.find(b'\n')
+            if newline >= 0:
+                return start + newline
+            start += len(chunk)
+    return size
+
+
+class LineIndex:
+    """Offsets d'une ligne sur LINE_INDEX_STRIDE d'un fichier (identifié par son inode)."""
+
+    def __init__(self, path, inode, stride=LINE_INDEX_STRIDE):
+        self.path = path
+        self.inode = inode
+        self.stride = stride
+        self.offsets = array('Q', [0])  # offsets[k]: début de la ligne k * stride
+        self.lines = 0                  # lignes complètes indexées
+        self.indexed = 0                # octets indexés (jusqu'à la dernière ligne complète)
+        self.lock = threading.Lock()
+
+    def extend(self, f, size):
+        """Indexe les lignes complètes ajoutées depuis le dernier appel (f: fichier ouvert par open_log)."""
+        if size < self.indexed:
+            raise ValueError(f"{self.path} was truncated")
+        f.seek(self.indexed)
+        position = self.indexed
+        pending = b""
+        while position + len(pending) < size:
+            data = f.read(min(READ_SIZE, size - position - len(pending)))
+            if not data:
+                break
+            pending += data
+            last_newline = pending.rfind(b'\n')
+            if last_newline < 0:
+                continue  # ligne plus longue qu'un bloc
+            chunk, pending = pending[:last_newline + 1], pending[last_newline + 1:]
+            lines = chunk.count(b'\n')
+            to_boundary = self.stride - self.lines % self.stride
+            pos = 0
+            remaining = lines
+            while remaining >= to_boundary:
+                for _ in range(to_boundary):
+                    pos = chunk.index(b'\n', pos) + 1
+                self.offsets.append(position + pos)
+                remaining -= to_boundary
+                to_boundary = self.stride
+            self.lines += lines
+            position += len(chunk)
+        # La dernière ligne incomplète (en cours d'écriture) sera relue au prochain appel
+        self.indexed = position
+
+    def line_offset(self, line):
+        """(offset, numéro) du point d'index le plus proche avant la ligne `line`."""
+        k = min(line // self.stride, len(self.offsets) - 1)
+        return self.offsets[k], k * self.stride
+
+
+_line_indexes = {}  # chemin -> LineIndex
+_line_indexes_lock = threading.Lock()
+
+
+def get_line_index(path):
+    inode = os.stat(path).st_ino
+    with _line_indexes_lock:
+        index = _line_indexes.get(path)
+        if index is None or index.inode != inode:
+            # Nouveau fichier ou fichier remplacé par la rotation
+            index = _line_indexes[path] = LineIndex(path, inode)
+        return index
+
+
+def _read_lines(f, end, count):
+    """Lit jusqu'à count lignes complètes avant l'offset end. Retourne (lignes, offset suivant)."""
+    lines = []
+    position = f.tell()
+    while len(lines) < count and position < end:
+        line = f.readline()
+        if not line.endswith(b'\n') or position + len(line) > end:
+            break
+        position += len(line)
+        lines.append(line.rstrip(b'\r\n').decode('utf-8', errors='replace'))
+    return lines, position
+
+
+def read_line_page(path, from_line, count):
+    """Page de lignes par numéro (from_line < 0: compté depuis la fin).
+
+    Retourne {"from_line", "next_line", "total_lines", "size", "lines"};
+    next_line vaut None quand la page atteint la fin du fichier.
+    """
+    index = get_line_index(path)
+    with index.lock, open_log(path) as f:
+        size = log_size(f)
+        try:
+            index.extend(f, size)
+        except ValueError:
+            # Fichier tronqué (copytruncate): réindexer depuis le début
+            index = LineIndex(path, index.inode)
+            with _line_indexes_lock:
+                _line_indexes[path] = index
+            index.extend(f, size)
+        if from_line < 0:
+            from_line = max(0, index.lines + from_line)
+        from_line = min(from_line, index.lines)
+        offset, line = index.line_offset(from_line)
+        f.seek(offset)
+        while line < from_line:
+            f.readline()
+            line += 1
+        lines, _ = _read_lines(f, index.indexed, count)
+        total = index.lines
+    next_line = from_line + len(lines)
+    return {
+        "from_line": from_line,
+        "next_line": next_line if next_line < total else None,
+        "total_lines": total,
+        "size": size,
+        "lines": lines,
+    }
+
+
+def read_offset_page(path, offset, limit):
+    """Page de lignes à partir d'un offset (la ligne entamée par offset est sautée).
+
+    Retourne {"offset", "next_offset", "size", "lines"}; next_offset vaut
+    None à la fin du fichier.
+    """
+    with open_log(path) as f:
+        size = log_size(f)
+        offset = min(offset, size)
+        if offset > 0:
+            f.seek(offset - 1)
+            if f.read(1) != b'\n':
+                offset += len(f.readline())
+        f.seek(offset)
+        lines, next_offset = _read_lines(f, size, limit)
+    return {
+        "offset": offset,
+        "next_offset": next_offset if next_offset < size else None,
+        "size": size,
+        "lines": lines,
+    }
+
+
+def log_mimetype(filename, eve_file):
+    """Type MIME servi pour un fichier de logs."""
+    compression = compression_of(filename)
+    if compression == 'gzip':
+        return 'application/gzip'
+    if compression == 'zstd':
+        return 'application/zstd'
+    if filename == eve_file or filename.startswith(eve_file + '.') or filename.startswith(eve_file + '-'):
+        # Un événement JSON par ligne: servi comme NDJSON pour que le navigateur
+        # ne tente pas de l'interpréter comme un seul document
+        return 'application/x-ndjson'
+    return 'text/plain'
+
+
+class LogDownload:
+    """Réponse de téléchargement: statut, en-têtes, type MIME et blocs du corps."""
+
+    def __init__(self, status, mimetype, headers=None, chunks=()):
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = headers or {}
+        self.chunks = chunks
@@ -0,0 +1,481 @@
+"""Suivi en processus des fichiers de logs, partagé entre tous les clients.
+
+Un seul LogFollower par fichier (voir get_follower) remplace les processus
+`tail -f` lancés pour chaque client SSE. Le thread du follower est réveillé
+par inotify quand il est disponible (sinon par scrutation périodique), gère
+la rotation en comparant l'inode, et distribue les nouvelles lignes:
+
+- aux listeners (callbacks synchrones, ex: état des statistiques);
+- aux abonnements (files bornées par client, l'entrée la plus ancienne est
+  jetée quand un client lent ne suit pas).
+"""
+import asyncio
+import os
+import ctypes
+import ctypes.util
+import errno
+import logging
+import select
+import struct
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_SUBSCRIPTION_SIZE = 1000
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_INOTIFY_DIR_MASK = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class _Inotify:
+    """Surveillance inotify minimale via ctypes (Linux uniquement)."""
+
+    def __init__(self, directory):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify not supported on this platform")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _INOTIFY_DIR_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed on {directory}")
+
+    def wait(self, timeout):
+        """Attend un événement (ou timeout) puis vide la file inotify."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 64 * _INOTIFY_EVENT.size + 4096):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Subscription:
+    """File bornée des lignes destinées à un client.
+
+    Quand la file est pleine, la ligne la plus ancienne est jetée et
+    comptabilisée dans `dropped`.
+    """
+
+    def __init__(self, follower, maxsize=DEFAULT_SUBSCRIPTION_SIZE):
+        self.follower = follower
+        self._queue = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, lines):
+        with self._cond:
+            overflow = len(self._queue) + len(lines) - self._queue.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+            self._queue.extend(lines)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Retourne toutes les lignes en attente (liste éventuellement vide après timeout)."""
+        with self._cond:
+            if not self._queue and not self.closed:
+                self._cond.wait(timeout)
+            lines = list(self._queue)
+            self._queue.clear()
+            return lines
+
+    def take_dropped(self):
+        """Retourne le nombre de lignes jetées depuis le dernier appel et le remet à zéro."""
+        with self._cond:
+            dropped, self.dropped = self.dropped, 0
+            return dropped
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self.follower.unsubscribe(self)
+
+
+class AsyncSubscription:
+    """Variante de Subscription consommée depuis une boucle asyncio.
+
+    Les lignes sont poussées par le thread du follower via
+    call_soon_threadsafe; des milliers de clients SSE peuvent ainsi attendre
+    dans une seule boucle sans occuper un thread chacun.
+    """
+
+    def __init__(self, follower, loop, maxsize=DEFAULT_SUBSCRIPTION_SIZE):
+        self.follower = follower
+        self.loop = loop
+        self._queue = deque(maxlen=maxsize)
+        self._event = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, lines):
+        try:
+            self.loop.call_soon_threadsafe(self._push, lines)
+        except RuntimeError:
+            # Boucle fermée: le client est parti
+            self.follower.unsubscribe(self)
+
+    def _push(self, lines):
+        overflow = len(self._queue) + len(lines) - self._queue.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self._queue.extend(lines)
+        self._event.set()
+
+    async def get(self, timeout=None):
+        """Retourne toutes les lignes en attente (liste éventuellement vide après timeout)."""
+        if not self._queue and not self.closed:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._event.clear()
+        lines = list(self._queue)
+        self._queue.clear()
+        return lines
+
+    def take_dropped(self):
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def close(self):
+        self.closed = True
+        try:
+            self.loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass
+        self.follower.unsubscribe(self)
+
+
+class LogFollower:
+    """Suit un fichier de log et distribue les lignes ajoutées.
+
+    Démarre en fin de fichier. La position est (inode, offset): un nouvel
+    inode (rotation) ou une taille inférieure à l'offset (troncature) fait
+    repartir la lecture au début du nouveau fichier, après avoir vidé la fin
+    de l'ancien quand il est encore ouvert.
+    """
+
+    def __init__(self, path, poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.inode = None
+        self.offset = 0
+        self._file = None
+        self._partial = b""
+        # Vrai si le fichier était absent: à son apparition, il est lu depuis le début
+        self._missing = False
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._subscriptions = set()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # --- Cycle de vie ---
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=f"log-follower:{self.path}", daemon=True)
+            self._thread.start()
+        logger.info(f"Log follower started for {self.path}")
+
+    def stop(self, timeout=2):
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            for subscription in list(self._subscriptions):
+                subscription.close()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        logger.info(f"Log follower stopped for {self.path}")
+
+    def _run(self):
+        watcher = None
+        if self.use_inotify:
+            try:
+                watcher = _Inotify(os.path.dirname(os.path.abspath(self.path)))
+                logger.info(f"Using inotify to follow {self.path}")
+            except OSError as e:
+                logger.info(f"inotify unavailable for {self.path} ({e}), falling back to polling")
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.error(f"Error while following {self.path}: {e}", exc_info=True)
+                if watcher is not None:
+                    # Le timeout sert de filet de sécurité (volumes où inotify ne remonte rien)
+                    watcher.wait(self.poll_interval)
+                else:
+                    self._stop_event.wait(self.poll_interval)
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+    # --- Consommateurs ---
+
+    def add_listener(self, callback, backfill_bytes=0, from_offset=None):
+        """Enregistre callback(entries), appelé avec une liste de (offset, ligne) à chaque lecture.
+
+        backfill_bytes > 0 livre d'abord à ce listener seul les lignes
+        complètes situées dans les backfill_bytes précédant la position
+        courante (amorçage avec l'historique récent); from_offset livre les
+        lignes du fichier courant à partir de cet offset (reprise).
+
+        Cet historique est relu par blocs sur un descripteur séparé, hors du
+        verrou: les autres consommateurs continuent d'être servis et la
+        mémoire reste bornée quelle que soit la quantité à rattraper. Seules
+        les lignes arrivées entre-temps sont livrées sous le verrou, juste
+        avant l'enregistrement.
+        """
+        with self._lock:
+            self._ensure_position()
+            if self._file is None or (backfill_bytes <= 0 and from_offset is None):
+                self._listeners.append(callback)
+                return
+            inode = self.inode
+            end = self.offset - len(self._partial)
+        start = min(from_offset, end) if from_offset is not None else max(0, end - backfill_bytes)
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_ino == inode:
+                    self._backfill(f, inode, start, end, callback)
+                    return
+        except FileNotFoundError:
+            pass
+        # Fichier remplacé entre-temps: pas d'historique
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _backfill(self, f, inode, start, end, callback):
+        while True:
+            start = _deliver_lines(f, start, end, callback)
+            with self._lock:
+                current_end = self.offset - len(self._partial)
+                if self.inode != inode:
+                    # Rotation pendant le rattrapage: finir l'ancien fichier
+                    _deliver_lines(f, start, None, callback)
+                    logger.warning(f"{self.path} rotated during backfill, "
+                                   f"lines already read from the new file were not replayed")
+                elif current_end - start > READ_CHUNK_SIZE:
+                    # Beaucoup de lignes arrivées pendant ce passage: nouveau passage hors verrou
+                    end = current_end
+                    continue
+                else:
+                    _deliver_lines(f, start, current_end, callback)
+                # Sous le même verrou que la dernière livraison: aucune ligne perdue ni doublée
+                self._listeners.append(callback)
+                return
+
+    def current_inode(self):
+        """Inode du fichier suivi (ouvert au besoin), None s'il n'existe pas encore."""
+        with self._lock:
+            self._ensure_position()
+            return self.inode
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def subscribe(self, maxsize=DEFAULT_SUBSCRIPTION_SIZE):
+        """Crée un abonnement recevant les lignes (bytes) ajoutées à partir de maintenant."""
+        subscription = Subscription(self, maxsize)
+        with self._lock:
+            self._ensure_position()
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def subscribe_async(self, loop, maxsize=DEFAULT_SUBSCRIPTION_SIZE):
+        """Comme subscribe(), pour un consommateur tournant dans la boucle asyncio `loop`."""
+        subscription = AsyncSubscription(self, loop, maxsize)
+        with self._lock:
+            self._ensure_position()
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    # --- Lecture ---
+
+    def _ensure_position(self):
+        """Ouvre le fichier s'il ne l'est pas encore.
+
+        Un fichier présent dès le départ est suivi à partir de sa fin; un
+        fichier apparu après coup (créé ou recréé par rotation) est lu depuis
+        le début.
+        """
+        if self._file is not None:
+            return
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._missing = True
+            return
+        st = os.fstat(self._file.fileno())
+        self.inode = st.st_ino
+        self.offset = 0 if self._missing else st.st_size
+        self._missing = False
+        self._partial = b""
+
+    def poll(self):
+        """Lit les données ajoutées et les distribue. Retourne le nombre de lignes lues."""
+        with self._lock:
+            self._ensure_position()
+            if self._file is None:
+                return 0
+            count = self._drain()
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return count
+            if st.st_ino != self.inode:
+                logger.info(f"{self.path} rotated (inode {self.inode} -> {st.st_ino}), reopening")
+                self._reopen()
+                count += self._drain()
+            elif st.st_size < self.offset:
+                logger.info(f"{self.path} truncated, restarting from offset 0")
+                self.offset = 0
+                self._partial = b""
+                count += self._drain()
+            return count
+
+    def _reopen(self):
+        self._file.close()
+        self._file = None
+        self._missing = True
+        self._ensure_position()
+
+    def _drain(self):
+        if self._file is None:
+            return 0
+        count = 0
+        self._file.seek(self.offset)
+        while True:
+            chunk = self._file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            base = self.offset - len(self._partial)
+            self.offset += len(chunk)
+            data = self._partial + chunk if self._partial else chunk
+            lines = data.split(b"\n")
+            # Le dernier élément est une ligne incomplète (ou vide)
+            self._partial = lines.pop()
+            entries = []
+            for line in lines:
+                stripped = line.rstrip(b"\r")
+                if stripped:
+                    entries.append((base, stripped))
+                base += len(line) + 1
+            if entries:
+                count += len(entries)
+                self._dispatch(entries)
+        return count
+
+    def _dispatch(self, entries):
+        for callback in list(self._listeners):
+            try:
+                callback(entries)
+            except Exception as e:
+                logger.error(f"Listener error on {self.path}: {e}", exc_info=True)
+        if self._subscriptions:
+            lines = [line for _, line in entries]
+            for subscription in list(self._subscriptions):
+                subscription.push(lines)
+
+
+def _deliver_lines(f, start, end, callback):
+    """Livre à callback, par blocs de READ_CHUNK_SIZE, les lignes complètes de f entre start et end.
+
+    end=None lit jusqu'à la fin du fichier. Une ligne entamée à start est
+    ignorée. Retourne l'offset de la première ligne non livrée.
+    """
+    if start > 0:
+        f.seek(start - 1)
+        if f.read(1) != b"\n":
+            start += len(f.readline())
+    f.seek(start)
+    position = start
+    pending = b""
+    while end is None or position + len(pending) < end:
+        size = READ_CHUNK_SIZE if end is None else min(READ_CHUNK_SIZE, end - position - len(pending))
+        chunk = f.read(size)
+        if not chunk:
+            break
+        lines = (pending + chunk if pending else chunk).split(b"\n")
+        pending = lines.pop()
+        entries = []
+        for line in lines:
+            stripped = line.rstrip(b"\r")
+            if stripped:
+                entries.append((position, stripped))
+            position += len(line) + 1
+        if entries:
+            callback(entries)
+    return position
+
+
+_followers = {}
+_followers_lock = threading.Lock()
+
+
+def get_follower(path, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Retourne le LogFollower partagé pour path, créé et démarré au premier appel."""
+    key = os.path.abspath(path)
+    with _followers_lock:
+        follower = _followers.get(key)
+        if follower is None:
+            follower = LogFollower(key, poll_interval=poll_interval)
+            _followers[key] = follower
+            follower.start()
+        return follower
+
+
+def stop_all_followers():
+    """Arrête tous les followers (arrêt propre du serveur)."""
+    with _followers_lock:
+        followers = list(_followers.values())
+        _followers.clear()
+    for follower in followers:
+        follower.stop()
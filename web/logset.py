@@ -0,0 +1,493 @@
+"""Famille de fichiers d'un log: fichier courant, fichiers tournés et archives compressées.
+
+logrotate (voir etc/suricata.logrotate.in) renomme eve.json en eve.json.1
+puis, avec delaycompress, le compresse au tour suivant (eve.json.2.gz).
+list_log_files() retourne tous ces fichiers dans l'ordre chronologique et
+open_log() les ouvre comme des fichiers binaires ordinaires (seek, read,
+readline, itération), les offsets étant ceux du contenu décompressé.
+
+Lecture aléatoire dans une archive sans tout décompresser: un premier
+passage construit un index de points de reprise tous les
+CHECKPOINT_SPACING octets décompressés. Pour gzip, un point de reprise est
+une copie de l'état de zlib (fenêtre de 32 Kio comprise) et chaque début de
+membre en est un gratuit; pour zstd, ce sont les débuts de trames (le
+contexte de décompression ne peut pas être copié). Un seek repart du point
+de reprise précédent: lire « les N dernières lignes » d'une archive coûte
+au plus un intervalle de décompression.
+
+Cet index coûte une décompression complète de l'archive. Avec
+set_index_dir(), il est enregistré sur disque (un fichier JSON par
+archive, construit par un seul processus à la fois) et relu par les
+autres workers et après un redémarrage. L'état de zlib ne pouvant pas
+être sérialisé, un index relu ne garde pour gzip que les offsets des
+points de reprise internes à un membre: le premier seek vers l'un d'eux
+redécompresse le membre depuis son début, une fois par processus. Les
+archives à plusieurs membres gzip ou trames zstd, elles, sont servies
+sans décompression supplémentaire.
+
+zstd nécessite le module zstandard (optionnel); sans lui les archives .zst
+sont ignorées.
+"""
+import bisect
+import fcntl
+import io
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from eve_reader import DEFAULT_BLOCK_SIZE, _iter_lines_reverse_blocks, iter_lines_reverse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_SUFFIX = '.gz'
+ZSTD_SUFFIX = '.zst'
+# Archives reconnues mais non lisibles (ignorées)
+UNSUPPORTED_SUFFIXES = ('.xz', '.bz2')
+# Intervalle entre deux points de reprise (octets décompressés)
+CHECKPOINT_SPACING = 4 * 1024 * 1024
+READ_SIZE = 256 * 1024
+# Nombre d'index d'archives gardés en mémoire
+INDEX_CACHE_SIZE = 16
+INDEX_SUFFIX = '.index.json'
+
+_ROTATION_NUMBER = re.compile(r'^[.-](\d+)')
+_zstd_warned = False
+# Point de reprise relu sur disque dont l'état zlib reste à reconstituer
+_PENDING = object()
+_index_dir = None
+
+
+def compression_of(path):
+    """'gzip', 'zstd' ou None selon l'extension."""
+    if path.endswith(GZIP_SUFFIX):
+        return 'gzip'
+    if path.endswith(ZSTD_SUFFIX):
+        return 'zstd'
+    return None
+
+
+class LogFile:
+    """Un fichier de la famille: chemin, inode, date de modification, compression."""
+
+    def __init__(self, path, inode, mtime, compression=None, rotation=None):
+        self.path = path
+        self.inode = inode
+        self.mtime = mtime
+        self.compression = compression
+        self.rotation = rotation  # numéro de rotation (eve.json.3 -> 3), None pour le fichier courant
+
+    @property
+    def compressed(self):
+        return self.compression is not None
+
+    def __repr__(self):
+        return f"LogFile({self.path!r})"
+
+
+def list_log_files(path, include_compressed=True):
+    """Fichiers de la famille de `path` (eve.json, eve.json.1, eve.json.2.gz...), du plus ancien au plus récent.
+
+    Les fichiers tournés sont ordonnés par date de modification, puis par
+    numéro de rotation décroissant; le fichier courant est toujours le dernier.
+    """
+    global _zstd_warned
+    directory = os.path.dirname(path) or '.'
+    base = os.path.basename(path)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    files = []
+    for name in names:
+        if name != base and not (name.startswith(base + '.') or name.startswith(base + '-')):
+            continue
+        if name.endswith(UNSUPPORTED_SUFFIXES):
+            continue
+        compression = compression_of(name)
+        if compression is not None and not include_compressed:
+            continue
+        if compression == 'zstd' and zstandard is None:
+            if not _zstd_warned:
+                logger.warning(f"Ignoring {name}: install the 'zstandard' module to read .zst archives")
+                _zstd_warned = True
+            continue
+        full = os.path.join(directory, name)
+        try:
+            st = os.stat(full)
+        except FileNotFoundError:
+            continue
+        rotation = None
+        if name != base:
+            match = _ROTATION_NUMBER.match(name[len(base):])
+            rotation = int(match.group(1)) if match else 0
+        files.append(LogFile(full, st.st_ino, st.st_mtime, compression, rotation))
+    files.sort(key=lambda f: (f.rotation is None, f.mtime, -(f.rotation or 0)))
+    return files
+
+
+# --- Index des points de reprise ---
+class CompressedIndex:
+    """Points de reprise d'une archive: offsets décompressés et compressés, état du décompresseur."""
+
+    def __init__(self, compression):
+        self.compression = compression
+        self.offsets = []             # offsets décompressés, croissants
+        self.compressed_offsets = []
+        self.states = []              # copie du décompresseur, ou None (début de membre/trame)
+        self.size = 0                 # taille décompressée
+        self.complete = False         # False si l'archive est tronquée (compression en cours)
+        self._lock = threading.Lock()
+
+    def add(self, offset, compressed_offset, state):
+        if self.offsets and self.offsets[-1] == offset:
+            # Deux points au même offset (fin de membre): garder le plus récent
+            self.offsets.pop()
+            self.compressed_offsets.pop()
+            self.states.pop()
+        self.offsets.append(offset)
+        self.compressed_offsets.append(compressed_offset)
+        self.states.append(state)
+
+    def checkpoint(self, offset):
+        """Dernier point de reprise avant `offset`: (offset décompressé, offset compressé, état)."""
+        i = max(0, bisect.bisect_right(self.offsets, offset) - 1)
+        return self.offsets[i], self.compressed_offsets[i], self.states[i]
+
+    def recover(self, path, offset):
+        """État zlib du point de reprise de checkpoint(offset), relu sur disque sans état.
+
+        Redécompresse depuis le point de reprise précédent qui a un état
+        (au pire le début du membre), en conservant au passage les états
+        des points intermédiaires.
+        """
+        with self._lock:
+            i = max(0, bisect.bisect_right(self.offsets, offset) - 1)
+            if self.states[i] is not _PENDING:
+                return self.states[i]
+            j = i
+            while self.states[j] is _PENDING:
+                j -= 1
+            state = self.states[j]
+            decompressor = state.copy() if state is not None else _new_decompressor(self.compression)
+            produced = self.offsets[j]
+            with open(path, 'rb') as f:
+                f.seek(self.compressed_offsets[j])
+                for k in range(j + 1, i + 1):
+                    remaining = self.compressed_offsets[k] - self.compressed_offsets[k - 1]
+                    while remaining > 0:
+                        data = f.read(min(READ_SIZE, remaining))
+                        if not data:
+                            break
+                        remaining -= len(data)
+                        produced += len(decompressor.decompress(data))
+                    if produced != self.offsets[k]:
+                        raise OSError(f"{path} changed since it was indexed")
+                    self.states[k] = decompressor.copy()
+            return self.states[i]
+
+    def to_json(self):
+        """Forme sérialisable; les états zlib sont remplacés par un drapeau « début de membre »."""
+        return {
+            'compression': self.compression,
+            'size': self.size,
+            'complete': self.complete,
+            'checkpoints': [[offset, compressed_offset, state is None] for offset, compressed_offset, state
+                            in zip(self.offsets, self.compressed_offsets, self.states)],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        index = cls(data['compression'])
+        for offset, compressed_offset, member_start in data['checkpoints']:
+            index.add(offset, compressed_offset, None if member_start else _PENDING)
+        index.size = data['size']
+        index.complete = data['complete']
+        return index
+
+
+def _new_decompressor(compression):
+    if compression == 'gzip':
+        return zlib.decompressobj(zlib.MAX_WBITS | 16)
+    if zstandard is None:
+        raise OSError("zstandard module is not installed")
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def build_index(path, compression, spacing=None):
+    """Décompresse toute l'archive et retourne son CompressedIndex (voir set_index_dir pour ne le faire qu'une fois)."""
+    spacing = spacing or CHECKPOINT_SPACING
+    index = CompressedIndex(compression)
+    decompressor = _new_decompressor(compression)
+    index.add(0, 0, None)
+    position = 0   # octets compressés lus
+    size = 0       # octets décompressés produits
+    last = 0
+    with open(path, 'rb') as f:
+        try:
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                position += len(chunk)
+                data = chunk
+                while data:
+                    size += len(decompressor.decompress(data))
+                    if not decompressor.eof:
+                        break
+                    # Fin d'un membre gzip / d'une trame zstd: la suite est un nouveau départ
+                    data = decompressor.unused_data
+                    if not data.strip(b'\0'):
+                        data = b''  # bourrage de fin de fichier
+                    decompressor = _new_decompressor(compression)
+                    index.add(size, position - len(data), None)
+                    last = size
+                if compression == 'gzip' and not decompressor.eof and size - last >= spacing:
+                    # Tout le morceau a été consommé: l'état correspond à `position`
+                    index.add(size, position, decompressor.copy())
+                    last = size
+        except (zlib.error, EOFError) as e:
+            logger.warning(f"Stopped indexing {path} at byte {position}: {e}")
+        except Exception as e:
+            if zstandard is None or not isinstance(e, zstandard.ZstdError):
+                raise
+            logger.warning(f"Stopped indexing {path} at byte {position}: {e}")
+    index.size = size
+    # Complète si le dernier membre est terminé (point de reprise en fin de contenu)
+    index.complete = index.offsets[-1] == size and index.states[-1] is None and size > 0
+    return index
+
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def set_index_dir(directory):
+    """Enregistre les index d'archives dans `directory`, partagé entre processus (None: en mémoire seulement)."""
+    global _index_dir
+    _index_dir = directory or None
+
+
+def _load_or_build_index(path, compression, key):
+    """Index relu depuis _index_dir, ou construit puis enregistré (un processus à la fois)."""
+    directory = _index_dir
+    if directory is None:
+        return build_index(path, compression)
+    prefix = '{}-{}-'.format(*key[:2])
+    index_path = os.path.join(directory, prefix + '{}-{}'.format(*key[2:]) + INDEX_SUFFIX)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        lock_fd = os.open(os.path.join(directory, 'index.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError as e:
+        logger.warning(f"Cannot use archive index directory {directory}: {e}")
+        return build_index(path, compression)
+    try:
+        # Les autres workers attendent l'index au lieu de décompresser la même archive
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        try:
+            with open(index_path) as f:
+                index = CompressedIndex.from_json(json.load(f))
+            if index.compression == compression:
+                return index
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Rebuilding unreadable archive index {index_path}: {e}")
+        index = build_index(path, compression)
+        if index.complete:
+            try:
+                tmp_path = f"{index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(index.to_json(), f)
+                os.replace(tmp_path, index_path)
+                # Index d'une version précédente de la même archive (même inode)
+                for name in os.listdir(directory):
+                    if name.startswith(prefix) and name.endswith(INDEX_SUFFIX) and name != os.path.basename(index_path):
+                        os.unlink(os.path.join(directory, name))
+            except OSError as e:
+                logger.warning(f"Cannot save archive index {index_path}: {e}")
+        return index
+    finally:
+        os.close(lock_fd)
+
+
+def get_index(path, compression):
+    """Index de l'archive, reconstruit si elle a changé (compression par logrotate en cours)."""
+    st = os.stat(path)
+    key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+    index = _load_or_build_index(path, compression, key)
+    with _index_cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+class _CompressedRaw(io.RawIOBase):
+    """Lecture à accès aléatoire du contenu décompressé d'une archive indexée."""
+
+    def __init__(self, path, index):
+        super().__init__()
+        self.name = path
+        self._file = open(path, 'rb')
+        self._index = index
+        self._pos = 0
+        self._decompressor = None
+        self._input = b''
+        self._buffer = b''
+        self._buffer_start = 0  # offset décompressé de self._buffer[0]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._index.size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return offset
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+    def _restart(self, target):
+        offset, compressed_offset, state = self._index.checkpoint(target)
+        if state is _PENDING:
+            state = self._index.recover(self.name, target)
+        self._file.seek(compressed_offset)
+        self._decompressor = state.copy() if state is not None else _new_decompressor(self._index.compression)
+        self._input = b''
+        self._buffer = b''
+        self._buffer_start = offset
+
+    def _decompress_more(self):
+        """Décompresse le morceau suivant; b'' en fin d'archive."""
+        while True:
+            if self._decompressor.eof:
+                self._input = self._decompressor.unused_data
+                self._decompressor = _new_decompressor(self._index.compression)
+            data = self._input or self._file.read(READ_SIZE)
+            self._input = b''
+            if not data.strip(b'\0'):
+                return b''
+            try:
+                out = self._decompressor.decompress(data)
+            except zlib.error:
+                return b''
+            if out:
+                return out
+
+    def readinto(self, b):
+        size = min(len(b), self._index.size - self._pos)
+        if size <= 0:
+            return 0
+        end = self._buffer_start + len(self._buffer)
+        if (self._decompressor is None or self._pos < self._buffer_start
+                or self._index.checkpoint(self._pos)[0] > end):
+            # Retour en arrière, ou point de reprise plus proche que la position courante
+            self._restart(self._pos)
+        while self._pos >= self._buffer_start + len(self._buffer):
+            self._buffer_start += len(self._buffer)
+            self._buffer = self._decompress_more()
+            if not self._buffer:
+                return 0
+        start = self._pos - self._buffer_start
+        data = self._buffer[start:start + size]
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def open_log(path):
+    """Ouvre un fichier de la famille en lecture binaire (contenu décompressé pour les archives)."""
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, 'rb')
+    return io.BufferedReader(_CompressedRaw(path, get_index(path, compression)), buffer_size=READ_SIZE)
+
+
+def log_size(f):
+    """Taille du contenu d'un fichier ouvert par open_log (décompressé pour les archives)."""
+    position = f.tell()
+    size = f.seek(0, io.SEEK_END)
+    f.seek(position)
+    return size
+
+
+class LogSet:
+    """Lecture d'un log à travers ses rotations, comme un seul flux chronologique."""
+
+    def __init__(self, path, include_compressed=True):
+        self.path = path
+        self.include_compressed = include_compressed
+
+    def files(self):
+        return list_log_files(self.path, self.include_compressed)
+
+    def iter_lines(self):
+        """Génère (LogFile, offset, ligne) du plus ancien fichier au plus récent."""
+        for logfile in self.files():
+            try:
+                with open_log(logfile.path) as f:
+                    offset = 0
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break  # ligne en cours d'écriture
+                        if line.strip():
+                            yield logfile, offset, line.rstrip(b'\r\n')
+                        offset += len(line)
+            except FileNotFoundError:
+                continue  # fichier supprimé par la rotation entre-temps
+
+    def iter_lines_reverse(self, max_bytes=None, block_size=DEFAULT_BLOCK_SIZE, use_mmap=False):
+        """Génère les lignes non vides de la plus récente à la plus ancienne, à travers les rotations.
+
+        max_bytes borne la quantité de données lues (décompressées) sur
+        l'ensemble des fichiers. Lève FileNotFoundError si aucun fichier n'existe.
+        """
+        files = self.files()
+        if not files:
+            raise FileNotFoundError(self.path)
+        remaining = max_bytes
+        for logfile in reversed(files):
+            if remaining is not None and remaining <= 0:
+                return
+            try:
+                if logfile.compressed:
+                    with open_log(logfile.path) as f:
+                        size = log_size(f)
+                        # Un bloc par intervalle entre points de reprise: chaque bloc ne
+                        # coûte qu'une décompression
+                        yield from _iter_lines_reverse_blocks(f, size, max(block_size, CHECKPOINT_SPACING), remaining)
+                else:
+                    size = os.stat(logfile.path).st_size
+                    yield from iter_lines_reverse(logfile.path, block_size=block_size, use_mmap=use_mmap,
+                                                  max_bytes=remaining)
+            except FileNotFoundError:
+                continue
+            if remaining is not None:
+                remaining -= size
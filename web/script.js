@@ -1,5 +1,8 @@
 document.addEventListener('DOMContentLoaded', () => {
     const refreshChartsButton = document.getElementById('refresh-charts');
+    const statsWindowSelect = document.getElementById('stats-window');
+    const sensorSelector = document.getElementById('sensor-selector');
+    const sensorCheckboxes = document.getElementById('sensor-checkboxes');
     const statusMessage = document.getElementById('status-message');
     const commandStatusDiv = document.getElementById('command-status');
     const enableConfTextarea = document.getElementById('enable-conf-content');
@@ -27,8 +30,12 @@ document.addEventListener('DOMContentLoaded', () => {
     const selectEveButton = document.getElementById('select-eve-btn');
     const selectSuricataButton = document.getElementById('select-suricata-btn');
     const currentLogfileSpan = document.getElementById('current-logfile');
+    // AJOUT: Filtre appliqué côté serveur (event_type, src_ip, dest_ip, ip, signature_id, match, sample, reservoir, max_rate)
+    const logStreamFilterInput = document.getElementById('log-stream-filter');
+    const applyLogFilterButton = document.getElementById('apply-log-filter-btn');
     let eventSource = null; // Pour stocker l'instance EventSource
     const MAX_LOG_LINES = 500; // Limiter le nombre de lignes dans le log en direct
+    const LOG_STREAM_BATCH_MS = 250; // Intervalle de regroupement des événements côté serveur
     let currentLogLines = [];
 
     // Map pour stocker les instances de Chart.js
@@ -132,13 +139,96 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
-    // --- NOUVEAU: Fonctions pour récupérer les données et rendre chaque graphique ---
+    // Fenêtre temporelle des Top 10 (5m, 1h, 24h), calculée côté serveur
+    const getStatsWindow = () => statsWindowSelect ? statsWindowSelect.value : '1h';
+
+    // Sondes configurées (voir /api/sensors) et sélection courante
+    let sensorNames = [];
+    const getSelectedSensors = () => sensorCheckboxes
+        ? Array.from(sensorCheckboxes.querySelectorAll('input:checked')).map(input => input.value)
+        : [];
+    // Paramètre ?sensors= (vide quand toutes les sondes sont sélectionnées)
+    const sensorsQuery = () => {
+        const selected = getSelectedSensors();
+        if (sensorNames.length <= 1 || selected.length === sensorNames.length) return '';
+        return `&sensors=${encodeURIComponent(selected.join(','))}`;
+    };
 
-    const fetchAndRenderTopAlerts = async () => {
+    const loadSensors = async () => {
         try {
-            const response = await fetch('/api/stats/top_signatures');
+            const response = await fetch('/api/sensors');
             if (!response.ok) throw new Error(`HTTP ${response.status}`);
-            const apiData = await response.json();
+            const data = await response.json();
+            sensorNames = (data.sensors || []).map(sensor => sensor.name);
+            if (data.config_error) console.error('Invalid sensors configuration:', data.config_error);
+            // Fenêtres historiques (7d) servies seulement si le stockage colonnaire est activé
+            if (statsWindowSelect && data.historical_stats) {
+                statsWindowSelect.querySelectorAll('option[data-historical]').forEach(option => { option.hidden = false; });
+            }
+            if (!sensorSelector || sensorNames.length <= 1) return;
+            sensorCheckboxes.innerHTML = '';
+            (data.sensors || []).forEach(sensor => {
+                const wrapper = document.createElement('div');
+                wrapper.className = 'form-check form-check-inline mb-0';
+                const input = document.createElement('input');
+                input.className = 'form-check-input';
+                input.type = 'checkbox';
+                input.id = `sensor-${sensor.name}`;
+                input.value = sensor.name;
+                input.checked = true;
+                input.addEventListener('change', () => {
+                    // Au moins une sonde reste sélectionnée
+                    if (getSelectedSensors().length === 0) {
+                        input.checked = true;
+                        return;
+                    }
+                    loadAllChartData();
+                });
+                const label = document.createElement('label');
+                label.className = 'form-check-label small' + (sensor.socket_available ? '' : ' text-muted');
+                label.htmlFor = input.id;
+                label.textContent = sensor.name;
+                wrapper.append(input, label);
+                sensorCheckboxes.appendChild(wrapper);
+            });
+            sensorSelector.classList.remove('d-none');
+            sensorSelector.classList.add('d-flex');
+        } catch (error) {
+            console.error('Error loading sensors:', error);
+        }
+    };
+
+    // Dernière réponse de chaque endpoint de stats (URL -> {etag, data}): le
+    // serveur répond 304 sans corps tant que les données n'ont pas changé
+    const statsResponses = new Map();
+
+    const fetchStatsJson = async (url) => {
+        const cached = statsResponses.get(url);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+        const response = await fetch(url, { headers });
+        if (response.status === 304 && cached) return cached.data;
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            statsResponses.set(url, { etag, data });
+        } else {
+            statsResponses.delete(url);
+        }
+        return data;
+    };
+
+    // Widget absent de la réponse ou en erreur (ex: aucun événement 'stats')
+    const checkWidgetData = (data) => {
+        if (!data) throw new Error('No data');
+        if (data.error) throw new Error(data.error);
+    };
+
+    // --- NOUVEAU: Fonctions pour rendre chaque graphique à partir de son widget de /api/dashboard ---
+
+    const renderTopAlerts = (apiData) => {
+        try {
+            checkWidgetData(apiData);
             renderChart('topAlertsChart', 'bar', 
                  {
                     labels: apiData.labels,
@@ -154,16 +244,14 @@ document.addEventListener('DOMContentLoaded', () => {
                  "Top 10 Signatures d'Alerte"
             );
         } catch (error) {
-            console.error('Error fetching/rendering Top Alerts:', error);
+            console.error('Error rendering Top Alerts:', error);
             renderChart('topAlertsChart', 'bar', null, horizontalBarOptions, "Top 10 Signatures d'Alerte"); // Afficher erreur/indisponible
         }
     };
 
-    const fetchAndRenderTopDns = async () => {
+    const renderTopDns = (apiData) => {
         try {
-            const response = await fetch('/api/stats/top_dns');
-            if (!response.ok) throw new Error(`HTTP ${response.status}`);
-            const apiData = await response.json();
+            checkWidgetData(apiData);
             renderChart('topDnsChart', 'bar', 
                  {
                     labels: apiData.labels,
@@ -179,16 +267,14 @@ document.addEventListener('DOMContentLoaded', () => {
                  "Top 10 Requêtes DNS"
             );
         } catch (error) {
-            console.error('Error fetching/rendering Top DNS:', error);
+            console.error('Error rendering Top DNS:', error);
             renderChart('topDnsChart', 'bar', null, horizontalBarOptions, "Top 10 Requêtes DNS");
         }
     };
     
-    const fetchAndRenderTopTlsSni = async () => {
+    const renderTopTlsSni = (apiData) => {
         try {
-            const response = await fetch('/api/stats/top_tls_sni');
-            if (!response.ok) throw new Error(`HTTP ${response.status}`);
-            const apiData = await response.json();
+            checkWidgetData(apiData);
             renderChart('topTlsSniChart', 'bar', 
                  {
                     labels: apiData.labels,
@@ -204,16 +290,14 @@ document.addEventListener('DOMContentLoaded', () => {
                  "Top 10 TLS SNI"
             );
         } catch (error) {
-            console.error('Error fetching/rendering Top TLS SNI:', error);
+            console.error('Error rendering Top TLS SNI:', error);
             renderChart('topTlsSniChart', 'bar', null, horizontalBarOptions, "Top 10 TLS SNI");
         }
     };
     
-    const fetchAndRenderProtoCharts = async () => {
+    const renderProtoCharts = (counters) => {
         try {
-            const response = await fetch('/api/stats/latest_counters');
-            if (!response.ok) throw new Error(`HTTP ${response.status}`);
-            const counters = await response.json();
+            checkWidgetData(counters);
 
             // Decoder Chart (L3/L4)
             const decoderStats = counters.decoder || {};
@@ -271,17 +355,15 @@ document.addEventListener('DOMContentLoaded', () => {
             );
 
         } catch (error) {
-            console.error('Error fetching/rendering Protocol Charts:', error);
+            console.error('Error rendering Protocol Charts:', error);
             renderChart('decoderProtoChart', 'pie', null, pieChartOptions, "Répartition Protocoles L3/L4 (Decodeur)");
             renderChart('appLayerProtoChart', 'doughnut', null, pieChartOptions, "Répartition Protocoles Applicatifs (Flow)");
         }
     };
     
-    const fetchAndRenderCaptureHistory = async () => {
+    const renderCaptureHistory = (apiData) => {
         try {
-            const response = await fetch('/api/stats/capture_history');
-            if (!response.ok) throw new Error(`HTTP ${response.status}`);
-            const apiData = await response.json();
+            checkWidgetData(apiData);
             
             // Formatter les données pour Chart.js time series
             const packetsData = apiData.timestamps.map((ts, index) => ({
@@ -319,19 +401,27 @@ document.addEventListener('DOMContentLoaded', () => {
                  "Paquets Reçus vs Perdus"
             );
         } catch (error) {
-            console.error('Error fetching/rendering Capture History:', error);
+            console.error('Error rendering Capture History:', error);
             renderChart('captureHistoryChart', 'line', null, timeSeriesLineOptions, "Paquets Reçus vs Perdus");
         }
     };
 
     // --- Fonction pour charger toutes les données des graphiques ---
-    const loadAllChartData = () => {
+    // Une seule requête /api/dashboard pour tous les widgets
+    const loadAllChartData = async () => {
         console.log('Loading all chart data...');
-        fetchAndRenderTopAlerts();
-        fetchAndRenderTopDns();
-        fetchAndRenderTopTlsSni();
-        fetchAndRenderProtoCharts();
-        fetchAndRenderCaptureHistory(); // AJOUT: Charger le graphique temporel
+        let widgets = {};
+        try {
+            const dashboard = await fetchStatsJson(`/api/dashboard?window=${encodeURIComponent(getStatsWindow())}${sensorsQuery()}`);
+            widgets = dashboard.widgets || {};
+        } catch (error) {
+            console.error('Error fetching dashboard:', error);
+        }
+        renderTopAlerts(widgets.top_signatures);
+        renderTopDns(widgets.top_dns);
+        renderTopTlsSni(widgets.top_tls_sni);
+        renderProtoCharts(widgets.latest_counters);
+        renderCaptureHistory(widgets.capture_history); // AJOUT: graphique temporel
     };
 
     // --- Config File Fetching & Saving ---
@@ -358,7 +448,7 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     // --- Initial Load --- 
-    loadAllChartData(); // Charger tous les graphiques
+    loadSensors().then(loadAllChartData); // Charger les sondes puis tous les graphiques
     fetchConfigFile('enable.conf', enableConfTextarea);
     fetchConfigFile('disable.conf', disableConfTextarea);
     // AJOUT: Charger la config principale
@@ -369,6 +459,9 @@ document.addEventListener('DOMContentLoaded', () => {
     if (refreshChartsButton) {
         refreshChartsButton.addEventListener('click', loadAllChartData); // Rafraîchir tous les graphiques
     }
+    if (statsWindowSelect) {
+        statsWindowSelect.addEventListener('change', loadAllChartData); // Changer de fenêtre recharge les Top 10
+    }
 
     // --- Backend API Interaction --- 
     const sendCommandToBackend = async (command, args = null) => {
@@ -378,6 +471,9 @@ document.addEventListener('DOMContentLoaded', () => {
         if (args) {
             payload.arguments = args;
         }
+        if (sensorNames.length > 1) {
+            payload.sensors = getSelectedSensors();
+        }
 
         try {
             // Assuming backend runs on the same host, different port (5001)
@@ -392,6 +488,20 @@ document.addEventListener('DOMContentLoaded', () => {
             
             const result = await response.json(); // Always expect JSON back from our Flask API
 
+            if (result.sensors) {
+                // Plusieurs sondes: une ligne de résultat par sonde
+                const entries = Object.entries(result.sensors);
+                const failed = entries.filter(([, sensorResult]) => sensorResult.return === 'FAILED');
+                commandStatusDiv.className = failed.length === 0 ? 'alert alert-success mt-3'
+                    : (failed.length === entries.length ? 'alert alert-danger mt-3' : 'alert alert-warning mt-3');
+                statusMessage.textContent = entries.map(([name, sensorResult]) =>
+                    `[${name}] ${sensorResult.return === 'FAILED' ? 'Erreur' : 'OK'}: ${JSON.stringify(sensorResult.message || sensorResult)}`
+                ).join('\n');
+                statusMessage.style.whiteSpace = 'pre-line';
+                console.log("Backend response:", result);
+                return;
+            }
+
             if (!response.ok || result.return === 'FAILED') {
                 commandStatusDiv.className = 'alert alert-danger mt-3';
                 throw new Error(result.message || `Erreur HTTP! status: ${response.status}`);
@@ -629,12 +739,24 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- NOUVEAU: Log Streaming (SSE) ---
+    // Construit l'URL du flux: fichier + paramètres de filtre saisis (ex: "event_type=alert&sample=10")
+    const buildLogStreamUrl = (filename) => {
+        const params = new URLSearchParams(logStreamFilterInput ? logStreamFilterInput.value.trim() : '');
+        params.set('logfile', filename);
+        // Mode lot: le serveur regroupe les événements (au plus une trame toutes les LOG_STREAM_BATCH_MS)
+        if (!params.has('batch_ms')) {
+            params.set('batch_ms', LOG_STREAM_BATCH_MS);
+        }
+        return `/api/logs/stream?${params.toString()}`;
+    };
+
     const connectLogStream = (filename = 'eve.json') => { // Accepte le nom de fichier
+        const streamUrl = buildLogStreamUrl(filename);
         if (eventSource && eventSource.readyState !== EventSource.CLOSED) {
-            // Si on demande le même fichier, ne rien faire
+            // Si on demande le même fichier avec le même filtre, ne rien faire
             // Sinon, fermer la connexion existante
             const currentUrl = new URL(eventSource.url);
-            if (currentUrl.searchParams.get('logfile') === filename) {
+            if (currentUrl.pathname + currentUrl.search === streamUrl) {
                 console.log(`Log stream already open for ${filename}.`);
                 return;
             }
@@ -643,7 +765,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         console.log(`Connecting to log stream for ${filename}...`);
-        eventSource = new EventSource(`/api/logs/stream?logfile=${encodeURIComponent(filename)}`); // Ajouter le paramètre
+        eventSource = new EventSource(streamUrl); // Fichier et filtre en paramètres
         if(currentLogfileSpan) currentLogfileSpan.textContent = filename; // Mettre à jour le titre
         
         // Log initial avant connexion
@@ -668,28 +790,24 @@ document.addEventListener('DOMContentLoaded', () => {
             liveLogContent.textContent = currentLogLines.join('\n');
         };
 
-        eventSource.onmessage = (event) => {
-            // console.log("Raw SSE data:", event.data);
-            let logEntry;
-            try {
-                logEntry = JSON.parse(event.data);
-            } catch (e) {
-                console.error("Failed to parse SSE data:", event.data, e);
-                logEntry = { error: "Invalid data received from stream", raw: event.data };
-            }
-
-            // Formatter le message (simple pour l'instant)
-            let formattedLog = event.data; // Afficher le JSON brut par défaut
+        // Formatter une entrée (objet décodé + texte brut) pour l'affichage
+        const formatLogEntry = (logEntry, rawText) => {
             if (logEntry.error) {
-                 formattedLog = `ERREUR STREAM: ${logEntry.error}${logEntry.raw ? ' - ' + logEntry.raw : ''}`;
+                 return `ERREUR STREAM: ${logEntry.error}${logEntry.raw ? ' - ' + logEntry.raw : ''}`;
             } else if (logEntry.raw_line) {
-                 formattedLog = `[RAW] ${logEntry.raw_line}`;
-            } // Pas de formatage spécifique pour les JSON valides pour l'instant
+                 return `[RAW] ${logEntry.raw_line}`;
+            } else if (logEntry.dropped) {
+                 // Le serveur a jeté des lignes car le client ne suivait pas le débit
+                 return `[${logEntry.dropped} ligne(s) ignorée(s): flux trop rapide]`;
+            }
+            return rawText; // Pas de formatage spécifique pour les JSON valides pour l'instant
+        };
 
-            // Ajouter la ligne et limiter la taille
-            currentLogLines.push(formattedLog);
+        // Ajouter plusieurs lignes puis rafraîchir l'affichage une seule fois
+        const appendLogLines = (formattedLines) => {
+            currentLogLines.push(...formattedLines);
             if (currentLogLines.length > MAX_LOG_LINES) {
-                currentLogLines.shift(); // Supprimer la plus ancienne
+                currentLogLines.splice(0, currentLogLines.length - MAX_LOG_LINES); // Supprimer les plus anciennes
             }
             liveLogContent.textContent = currentLogLines.join('\n');
 
@@ -702,16 +820,33 @@ document.addEventListener('DOMContentLoaded', () => {
                      container.scrollTop = container.scrollHeight;
                  }
             }
+        };
 
-             // Déclencher une mise à jour des graphiques si un événement 'stats' arrive ? (Optionnel, peut être coûteux)
-             /*
-             if (logEntry.event_type === 'stats') {
-                 console.log('Stats event received via SSE, refreshing charts...');
-                 loadAllChartData(); 
-             }
-             */
+        eventSource.onmessage = (event) => {
+            // console.log("Raw SSE data:", event.data);
+            let logEntry;
+            try {
+                logEntry = JSON.parse(event.data);
+            } catch (e) {
+                console.error("Failed to parse SSE data:", event.data, e);
+                logEntry = { error: "Invalid data received from stream", raw: event.data };
+            }
+            appendLogLines([formatLogEntry(logEntry, event.data)]);
         };
 
+        // AJOUT: Trames 'batch' (mode lot): un tableau JSON d'événements par trame
+        eventSource.addEventListener('batch', (event) => {
+            let entries;
+            try {
+                entries = JSON.parse(event.data);
+            } catch (e) {
+                console.error("Failed to parse SSE batch:", event.data, e);
+                appendLogLines([formatLogEntry({ error: "Invalid batch received from stream" }, event.data)]);
+                return;
+            }
+            appendLogLines(entries.map(entry => formatLogEntry(entry, JSON.stringify(entry))));
+        });
+
         eventSource.onerror = (error) => {
             console.error("Log stream error:", error);
             logStreamStatus.textContent = 'Erreur';
@@ -748,4 +883,12 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
     setupLogSelection();
+
+    // AJOUT: Appliquer le filtre serveur en se reconnectant au fichier courant
+    if (applyLogFilterButton) {
+        applyLogFilterButton.addEventListener('click', () => {
+            const logfile = currentLogfileSpan ? currentLogfileSpan.textContent : 'eve.json';
+            connectLogStream(logfile || 'eve.json');
+        });
+    }
 }); 
\ No newline at end of file
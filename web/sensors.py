@@ -0,0 +1,182 @@
+"""Registre des sondes Suricata: plusieurs instances (une par carte/nœud NUMA) et plusieurs hôtes.
+
+Chaque sonde a un nom, un socket de commande et un fichier eve.json (local
+ou monté depuis un autre hôte); elle a son propre follower, son propre
+EveStatsState et son propre pool de connexions. Sans configuration, une
+seule sonde 'default' reprend SURICATA_SOCKET_PATH et logs/eve.json.
+
+SURICATA_SENSORS_FILE désigne un fichier JSON:
+    [{"name": "nic0", "socket": "/var/run/suricata/nic0.socket",
+      "eve": "/var/log/suricata/nic0/eve.json"},
+     {"name": "nic1", "socket": "/var/run/suricata/nic1.socket", "eve": "nic1/eve.json"}]
+Un chemin eve relatif est résolu par rapport au répertoire des logs. La
+première sonde est la sonde principale: le stockage colonnaire, la
+recherche et l'index des flux portent sur son eve.json.
+
+MergedStatsState présente les états de plusieurs sondes avec l'interface de
+lecture d'EveStatsState: les endpoints de stats servent une sélection de
+sondes comme une seule.
+"""
+import json
+import os
+import re
+from collections import Counter
+
+from aggregators import DEFAULT_WINDOW
+from eve_time import parse_eve_timestamp
+from stats_series import (DEFAULT_RESOLUTION, interface_series_payload, merge_series_buckets,
+                          series_payload)
+
+DEFAULT_SENSOR = 'default'
+SENSOR_NAME = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+# Entrées demandées à chaque sonde pour fusionner les top-K (les comptes
+# des clés absentes du top d'une sonde sont perdus: fusion approchée)
+MERGE_TOP_N = 100
+
+
+class Sensor:
+    """Une instance Suricata: socket de commande et eve.json (None = logs/eve.json)."""
+
+    def __init__(self, name, socket_path, eve_path=None):
+        self.name = name
+        self.socket_path = socket_path
+        self.eve_path = eve_path
+
+    def resolve_eve_path(self, logs_dir, default_eve_file):
+        if self.eve_path is None:
+            return os.path.join(logs_dir, default_eve_file)
+        return os.path.join(logs_dir, self.eve_path)  # sans effet si le chemin est absolu
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "socket": self.socket_path,
+            "socket_available": os.path.exists(self.socket_path),
+        }
+
+
+def load_sensors(config_path, default_socket_path):
+    """Retourne la liste ordonnée des sondes. Lève ValueError si la configuration est invalide."""
+    if not config_path:
+        return [Sensor(DEFAULT_SENSOR, default_socket_path)]
+    try:
+        with open(config_path, 'r') as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read sensors file {config_path}: {e}") from e
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{config_path}: expected a non-empty JSON list of sensors")
+    sensors = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError(f"{config_path}: each sensor must be an object")
+        name = entry.get('name')
+        if not isinstance(name, str) or not SENSOR_NAME.match(name):
+            raise ValueError(f"{config_path}: invalid sensor name {name!r}")
+        if any(sensor.name == name for sensor in sensors):
+            raise ValueError(f"{config_path}: duplicate sensor name {name!r}")
+        socket_path = entry.get('socket')
+        eve_path = entry.get('eve')
+        if not isinstance(socket_path, str) or not isinstance(eve_path, str):
+            raise ValueError(f"{config_path}: sensor {name!r} needs 'socket' and 'eve' paths")
+        sensors.append(Sensor(name, socket_path, eve_path))
+    return sensors
+
+
+def parse_sensor_names(value, sensors):
+    """Noms de ?sensors=a,b (dans l'ordre du registre), None pour toutes. Lève ValueError si un nom est inconnu."""
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    if not names:
+        return None
+    known = [sensor.name for sensor in sensors]
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown sensor(s): {', '.join(unknown)}. Available: {', '.join(known)}")
+    return tuple(name for name in known if name in names)
+
+
+def _sum_numbers(target, source):
+    """Additionne récursivement les compteurs numériques de source dans target."""
+    for key, value in source.items():
+        if isinstance(value, dict):
+            _sum_numbers(target.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            current = target.get(key, 0)
+            target[key] = current + value if isinstance(current, (int, float)) else value
+
+
+class MergedStatsState:
+    """Vue fusionnée (lecture seule) des états de plusieurs sondes, même interface qu'EveStatsState.
+
+    Les compteurs sont additionnés, les débits fusionnés par bucket, et les
+    threads et interfaces préfixés par le nom de leur sonde ('nic0/W#01').
+    """
+
+    def __init__(self, states):
+        self.states = dict(states)  # nom de sonde -> état
+
+    @property
+    def version(self):
+        return tuple(state.version for state in self.states.values())
+
+    def _top(self, method, n, window):
+        counts = Counter()
+        cardinality = 0
+        for state in self.states.values():
+            top, unique_count = getattr(state, method)(max(n, MERGE_TOP_N), window)
+            counts.update(dict(top))
+            # Borne supérieure: une même clé peut être vue par plusieurs sondes
+            cardinality += unique_count
+        return counts.most_common(n), cardinality
+
+    def top_signatures(self, n=10, window=DEFAULT_WINDOW):
+        return self._top('top_signatures', n, window)
+
+    def top_dns(self, n=10, window=DEFAULT_WINDOW):
+        return self._top('top_dns', n, window)
+
+    def top_tls_sni(self, n=10, window=DEFAULT_WINDOW):
+        return self._top('top_tls_sni', n, window)
+
+    def get_latest_stats(self):
+        """Somme des derniers événements stats des sondes (timestamp le plus récent)."""
+        events = [event for event in (state.get_latest_stats() for state in self.states.values()) if event]
+        if not events:
+            return None
+        merged = {}
+        for event in events:
+            _sum_numbers(merged, event.get('stats', {}))
+        merged.pop('uptime', None)
+        return {
+            "timestamp": max(event.get('timestamp', '') for event in events),
+            "event_type": "stats",
+            "stats": merged,
+        }
+
+    def get_capture_history(self):
+        """Historique cumulé: à chaque point, somme des dernières valeurs connues de chaque sonde."""
+        points = []
+        reporting = 0
+        for index, state in enumerate(self.states.values()):
+            history = state.get_capture_history()
+            reporting += bool(history)
+            points.extend((timestamp, index, packets, drops) for timestamp, packets, drops in history)
+        points.sort(key=lambda point: parse_eve_timestamp(point[0]) or 0.0)
+        latest = {}
+        history = []
+        for timestamp, index, packets, drops in points:
+            latest[index] = (packets, drops)
+            # Tant qu'une sonde n'a pas de valeur, la somme serait sous-estimée
+            if len(latest) == reporting:
+                history.append((timestamp, sum(p for p, _ in latest.values()), sum(d for _, d in latest.values())))
+        return history
+
+    def get_stats_series(self, resolution=DEFAULT_RESOLUTION, threads=False):
+        buckets = merge_series_buckets({name: state.get_stats_buckets(resolution)
+                                        for name, state in self.states.items()})
+        return series_payload(buckets, resolution, threads)
+
+    def get_interface_series(self, resolution=DEFAULT_RESOLUTION):
+        buckets = merge_series_buckets({name: state.get_interface_buckets(resolution)
+                                        for name, state in self.states.items()})
+        return interface_series_payload(buckets, resolution)
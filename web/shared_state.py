@@ -0,0 +1,170 @@
+"""Partage de l'état des statistiques entre plusieurs workers (gunicorn).
+
+Un seul processus (le « writer ») suit eve.json et alimente EveStatsState;
+il est élu par un verrou fcntl exclusif sur un fichier du répertoire
+partagé. Il publie périodiquement un instantané JSON de l'état (écriture
+dans un fichier temporaire puis os.replace, donc atomique pour les
+lecteurs) dans ce même répertoire, de préférence sur /dev/shm.
+
+Les autres workers ne relisent jamais eve.json pour les statistiques: ils
+servent l'instantané, rechargé quand le fichier change. Ils retentent
+régulièrement de prendre le verrou: si le writer meurt, le noyau libère le
+verrou et un autre worker prend le relais.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+
+from aggregators import DEFAULT_WINDOW
+from stats_series import DEFAULT_RESOLUTION, interface_series_payload, series_payload
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = 'stats.lock'
+SNAPSHOT_FILE = 'stats-snapshot.json'
+DEFAULT_PUBLISH_INTERVAL = 1.0
+# Nombre d'entrées conservées par top-K dans l'instantané (les endpoints en affichent 10)
+SNAPSHOT_TOP_N = 10
+
+
+class SnapshotStatsState:
+    """Vue en lecture seule d'un instantané, même interface que EveStatsState."""
+
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = {}
+
+    def _load(self):
+        try:
+            st = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return self._data
+        version = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if version != self._version:
+                try:
+                    with open(self.snapshot_path, 'rb') as f:
+                        self._data = json.load(f)
+                    self._version = version
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Cannot load stats snapshot {self.snapshot_path}: {e}")
+            return self._data
+
+    @property
+    def version(self):
+        """Identité (inode, mtime, taille) de l'instantané chargé: change à chaque publication."""
+        self._load()
+        return self._version
+
+    def _top(self, name, n, window):
+        entry = self._load().get('tops', {}).get(name, {}).get(window)
+        if entry is None:
+            # Fenêtre valide mais instantané pas encore publié
+            return [], 0
+        top, cardinality = entry
+        return [tuple(item) for item in top[:n]], cardinality
+
+    def top_signatures(self, n=10, window=DEFAULT_WINDOW):
+        return self._top('signatures', n, window)
+
+    def top_dns(self, n=10, window=DEFAULT_WINDOW):
+        return self._top('dns_queries', n, window)
+
+    def top_tls_sni(self, n=10, window=DEFAULT_WINDOW):
+        return self._top('tls_sni', n, window)
+
+    def get_latest_stats(self):
+        return self._load().get('latest_stats')
+
+    def get_capture_history(self):
+        return [tuple(point) for point in self._load().get('capture_history', [])]
+
+    def get_stats_buckets(self, resolution=DEFAULT_RESOLUTION):
+        return self._load().get('stats_series', {}).get(resolution, [])
+
+    def get_interface_buckets(self, resolution=DEFAULT_RESOLUTION):
+        return self._load().get('iface_series', {}).get(resolution, [])
+
+    def get_stats_series(self, resolution=DEFAULT_RESOLUTION, threads=False):
+        return series_payload(self.get_stats_buckets(resolution), resolution, threads)
+
+    def get_interface_series(self, resolution=DEFAULT_RESOLUTION):
+        return interface_series_payload(self.get_interface_buckets(resolution), resolution)
+
+
+class SingleWriterCoordinator:
+    """Élit le processus writer et publie ou lit l'instantané des statistiques.
+
+    start_writer est appelé (une fois) quand ce processus devient writer et
+    doit retourner l'EveStatsState qu'il alimente. state() retourne l'état
+    à utiliser pour répondre aux requêtes, quel que soit le rôle.
+    """
+
+    def __init__(self, directory, start_writer, publish_interval=DEFAULT_PUBLISH_INTERVAL):
+        self.directory = directory
+        self.start_writer = start_writer
+        self.publish_interval = publish_interval
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.reader = SnapshotStatsState(self.snapshot_path)
+        self._writer_state = None
+        self._lock_fd = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_writer(self):
+        return self._writer_state is not None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._try_become_writer()
+        self._thread = threading.Thread(target=self._run, name="stats-coordinator", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_fd is not None:
+            # Fermer le descripteur libère le verrou pour un autre worker
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def state(self):
+        return self._writer_state if self._writer_state is not None else self.reader
+
+    def _try_become_writer(self):
+        fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        logger.info(f"Process {os.getpid()} is the stats writer (snapshot: {self.snapshot_path})")
+        self._writer_state = self.start_writer()
+        self.publish()
+        return True
+
+    def publish(self):
+        """Écrit l'instantané de l'état du writer (remplacement atomique)."""
+        snapshot = self._writer_state.snapshot(SNAPSHOT_TOP_N)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _run(self):
+        while not self._stop_event.wait(self.publish_interval):
+            try:
+                if self.is_writer:
+                    self.publish()
+                else:
+                    self._try_become_writer()
+            except Exception as e:
+                logger.error(f"Stats coordinator error: {e}", exc_info=True)
@@ -0,0 +1,152 @@
+"""Encodage des flux Server-Sent Events (trames, lots, compression).
+
+En mode lot, plusieurs événements sont regroupés dans une seule trame
+`event: batch` dont la donnée est un tableau JSON, ce qui évite une écriture
+et un flush par ligne. La réponse peut être compressée (gzip/deflate) de
+manière incrémentale: chaque trame est suivie d'un Z_SYNC_FLUSH pour être
+décodable immédiatement par le navigateur.
+"""
+import json
+import time
+import zlib
+
+from eve_decode import loads
+
+# Encodage HTTP -> paramètre wbits de zlib
+COMPRESSION_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def negotiate_encoding(accept_encoding):
+    """Choisit gzip ou deflate selon l'en-tête Accept-Encoding (None si aucun n'est accepté)."""
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in ('gzip', 'deflate'):
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def line_payload(line):
+    """Retourne le texte JSON à envoyer pour une ligne de log brute (bytes).
+
+    Les lignes eve sont déjà du JSON et sont transmises telles quelles après
+    validation; les autres (suricata.log) sont encapsulées dans
+    {"raw_line": ...}, de même qu'une ligne eve invalide (tronquée par un
+    arrêt de Suricata, par exemple): dans un lot, elle rendrait sinon tout
+    le tableau illisible pour le client.
+    """
+    text = line.decode('utf-8', errors='replace')
+    if line.startswith(b'{') and line.rstrip().endswith(b'}'):
+        try:
+            loads(line)
+            return text
+        except ValueError:
+            pass
+    return json.dumps({'raw_line': text})
+
+
+def format_event(data, event=None):
+    """Formate une trame SSE (data sur une seule ligne)."""
+    if event:
+        return f"event: {event}\ndata: {data}\n\n"
+    return f"data: {data}\n\n"
+
+
+def format_batch(lines):
+    """Formate un lot de lignes en une trame `event: batch` contenant un tableau JSON."""
+    return format_event("[" + ",".join(line_payload(line) for line in lines) + "]", event='batch')
+
+
+def format_comment(text):
+    """Formate un commentaire SSE (ignoré par EventSource, utile comme heartbeat)."""
+    return f": {text}\n\n"
+
+
+class SSEEncoder:
+    """Transforme les trames texte en octets, éventuellement compressés."""
+
+    def __init__(self, encoding=None, level=6):
+        self.encoding = encoding
+        self._compressor = None
+        if encoding:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, COMPRESSION_WBITS[encoding])
+
+    def encode(self, frame):
+        data = frame.encode('utf-8')
+        if self._compressor is None:
+            return data
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self):
+        """Termine le flux compressé (octets finaux à envoyer, éventuellement vides)."""
+        if self._compressor is None:
+            return b""
+        compressor, self._compressor = self._compressor, None
+        return compressor.flush(zlib.Z_FINISH)
+
+
+class SSEStream:
+    """État d'un flux SSE de logs: filtre, mise en lots et heartbeats.
+
+    Indépendant du mode d'exécution: la boucle (thread WSGI ou coroutine)
+    attend des lignes au plus timeout() secondes puis passe ce qu'elle a
+    reçu à on_lines(), qui retourne les trames à écrire.
+    """
+
+    def __init__(self, stream_filter, batch_ms=0, batch_size=500, heartbeat_interval=15, clock=time.monotonic):
+        self.stream_filter = stream_filter
+        self.batch_ms = batch_ms
+        self.batch_size = batch_size
+        self.heartbeat_interval = heartbeat_interval
+        self.clock = clock
+        self.last_write = clock()
+        self._pending = []
+        self._batch_deadline = None
+
+    def opening(self):
+        """Trames à envoyer dès l'ouverture (les en-têtes partent immédiatement)."""
+        self.last_write = self.clock()
+        return [format_comment("connected")]
+
+    def timeout(self):
+        """Délai maximal d'attente de nouvelles lignes avant le prochain appel à on_lines()."""
+        now = self.clock()
+        timeout = max(0.0, self.heartbeat_interval - (now - self.last_write))
+        if self._batch_deadline is not None:
+            timeout = min(timeout, max(0.0, self._batch_deadline - now))
+        return self.stream_filter.wait_timeout(timeout)
+
+    def on_lines(self, lines, dropped=0):
+        """Retourne les trames à envoyer pour les lignes reçues (éventuellement aucune)."""
+        frames = []
+        lines = self.stream_filter.apply(lines)
+        if dropped:
+            frames.append(format_event(json.dumps({'dropped': dropped})))
+
+        if self.batch_ms > 0:
+            if lines:
+                self._pending.extend(lines)
+                if self._batch_deadline is None:
+                    self._batch_deadline = self.clock() + self.batch_ms / 1000.0
+            if self._pending and (len(self._pending) >= self.batch_size or self.clock() >= self._batch_deadline):
+                for start in range(0, len(self._pending), self.batch_size):
+                    frames.append(format_batch(self._pending[start:start + self.batch_size]))
+                self._pending = []
+                self._batch_deadline = None
+        else:
+            frames.extend(format_event(line_payload(line)) for line in lines)
+
+        if frames:
+            self.last_write = self.clock()
+        elif self.clock() - self.last_write >= self.heartbeat_interval:
+            # Heartbeat: garde la connexion ouverte à travers les proxys et détecte les clients partis
+            frames.append(format_comment("heartbeat"))
+            self.last_write = self.clock()
+        return frames
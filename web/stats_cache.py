@@ -0,0 +1,106 @@
+"""Cache des réponses des endpoints de statistiques, avec validation HTTP (ETag, 304).
+
+Chaque entrée est identifiée par (endpoint, fenêtre) et associée à la
+version des données dont elle a été calculée (compteur du tailer, version de
+l'instantané partagé ou du stockage colonnaire). Tant que la version ne
+change pas, c'est-à-dire tant qu'aucun nouvel événement n'est ingéré, le JSON
+déjà sérialisé est renvoyé tel quel.
+
+L'ETag est une empreinte du corps: un recalcul qui donne le même résultat
+garde le même ETag (et le même Last-Modified), et il est identique d'un
+worker à l'autre. Les clients qui renvoient If-None-Match reçoivent 304.
+
+Les fenêtres historiques (?window=) et les combinaisons de sondes ou de
+widgets sont libres: le cache garde au plus max_entries réponses et évince
+la moins récemment servie (LRU).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+class CachedResponse:
+    """Réponse sérialisée d'un endpoint, avec ses validateurs HTTP."""
+
+    __slots__ = ('version', 'body', 'status', 'etag', 'last_modified')
+
+    def __init__(self, version, body, status, etag, last_modified):
+        self.version = version
+        self.body = body
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def headers(self):
+        # no-cache: le navigateur doit revalider à chaque requête
+        headers = {'Cache-Control': 'no-cache'}
+        if self.status == 200:
+            headers['ETag'] = self.etag
+            headers['Last-Modified'] = formatdate(self.last_modified, usegmt=True)
+        return headers
+
+    def not_modified(self, if_none_match=None, if_modified_since=None):
+        """Vrai si le client a déjà cette version (304). If-None-Match prime sur If-Modified-Since."""
+        if self.status != 200:
+            return False
+        if if_none_match:
+            if if_none_match.strip() == '*':
+                return True
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            # Comparaison faible: un proxy peut avoir préfixé l'ETag par W/
+            return any(tag.removeprefix('W/') == self.etag for tag in tags)
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            # Last-Modified est à la seconde près
+            return int(self.last_modified) <= since
+        return False
+
+
+class StatsCache:
+    """(endpoint, fenêtre) -> dernière CachedResponse calculée, limité à max_entries (LRU)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, version, compute):
+        """Retourne la réponse de `key` pour `version`, en appelant compute() -> (payload, status) si besoin.
+
+        La version doit être lue avant le calcul: un événement ingéré pendant
+        compute() invalidera l'entrée à la requête suivante.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry.version == version:
+            return entry
+        payload, status = compute()
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        if entry is not None and entry.etag == etag and entry.status == status:
+            last_modified = entry.last_modified
+        else:
+            last_modified = self.clock()
+        entry = CachedResponse(version, body, status, etag, last_modified)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,257 @@
+"""Séries temporelles des compteurs Suricata (événements 'stats'): deltas et débits.
+
+Les compteurs des événements stats sont cumulés depuis le démarrage de
+Suricata. StatsSeries les transforme en deltas entre deux événements
+successifs, puis les agrège dans des buckets de résolution fixe (1 s, 1 min,
+1 h), chaque résolution étant tenue dans un tampon circulaire: l'historique
+couvert est long mais la mémoire bornée.
+
+Un redémarrage de Suricata remet les compteurs à zéro. Il est détecté par la
+baisse de stats.uptime (ou, à défaut, d'un compteur): le delta est alors la
+valeur courante, c'est-à-dire ce qui a été compté depuis le redémarrage.
+
+Les compteurs peuvent être détaillés par groupe: threads de capture
+(stats.threads) ou interfaces (relevés iface-stat, voir iface_poller.py).
+Le résumé des derniers buckets donne la part de paquets de chaque groupe et
+le déséquilibre (part maximale / part moyenne) de la répartition RSS/cluster.
+"""
+import time
+from collections import deque
+
+from eve_time import parse_eve_timestamp
+
+# Compteurs suivis: nom exposé -> (section, clé) dans stats (ou stats.threads.<thread>)
+COUNTERS = {
+    'packets': ('capture', 'kernel_packets'),
+    'drops': ('capture', 'kernel_drops'),
+    'decoded': ('decoder', 'pkts'),
+    'bytes': ('decoder', 'bytes'),
+    'alerts': ('detect', 'alert'),
+}
+# Compteurs suivis par thread (stats.threads, si 'threads: yes' dans suricata.yaml)
+THREAD_COUNTERS = ('packets', 'drops', 'decoded', 'bytes')
+# Compteurs des interfaces, relevés par iface-stat (pas d'octets côté interface)
+IFACE_COUNTERS = ('packets', 'drops', 'invalid_checksums', 'bypassed')
+# Nombre de buckets récents sur lesquels est calculé le résumé par groupe
+SUMMARY_BUCKETS = 5
+
+# Résolution -> (durée d'un bucket en secondes, nombre de buckets gardés)
+RESOLUTIONS = {
+    '1s': (1, 900),      # 15 minutes
+    '1m': (60, 1440),    # 24 heures
+    '1h': (3600, 720),   # 30 jours
+}
+DEFAULT_RESOLUTION = '1m'
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _read_counters(stats, names):
+    counters = {}
+    for name in names:
+        section, key = COUNTERS[name]
+        value = stats.get(section)
+        value = value.get(key) if isinstance(value, dict) else None
+        if _is_number(value):
+            counters[name] = value
+    return counters
+
+
+def _deltas(current, previous, restarted):
+    deltas = {}
+    for name, value in current.items():
+        if restarted:
+            deltas[name] = value
+        elif name in previous:
+            delta = value - previous[name]
+            # Compteur isolé remis à zéro (redémarrage d'un thread de capture)
+            deltas[name] = delta if delta >= 0 else value
+    return deltas
+
+
+def _merge(target, deltas):
+    for name, delta in deltas.items():
+        target[name] = target.get(name, 0) + delta
+
+
+def format_bucket_time(start):
+    return time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime(start))
+
+
+def series_payload(buckets, resolution, groups=False, counters=tuple(COUNTERS),
+                   group_counters=THREAD_COUNTERS, group_key='threads'):
+    """Met en forme des buckets [début, secondes, deltas, deltas par groupe] pour l'API.
+
+    Retourne {"resolution", "timestamps", "interval", "deltas", "rates",
+    "drop_pct"}; les débits sont par seconde et drop_pct est la part de
+    paquets perdus (drops / packets, en %). Avec groups, ajoute le détail
+    par groupe sous group_key et son résumé sous "summary".
+    """
+    payload = {
+        "resolution": resolution,
+        "timestamps": [format_bucket_time(bucket[0]) for bucket in buckets],
+        "interval": [bucket[1] for bucket in buckets],
+        "deltas": {name: [bucket[2].get(name) for bucket in buckets] for name in counters},
+        "rates": {name: [_rate(bucket[2].get(name), bucket[1]) for bucket in buckets] for name in counters},
+        "drop_pct": [_drop_pct(bucket[2]) for bucket in buckets],
+    }
+    if groups:
+        group_names = sorted({name for bucket in buckets for name in bucket[3]})
+        payload[group_key] = {
+            group: {
+                "rates": {name: [_rate(bucket[3].get(group, {}).get(name), bucket[1]) for bucket in buckets]
+                          for name in group_counters},
+                "drop_pct": [_drop_pct(bucket[3].get(group, {})) for bucket in buckets],
+            }
+            for group in group_names
+        }
+        payload["summary"] = group_summary(buckets[-SUMMARY_BUCKETS:], group_counters)
+    return payload
+
+
+def group_summary(buckets, group_counters):
+    """Débits moyens, part des paquets et % de pertes par groupe sur les buckets donnés.
+
+    imbalance vaut part maximale / part moyenne: 1.0 pour une répartition
+    parfaite, N si un seul des N groupes reçoit tout le trafic.
+    """
+    seconds = sum(bucket[1] for bucket in buckets)
+    totals = {}
+    for bucket in buckets:
+        for group, deltas in bucket[3].items():
+            _merge(totals.setdefault(group, {}), deltas)
+    all_packets = sum(deltas.get('packets', 0) for deltas in totals.values())
+    groups = {}
+    for group, deltas in sorted(totals.items()):
+        entry = {name: _rate(deltas.get(name), seconds) for name in group_counters}
+        entry["drop_pct"] = _drop_pct(deltas)
+        entry["packet_share_pct"] = (round(100.0 * deltas.get('packets', 0) / all_packets, 3)
+                                     if all_packets else None)
+        groups[group] = entry
+    shares = [entry["packet_share_pct"] for entry in groups.values() if entry["packet_share_pct"] is not None]
+    imbalance = round(max(shares) / (sum(shares) / len(shares)), 3) if shares and sum(shares) else None
+    return {"seconds": seconds, "groups": groups, "imbalance": imbalance}
+
+
+def merge_series_buckets(named_buckets):
+    """Fusionne les buckets de plusieurs sondes {nom: buckets} (deltas additionnés, groupes préfixés 'nom/').
+
+    Les intervalles couverts se superposent dans le temps: un bucket fusionné
+    garde le plus long, pour que les débits restent des sommes de débits.
+    """
+    merged = {}
+    for sensor, buckets in named_buckets.items():
+        for start, seconds, deltas, groups in buckets:
+            bucket = merged.get(start)
+            if bucket is None:
+                bucket = merged[start] = [start, 0.0, {}, {}]
+            bucket[1] = max(bucket[1], seconds)
+            _merge(bucket[2], deltas)
+            for group, values in groups.items():
+                _merge(bucket[3].setdefault(f"{sensor}/{group}", {}), values)
+    return [merged[start] for start in sorted(merged)]
+
+
+def interface_series_payload(buckets, resolution):
+    """series_payload pour les relevés d'interfaces (détail sous "interfaces")."""
+    return series_payload(buckets, resolution, True, IFACE_COUNTERS, IFACE_COUNTERS, 'interfaces')
+
+
+def _rate(delta, seconds):
+    if delta is None or seconds <= 0:
+        return None
+    return round(delta / seconds, 3)
+
+
+def _drop_pct(deltas):
+    packets = deltas.get('packets')
+    drops = deltas.get('drops')
+    if not packets or drops is None:
+        return None
+    return round(100.0 * drops / packets, 3)
+
+
+class StatsSeries:
+    """Deltas de relevés successifs de compteurs cumulés, agrégés en tampons circulaires par résolution.
+
+    counters: compteurs globaux; group_counters: compteurs détaillés par
+    groupe, exposés sous group_key (threads par défaut).
+    """
+
+    def __init__(self, resolutions=None, counters=tuple(COUNTERS), group_counters=THREAD_COUNTERS,
+                 group_key='threads'):
+        self.resolutions = dict(resolutions or RESOLUTIONS)
+        self.counters = tuple(counters)
+        self.group_counters = tuple(group_counters)
+        self.group_key = group_key
+        self._rings = {name: deque(maxlen=size) for name, (_, size) in self.resolutions.items()}
+        self._previous = None  # (timestamp, uptime, compteurs, compteurs par groupe)
+        self.resets = 0
+
+    def add(self, event):
+        """Intègre un événement stats (compteurs globaux et stats.threads), voir add_counters()."""
+        stats = event.get('stats')
+        timestamp = parse_eve_timestamp(event.get('timestamp'))
+        if timestamp is None or not isinstance(stats, dict):
+            return None
+        threads = {
+            name: _read_counters(section, self.group_counters)
+            for name, section in (stats.get('threads') or {}).items() if isinstance(section, dict)
+        }
+        return self.add_counters(timestamp, _read_counters(stats, self.counters), threads, stats.get('uptime'))
+
+    def add_counters(self, timestamp, counters, groups=None, uptime=None):
+        """Intègre un relevé. Retourne (timestamp, intervalle, deltas, deltas par groupe) ou None.
+
+        Le premier relevé ne sert que de référence; un relevé plus ancien que
+        le précédent (relecture) est ignoré.
+        """
+        groups = groups or {}
+        previous = self._previous
+        if previous is not None and timestamp <= previous[0]:
+            return None
+        self._previous = (timestamp, uptime, counters, groups)
+        if previous is None:
+            return None
+
+        previous_timestamp, previous_uptime, previous_counters, previous_groups = previous
+        interval = timestamp - previous_timestamp
+        if _is_number(uptime) and _is_number(previous_uptime):
+            restarted = uptime < previous_uptime
+        else:
+            restarted = any(counters[name] < previous_counters[name]
+                            for name in counters.keys() & previous_counters.keys())
+        if restarted:
+            self.resets += 1
+            if _is_number(uptime) and uptime > 0:
+                # Seul le temps écoulé depuis le redémarrage est couvert par les compteurs
+                interval = min(interval, uptime)
+        deltas = _deltas(counters, previous_counters, restarted)
+        group_deltas = {
+            name: _deltas(values, previous_groups.get(name, {}), restarted)
+            for name, values in groups.items()
+        }
+        for name, (seconds, _) in self.resolutions.items():
+            ring = self._rings[name]
+            start = int(timestamp // seconds * seconds)
+            if ring and ring[-1][0] == start:
+                bucket = ring[-1]
+            else:
+                bucket = [start, 0.0, {}, {}]
+                ring.append(bucket)
+            bucket[1] += interval
+            _merge(bucket[2], deltas)
+            for group, values in group_deltas.items():
+                _merge(bucket[3].setdefault(group, {}), values)
+        return timestamp, interval, deltas, group_deltas
+
+    def buckets(self, resolution):
+        """Copie des buckets [début, secondes, deltas, deltas par groupe] d'une résolution."""
+        return [[start, seconds, dict(deltas), {group: dict(values) for group, values in groups.items()}]
+                for start, seconds, deltas, groups in self._rings[resolution]]
+
+    def series(self, resolution=DEFAULT_RESOLUTION, groups=False):
+        return series_payload(self.buckets(resolution), resolution, groups, self.counters,
+                              self.group_counters, self.group_key)
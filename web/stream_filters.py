@@ -0,0 +1,267 @@
+"""Filtrage et échantillonnage côté serveur du flux de logs en direct.
+
+Les paramètres de /api/logs/stream sont traduits en un StreamFilter appliqué
+aux lignes brutes avant leur envoi: le client ne reçoit que ce qu'il affiche.
+
+Paramètres reconnus:
+    event_type=alert,dns        types d'événements (liste séparée par des virgules)
+    src_ip=10.0.0.0/8           IP ou CIDR source
+    dest_ip=192.168.1.10        IP ou CIDR destination
+    ip=10.0.0.5                 IP ou CIDR, source ou destination
+    signature_id=2100498,2000   alert.signature_id
+    match=dns.rrname==a.com     égalité (==) ou différence (!=) sur un champ,
+                                répétable (conditions combinées par ET)
+    sample=10                   ne garder qu'un événement sur N
+    reservoir=50                échantillon uniforme de K événements par intervalle
+    reservoir_interval=1        durée de l'intervalle du réservoir (secondes)
+    max_rate=200                débit maximal envoyé (événements/seconde)
+"""
+import functools
+import ipaddress
+import random
+import time
+
+from eve_decode import EventTypePrefilter, loads
+
+MATCH_OPERATORS = ('==', '!=')
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_ip(value):
+    try:
+        return ipaddress.ip_address(value)
+    except ValueError:
+        return None
+
+
+def _parse_networks(value):
+    networks = []
+    for item in value.split(','):
+        item = item.strip()
+        if item:
+            networks.append(ipaddress.ip_network(item, strict=False))
+    return networks
+
+
+def _ip_in(value, networks):
+    address = _parse_ip(value) if isinstance(value, str) else None
+    if address is None:
+        return False
+    return any(address.version == net.version and address in net for net in networks)
+
+
+def _get_path(event, path):
+    value = event
+    for part in path:
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _parse_match(expression):
+    for operator in MATCH_OPERATORS:
+        field, sep, expected = expression.partition(operator)
+        if sep:
+            field = field.strip()
+            if not field:
+                break
+            return tuple(field.split('.')), operator, expected.strip()
+    raise ValueError(f"Invalid match expression: {expression!r} (expected field==value or field!=value)")
+
+
+def _value_matches(value, expected):
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return str(value).lower() == expected.lower()
+    return str(value) == expected
+
+
+class TokenBucket:
+    """Limiteur de débit: au plus `rate` éléments par seconde (rafale de `rate`)."""
+
+    def __init__(self, rate, clock=time.monotonic):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.clock = clock
+        self.last = clock()
+
+    def allow(self):
+        now = self.clock()
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class StreamFilter:
+    """Filtre, échantillonne et limite un flux de lignes eve (bytes)."""
+
+    def __init__(self, event_types=None, src_networks=None, dest_networks=None, any_networks=None,
+                 signature_ids=None, matches=None, sample_every=None, reservoir_size=None,
+                 reservoir_interval=1.0, max_rate=None):
+        self.event_types = set(event_types) if event_types else None
+        # Écarte les lignes d'un autre type sans les décoder
+        self.prefilter = EventTypePrefilter(self.event_types) if self.event_types else None
+        self.src_networks = src_networks
+        self.dest_networks = dest_networks
+        self.any_networks = any_networks
+        self.signature_ids = set(signature_ids) if signature_ids else None
+        self.matches = matches or []
+        self.sample_every = sample_every if sample_every and sample_every > 1 else None
+        self.reservoir_size = reservoir_size
+        self.reservoir_interval = reservoir_interval
+        self.bucket = TokenBucket(max_rate) if max_rate else None
+        self.rate_limited = 0
+        self._sample_counter = 0
+        self._reservoir = []
+        self._reservoir_seen = 0
+        self._reservoir_deadline = time.monotonic() + reservoir_interval
+
+    @classmethod
+    def from_args(cls, args):
+        """Construit un filtre depuis les paramètres de requête. Lève ValueError si invalide."""
+        def int_arg(name):
+            value = args.get(name)
+            if value in (None, ''):
+                return None
+            number = int(value)
+            if number <= 0:
+                raise ValueError(f"{name} must be a positive integer")
+            return number
+
+        def networks_arg(name):
+            value = args.get(name)
+            return _parse_networks(value) if value else None
+
+        event_types = [t.strip() for t in args.get('event_type', '').split(',') if t.strip()]
+        signature_ids = [int(sid) for sid in args.get('signature_id', '').split(',') if sid.strip()]
+        reservoir_interval = float(args.get('reservoir_interval', 1.0))
+        if reservoir_interval <= 0:
+            raise ValueError("reservoir_interval must be positive")
+        max_rate = args.get('max_rate')
+        max_rate = float(max_rate) if max_rate else None
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError("max_rate must be positive")
+        return cls(
+            event_types=event_types,
+            src_networks=networks_arg('src_ip'),
+            dest_networks=networks_arg('dest_ip'),
+            any_networks=networks_arg('ip'),
+            signature_ids=signature_ids,
+            matches=[_parse_match(m) for m in args.getlist('match')] if hasattr(args, 'getlist') else [],
+            sample_every=int_arg('sample'),
+            reservoir_size=int_arg('reservoir'),
+            reservoir_interval=reservoir_interval,
+            max_rate=max_rate,
+        )
+
+    @property
+    def needs_decode(self):
+        """Vrai si le filtre porte sur le contenu des événements (décodage JSON nécessaire)."""
+        return bool(self.event_types or self.src_networks or self.dest_networks or self.any_networks
+                    or self.signature_ids or self.matches)
+
+    @property
+    def needs_full_decode(self):
+        """Vrai si le filtre porte sur autre chose que l'event_type (vérifié par le préfiltre)."""
+        return bool(self.src_networks or self.dest_networks or self.any_networks
+                    or self.signature_ids or self.matches)
+
+    @property
+    def is_passthrough(self):
+        return not (self.needs_decode or self.sample_every or self.reservoir_size or self.bucket)
+
+    def matches_event(self, event):
+        if self.event_types is not None and event.get('event_type') not in self.event_types:
+            return False
+        if self.src_networks and not _ip_in(event.get('src_ip'), self.src_networks):
+            return False
+        if self.dest_networks and not _ip_in(event.get('dest_ip'), self.dest_networks):
+            return False
+        if self.any_networks and not (_ip_in(event.get('src_ip'), self.any_networks)
+                                      or _ip_in(event.get('dest_ip'), self.any_networks)):
+            return False
+        if self.signature_ids is not None:
+            alert = event.get('alert')
+            if not isinstance(alert, dict) or alert.get('signature_id') not in self.signature_ids:
+                return False
+        for path, operator, expected in self.matches:
+            equal = _value_matches(_get_path(event, path), expected)
+            if equal != (operator == '=='):
+                return False
+        return True
+
+    def _accept(self, line):
+        if not self.needs_decode:
+            return True
+        if self.prefilter is not None:
+            if not self.prefilter.matches(line):
+                return False
+            if not self.needs_full_decode:
+                # Écarter tout de même les lignes non JSON (suricata.log)
+                return line.lstrip()[:1] == b'{'
+        try:
+            event = loads(line)
+        except ValueError:
+            # Ligne non JSON (suricata.log): ne peut pas satisfaire un filtre de contenu
+            return False
+        return isinstance(event, dict) and self.matches_event(event)
+
+    def _limit(self, lines):
+        if self.bucket is None:
+            return lines
+        allowed = []
+        for line in lines:
+            if self.bucket.allow():
+                allowed.append(line)
+            else:
+                self.rate_limited += 1
+        return allowed
+
+    def apply(self, lines):
+        """Retourne les lignes à envoyer parmi `lines` (le réservoir est vidé par flush_due)."""
+        if self.is_passthrough:
+            return lines
+        selected = []
+        for line in lines:
+            if not self._accept(line):
+                continue
+            if self.sample_every:
+                self._sample_counter += 1
+                if self._sample_counter % self.sample_every:
+                    continue
+            if self.reservoir_size:
+                self._add_to_reservoir(line)
+                continue
+            selected.append(line)
+        if self.reservoir_size:
+            selected = self.flush_due()
+        return self._limit(selected)
+
+    def _add_to_reservoir(self, line):
+        # Algorithme R (Vitter): échantillon uniforme de taille fixe
+        self._reservoir_seen += 1
+        if len(self._reservoir) < self.reservoir_size:
+            self._reservoir.append(line)
+        else:
+            index = random.randrange(self._reservoir_seen)
+            if index < self.reservoir_size:
+                self._reservoir[index] = line
+
+    def flush_due(self):
+        """Retourne l'échantillon du réservoir si l'intervalle est écoulé (liste vide sinon)."""
+        if not self.reservoir_size or time.monotonic() < self._reservoir_deadline:
+            return []
+        self._reservoir_deadline = time.monotonic() + self.reservoir_interval
+        sample, self._reservoir, self._reservoir_seen = self._reservoir, [], 0
+        return sample
+
+    def wait_timeout(self, default):
+        """Délai d'attente maximal avant de devoir vider le réservoir."""
+        if not self.reservoir_size:
+            return default
+        return max(0.0, min(default, self._reservoir_deadline - time.monotonic()))
@@ -0,0 +1,79 @@
+import random
+from collections import Counter
+
+from aggregators import SlidingWindowTopK, SpaceSavingCounter
+
+
+def test_window_expires_old_buckets():
+    top = SlidingWindowTopK(window_seconds=60, bucket_seconds=10)
+    for _ in range(5):
+        top.add("old", 1000)
+    top.add("new", 1055)
+    assert top.most_common() == [("old", 5), ("new", 1)]
+    # 1070: le bucket de 1000 sort de la fenêtre
+    top.add("new", 1070)
+    assert top.most_common() == [("new", 2)]
+    assert top.cardinality() == 1
+
+
+def test_late_events_land_in_their_bucket():
+    top = SlidingWindowTopK(window_seconds=60, bucket_seconds=10)
+    top.add("a", 1050)
+    top.add("b", 1025)  # en retard, dans la fenêtre
+    top.add("c", 980)   # trop ancien: ignoré
+    assert dict(top.most_common()) == {"a": 1, "b": 1}
+    top.add("a", 1090)
+    # Le bucket de 1020 expire avec la fenêtre
+    assert dict(top.most_common()) == {"a": 2}
+
+
+def test_most_common_cache_is_invalidated():
+    top = SlidingWindowTopK(window_seconds=60, bucket_seconds=10)
+    top.add("a", 1000)
+    assert top.most_common(1) == [("a", 1)]
+    top.add("b", 1001)
+    top.add("b", 1002)
+    assert top.most_common(1) == [("b", 2)]
+
+
+def test_sketch_merge_is_cached_until_next_add(monkeypatch):
+    merges = []
+    items = SpaceSavingCounter.items
+    monkeypatch.setattr(SpaceSavingCounter, 'items', lambda self: merges.append(self) or items(self))
+    top = SlidingWindowTopK(window_seconds=60, bucket_seconds=10, sketch_capacity=10)
+    for key, timestamp in (("a", 1000), ("b", 1010), ("a", 1020)):
+        top.add(key, timestamp)
+    assert top.cardinality() == 2
+    assert top.most_common(1) == [("a", 2)]
+    assert top.cardinality() == 2
+    assert len(merges) == 3  # une seule fusion des 3 buckets
+    top.add("c", 1025)
+    assert top.cardinality() == 3
+    # 1065: le bucket de 1000 expire
+    top.add("c", 1065)
+    assert top.cardinality() == 3 and top.most_common() == [("c", 2), ("b", 1), ("a", 1)]
+
+
+def test_space_saving_keeps_heavy_hitters():
+    rng = random.Random(1)
+    stream = ["heavy%d" % (i % 5) for i in range(5000)] + ["noise%d" % rng.randrange(100000) for _ in range(20000)]
+    rng.shuffle(stream)
+    sketch = SpaceSavingCounter(100)
+    for key in stream:
+        sketch.add(key)
+    assert len(sketch) == 100
+    exact = Counter(stream)
+    top = sketch.most_common(5)
+    assert {key for key, _ in top} == {"heavy%d" % i for i in range(5)}
+    # Les comptes sont des bornes supérieures
+    assert all(count >= exact[key] for key, count in top)
+
+
+def test_sketch_mode_matches_exact_mode_on_small_cardinality():
+    exact = SlidingWindowTopK(window_seconds=60, bucket_seconds=10)
+    sketch = SlidingWindowTopK(window_seconds=60, bucket_seconds=10, sketch_capacity=50)
+    for i in range(300):
+        key, timestamp = "k%d" % (i % 7), 1000 + i // 5
+        exact.add(key, timestamp)
+        sketch.add(key, timestamp)
+    assert sketch.most_common(7) == exact.most_common(7)
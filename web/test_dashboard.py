@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app
+from eve_tailer import EveStatsState
+from stats_cache import StatsCache
+
+
+def event(event_type, **fields):
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S.000000+0000", time.gmtime())
+    return dict(timestamp=timestamp, event_type=event_type, **fields)
+
+
+def stats_event(packets, drops):
+    return event("stats", stats={"uptime": 10, "capture": {"kernel_packets": packets, "kernel_drops": drops}})
+
+
+@pytest.fixture
+def state(monkeypatch):
+    state = EveStatsState()
+    state.ingest(event("alert", alert={"signature": "ET SCAN"}))
+    state.ingest(event("dns", dns={"type": "query", "rrname": "example.org"}))
+    monkeypatch.setattr(app, 'get_eve_state', lambda sensors=None: state)
+    monkeypatch.setattr(app, '_stats_cache', StatsCache())
+    return state
+
+
+@pytest.mark.parametrize("args, expected", [
+    ({}, app.DASHBOARD_WIDGETS),
+    ({"include": ""}, app.DASHBOARD_WIDGETS),
+    ({"include": "top_dns, top_signatures"}, ("top_signatures", "top_dns")),
+    ({"exclude": "capture_history,latest_counters"}, ("top_signatures", "top_dns", "top_tls_sni")),
+    ({"include": "top_dns,latest_counters", "exclude": "latest_counters"}, ("top_dns",)),
+    ({"include": "top_dns", "exclude": "top_dns"}, ()),
+])
+def test_parse_widgets(args, expected):
+    assert app.parse_dashboard_widgets(MultiDict(args)) == expected
+
+
+@pytest.mark.parametrize("args", [{"include": "top_dns,bogus"}, {"exclude": "rates"}])
+def test_unknown_widget(args):
+    with pytest.raises(ValueError):
+        app.parse_dashboard_widgets(MultiDict(args))
+
+
+def test_dashboard_returns_the_requested_widgets(state):
+    client = app.app.test_client()
+    response = client.get('/api/dashboard?window=1h&include=top_signatures,top_dns,latest_counters'
+                          '&exclude=latest_counters')
+    assert response.status_code == 200
+    assert response.json["window"] == "1h"
+    assert response.json["sensors"] == [app.PRIMARY_SENSOR.name]
+    widgets = response.json["widgets"]
+    assert set(widgets) == {"top_signatures", "top_dns"}
+    assert widgets["top_signatures"]["labels"] == ["ET SCAN"]
+    assert widgets["top_dns"] == app.build_top_stats("top_dns", "1h", state)[0]
+
+    etag = response.headers['ETag']
+    assert client.get('/api/dashboard?window=1h&include=top_signatures,top_dns,latest_counters'
+                      '&exclude=latest_counters', headers={'If-None-Match': etag}).status_code == 304
+    # Autre sélection de widgets: entrée de cache distincte
+    other = client.get('/api/dashboard?window=1h&include=top_dns', headers={'If-None-Match': etag})
+    assert other.status_code == 200 and set(other.json["widgets"]) == {"top_dns"}
+
+    assert client.get('/api/dashboard?include=top_dns,nope').status_code == 400
+    assert client.get('/api/dashboard?window=bogus').status_code == 400
+
+
+def test_counter_widgets_share_one_disk_read(state, monkeypatch):
+    reads = []
+
+    def read_stats_events(max_lines, sensors=None):
+        reads.append(max_lines)
+        return [stats_event(100, 1), stats_event(300, 2)]
+    monkeypatch.setattr(app, 'read_stats_events', read_stats_events)
+    payload, status = app.build_dashboard("1h", app.DASHBOARD_WIDGETS)
+    assert status == 200 and len(reads) == 1
+    assert payload["widgets"]["latest_counters"]["capture"]["kernel_packets"] == 300
+    assert payload["widgets"]["capture_history"]["packets"] == [100, 300]
+
+    # Le tailer a vu un événement stats: pas de relecture
+    state.ingest(stats_event(500, 3))
+    payload, _ = app.build_dashboard("1h", ("latest_counters", "capture_history"))
+    assert len(reads) == 1
+    assert payload["widgets"]["latest_counters"]["capture"]["kernel_packets"] == 500
+    assert "error" not in payload["widgets"]["capture_history"]
+
+
+def test_widget_errors_do_not_fail_the_dashboard(state, monkeypatch):
+    monkeypatch.setattr(app, 'read_stats_events', lambda max_lines, sensors=None: [])
+    payload, status = app.build_dashboard("1h", ("top_signatures", "latest_counters"))
+    assert status == 200
+    assert "error" in payload["widgets"]["latest_counters"]
+    assert payload["widgets"]["top_signatures"]["labels"] == ["ET SCAN"]
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from bench_decode import LAZY_FIELDS, synthetic_sample
+from eve_decode import EventTypePrefilter, FieldExtractor, loads, simdjson
+
+# Feuilles de type chaîne, comme celles qu'extraient le tailer et les filtres
+FIELDS = LAZY_FIELDS + ('src_ip', 'dns.rrname', 'dns.type', 'tls.sni', 'tls.ja3.hash', 'http.url', 'http.hostname',
+                        'fileinfo.filename', 'alert.category', 'missing', 'alert.missing', 'missing.field')
+
+SEPARATORS = [(',', ':'), (', ', ': '), (' , ', ' : ')]
+
+
+def reformat(line, separators=(',', ':'), indent=None, ensure_ascii=True):
+    return json.dumps(json.loads(line), separators=separators, indent=indent, ensure_ascii=ensure_ascii).encode()
+
+
+def variants(lines):
+    """Lignes compactes (Suricata) puis mises en forme autrement: espaces, retours à la ligne, UTF-8 brut."""
+    for line in lines:
+        yield line
+        for separators in SEPARATORS[1:]:
+            yield reformat(line, separators)
+        yield reformat(line, indent="\t")
+        yield reformat(line, ensure_ascii=False)
+
+
+TRICKY_LINES = [
+    # Clés recherchées présentes dans des chaînes d'autres champs (guillemets échappés)
+    b'{"timestamp":"t","event_type":"http","http":{"url":"/?\\"alert\\":{\\"signature\\":\\"fake\\"}",'
+    b'"hostname":"\\"dns\\":{\\"rrname\\":\\"fake\\"}"}}',
+    b'{"event_type":"alert","payload_printable":"\\"event_type\\":\\"dns\\"","alert":{"signature":"a\\\\"}}',
+    # Échappements dans les valeurs extraites
+    b'{"event_type":"alert","alert":{"signature":"ET \\"quoted\\" \\u00e9t\\u00e9 \\\\ \\/ \\t"}}',
+    # Objet parent présent, clé recherchée absente
+    b'{"event_type":"dns","dns":{"type":"query"},"tls":{"sni":"s"}}',
+    b'{"event_type":"tls","tls":{"ja3":{},"sni":"x"}}',
+]
+
+
+@pytest.mark.parametrize("mode", ['regex'] + (['simdjson'] if simdjson is not None else []))
+def test_lazy_extraction_matches_full_decode(mode):
+    expected = FieldExtractor(FIELDS, mode='full')
+    extractor = FieldExtractor(FIELDS, mode=mode)
+    checked = 0
+    for line in variants(synthetic_sample(2000) + TRICKY_LINES):
+        assert extractor.extract(line) == expected.extract(line), line
+        checked += 1
+    assert checked == 5 * 2005
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        FieldExtractor(FIELDS, mode='fast')
+
+
+PREFILTER_LINES = [
+    # event_type présent dans des chaînes d'autres champs, avant et après le vrai
+    b'{"payload_printable":"\\"event_type\\":\\"alert\\"","event_type":"http"}',
+    b'{"event_type":"http","http":{"url":"/?event_type=alert&\\"event_type\\": \\"alert\\""}}',
+    b'{"alert":{"signature":"\\"event_type\\":\\"dns\\""},"event_type":"alert"}',
+    b'{"event_type":"dnsx"}',
+    b'{"event_type":"alert\\"x"}',
+    b'{"timestamp":"t"}',
+]
+
+
+@pytest.mark.parametrize("types", [('alert',), ('dns', 'tls'), ('flow', 'http', 'fileinfo'), ('anomaly',)])
+def test_prefilter_agrees_with_decoding(types):
+    prefilter = EventTypePrefilter(types)
+    lines = list(variants(synthetic_sample(2000) + PREFILTER_LINES))
+    for line in lines:
+        event_type = loads(line).get('event_type')
+        expected = event_type if event_type in types else None
+        assert prefilter.classify(line) == expected, line
+    kept = prefilter.filter(lines)
+    assert kept == [line for line in lines if loads(line).get('event_type') in types]
+    assert kept or types == ('anomaly',)
+
+
+def test_prefilter_whitespace_around_colon():
+    prefilter = EventTypePrefilter(['alert'])
+    for line in (b'{"event_type" : "alert"}', b'{ "event_type":\t"alert" }', b'{"event_type"\n:\n"alert"}',
+                 b'{"src_ip":"1.2.3.4", "event_type": "alert"}'):
+        assert prefilter.matches(line)
+    assert not prefilter.matches(b'{"event_type" : "alerts"}')
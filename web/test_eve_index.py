@@ -0,0 +1,185 @@
+import gzip
+import json
+import os
+import random
+
+import pytest
+
+import eve_index
+from eve_index import EveIndex, FileIndex, SearchQuery, bloom_positions
+from logset import open_log
+from stream_filters import StreamFilter
+
+
+def make_events(count, hour, rng):
+    return [{"timestamp": "2026-10-18T%02d:%02d:%02d.000000+0000" % (hour, i // 60 % 60, i % 60),
+             "flow_id": rng.randrange(1, 3000),
+             "event_type": rng.choice(["flow", "dns", "alert"]),
+             "src_ip": "10.0.%d.%d" % (i % 3, i % 200),
+             "dest_port": rng.choice([53, 80, 443])} for i in range(count)]
+
+
+def write_events(path, events, opener=open):
+    with opener(path, 'wt') as f:
+        f.writelines(json.dumps(event) + "\n" for event in events)
+
+
+@pytest.fixture
+def family(tmp_path):
+    """eve.json.2.gz, eve.json.1 et eve.json; retourne (chemin courant, événements dans l'ordre)."""
+    rng = random.Random(7)
+    archived, rotated, live = make_events(3000, 1, rng), make_events(3000, 2, rng), make_events(1500, 3, rng)
+    write_events(tmp_path / "eve.json.2.gz", archived, gzip.open)
+    write_events(tmp_path / "eve.json.1", rotated)
+    write_events(tmp_path / "eve.json", live)
+    return str(tmp_path / "eve.json"), archived + rotated + live
+
+
+def search_all(index, query):
+    """Suit les curseurs jusqu'à la dernière page."""
+    events = []
+    while True:
+        result = index.search(query)
+        events.extend(result["events"])
+        if not result["next_cursor"]:
+            return events, result
+        inode, _, offset = result["next_cursor"].partition(':')
+        query.cursor = (int(inode), int(offset))
+
+
+def build(index):
+    while index.update(max_bytes=64 * 1024):
+        pass
+
+
+@pytest.mark.parametrize("make_query, predicate", [
+    (lambda: SearchQuery(flow_ids={42, 43}, limit=7), lambda e: e["flow_id"] in (42, 43)),
+    (lambda: SearchQuery(ports={53}, limit=500), lambda e: e["dest_port"] == 53),
+    (lambda: SearchQuery(stream_filter=StreamFilter.from_args({"event_type": "alert", "ip": "10.0.1.0/24"}),
+                         limit=300),
+     lambda e: e["event_type"] == "alert" and e["src_ip"].startswith("10.0.1.")),
+])
+def test_search_matches_linear_scan(family, make_query, predicate):
+    path, events = family
+    index = EveIndex(path)
+    build(index)
+    found, result = search_all(index, make_query())
+    assert found == [event for event in events if predicate(event)]
+    assert result["complete"]
+
+
+def test_bloom_filters_prune_blocks(family):
+    path, events = family
+    index = EveIndex(path)
+    build(index)
+    result = index.search(SearchQuery(flow_ids={1234}, limit=1000))
+    assert result["events"] == [event for event in events if event["flow_id"] == 1234]
+    total_blocks = sum(len(file_index.block_offsets) for file_index in index._indexes.values())
+    assert result["scanned_blocks"] < total_blocks
+
+
+def test_bloom_positions_are_stable():
+    # Partagées entre processus: pas de hash() randomisé
+    assert bloom_positions(42) == bloom_positions("42")
+    assert all(0 <= bit < eve_index.BLOOM_BITS for bit in bloom_positions("1:abcdef"))
+
+
+def test_search_without_index_scans_live_tail(family, monkeypatch):
+    path, events = family
+    index = EveIndex(path)
+    result = index.search(SearchQuery(limit=1000, flow_ids={42}))
+    live = events[-1500:]
+    assert result["events"] == [event for event in live if event["flow_id"] == 42]
+    # Les fichiers tournés ne sont pas encore indexés
+    assert not result["complete"]
+    monkeypatch.setattr(eve_index, 'TAIL_SCAN_BYTES', 1000)
+    index = EveIndex(path)
+    build(index)
+    with open(path, 'a') as f:
+        f.writelines(json.dumps(event) + "\n" for event in live)
+    # Sans correspondance, la recherche va jusqu'à la fin non indexée, bornée
+    assert not index.search(SearchQuery(flow_ids={-1}))["complete"]
+
+
+def test_reader_loads_published_index(family, tmp_path):
+    path, events = family
+    shared_dir = str(tmp_path / "shared")
+    writer = EveIndex(path, shared_dir=shared_dir)
+    reader = EveIndex(path, shared_dir=shared_dir, writer=False)
+    build(writer)
+    expected = [event for event in events if event["flow_id"] in (7, 8)]
+    found, result = search_all(reader, SearchQuery(flow_ids={7, 8}, limit=5))
+    assert found == expected and result["complete"]
+
+    # Lignes ajoutées au fichier courant: vues par le lecteur avant même leur indexation
+    extra = make_events(2000, 4, random.Random(3))
+    with open(path, 'a') as f:
+        f.writelines(json.dumps(event) + "\n" for event in extra)
+    expected += [event for event in extra if event["flow_id"] in (7, 8)]
+    assert search_all(reader, SearchQuery(flow_ids={7, 8}, limit=1000))[0] == expected
+    build(writer)
+    assert search_all(reader, SearchQuery(flow_ids={7, 8}, limit=1000))[0] == expected
+
+    # Bascule: un nouveau writer reprend l'index publié sans tout réindexer
+    live_inode = os.stat(path).st_ino
+    published = reader._indexes[live_inode].published
+    successor = EveIndex(path, shared_dir=shared_dir)
+    successor.update()
+    assert successor._indexes[live_inode].published >= published
+    assert search_all(successor, SearchQuery(flow_ids={7, 8}, limit=1000))[0] == expected
+
+
+def test_truncated_file_is_reindexed(tmp_path):
+    path = str(tmp_path / "eve.json")
+    rng = random.Random(1)
+    write_events(path, make_events(3000, 1, rng))
+    shared_dir = str(tmp_path / "shared")
+    writer = EveIndex(path, shared_dir=shared_dir)
+    reader = EveIndex(path, shared_dir=shared_dir, writer=False)
+    build(writer)
+    reader.search(SearchQuery(limit=1))
+    events = make_events(100, 2, rng)
+    write_events(path, events)  # copytruncate
+    build(writer)
+    found, _ = search_all(reader, SearchQuery(limit=1000))
+    assert found == events
+
+
+def test_file_index_extend_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(eve_index, 'READ_SIZE', 4096)
+    path = str(tmp_path / "eve.json")
+    write_events(path, make_events(3000, 1, random.Random(2)))
+    index = FileIndex(path, os.stat(path).st_ino)
+    count, done = index.extend(max_bytes=1)
+    assert 0 < count < 3000 and not done
+    rest, done = index.extend()
+    assert count + rest == 3000 and done
+
+
+def test_oversized_tail_scans_newest_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(eve_index, 'TAIL_SCAN_BYTES', 20000)
+    path = str(tmp_path / "eve.json")
+    events = make_events(3000, 1, random.Random(4))
+    write_events(path, events)
+    result = EveIndex(path).search(SearchQuery(limit=1000))
+    assert not result["complete"]
+    # Les événements les plus récents, à partir d'une ligne entière
+    assert 0 < result["count"] < 3000
+    assert result["events"] == events[-result["count"]:]
+    assert sum(len(json.dumps(event)) + 1 for event in result["events"]) <= 20000
+
+
+def test_search_reads_files_without_the_lock(family, monkeypatch):
+    path, events = family
+    index = EveIndex(path)
+    build(index)
+    opened = []
+
+    def open_unlocked(log_path):
+        assert not index._lock.locked()
+        opened.append(log_path)
+        return open_log(log_path)
+    monkeypatch.setattr(eve_index, 'open_log', open_unlocked)
+    found, _ = search_all(index, SearchQuery(ports={443}, limit=1000))
+    assert found == [event for event in events if event["dest_port"] == 443]
+    assert len(set(opened)) == 3
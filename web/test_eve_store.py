@@ -0,0 +1,120 @@
+import json
+import os
+
+import pytest
+
+import eve_store
+from eve_store import EveStore, EveStoreWriter
+from log_follower import LogFollower
+
+START, END = 1.7e9, 2e9
+
+
+def append_events(path, event_type, count):
+    with open(path, 'a') as f:
+        for i in range(count):
+            f.write(json.dumps({"timestamp": "2026-10-18T10:00:%02d.000000+0000" % (i % 60),
+                                "event_type": event_type, "src_ip": "10.0.0.1"}) + "\n")
+
+
+def attach(store_dir, path):
+    """Writer attaché à un nouveau follower (redémarrage du processus)."""
+    writer = EveStoreWriter(str(store_dir), LogFollower(str(path), use_inotify=False), backfill_bytes=1 << 20)
+    os.makedirs(store_dir, exist_ok=True)
+    writer._attach()
+    writer.flush()
+    return writer
+
+
+def counts(store_dir):
+    return dict(EveStore(str(store_dir)).count_codes('event_type', START, END))
+
+
+def test_resume_from_checkpoint_without_duplicates(tmp_path):
+    path, store_dir = tmp_path / "eve.json", tmp_path / "store"
+    append_events(path, "dns", 10)
+    writer = attach(store_dir, path)
+    assert counts(store_dir) == {"dns": 10}
+    writer.stop()
+
+    # Lignes écrites pendant l'arrêt: reprises au point de reprise
+    append_events(path, "alert", 5)
+    writer = attach(store_dir, path)
+    assert counts(store_dir) == {"dns": 10, "alert": 5}
+
+    append_events(path, "alert", 1)
+    writer.follower.poll()
+    writer.flush()
+    assert counts(store_dir) == {"dns": 10, "alert": 6}
+    writer.stop()
+
+
+def test_resume_after_rotation(tmp_path):
+    path, store_dir = tmp_path / "eve.json", tmp_path / "store"
+    append_events(path, "dns", 4)
+    attach(store_dir, path).stop()
+    append_events(path, "tls", 3)
+    os.rename(path, tmp_path / "eve.json.1")
+    append_events(path, "flow", 2)
+    # Fin du fichier renommé, puis tout le fichier courant
+    attach(store_dir, path).stop()
+    assert counts(store_dir) == {"dns": 4, "tls": 3, "flow": 2}
+
+
+def test_version_changes_only_with_new_lines(tmp_path):
+    path, store_dir = tmp_path / "eve.json", tmp_path / "store"
+    append_events(path, "dns", 3)
+    writer = attach(store_dir, path)
+    store = EveStore(str(store_dir))
+    version = store.version()
+    writer.flush()
+    assert store.version() == version
+    append_events(path, "dns", 1)
+    writer.follower.poll()
+    writer.flush()
+    assert store.version() != version
+    writer.stop()
+
+
+def test_small_cache_gives_same_results(tmp_path):
+    path, store_dir = tmp_path / "eve.json", tmp_path / "store"
+    for event_type, count in (("dns", 30), ("alert", 20), ("tls", 10)):
+        append_events(path, event_type, count)
+    attach(store_dir, path).stop()
+    expected = EveStore(str(store_dir)).top('event_type', START, END)
+    assert EveStore(str(store_dir), cache_bytes=16).top('event_type', START, END) == expected
+    assert expected == ([("dns", 30), ("alert", 20), ("tls", 10)], 3)
+
+
+def test_batch_interrupted_before_checkpoint_is_not_duplicated(tmp_path, monkeypatch):
+    path, store_dir = tmp_path / "eve.json", tmp_path / "store"
+    append_events(path, "dns", 10)
+    writer = attach(store_dir, path)
+    append_events(path, "alert", 5)
+    writer.follower.poll()
+    appended = []
+    segment_flush, replace = eve_store._SegmentWriter.flush, os.replace
+
+    def flush_segment(segment):
+        segment_flush(segment)
+        appended.append(segment.path)
+
+    def crash_after_append(src, dst):
+        # Arrêt brutal: colonnes ajoutées, point de reprise suivant jamais écrit
+        if appended:
+            raise KeyboardInterrupt
+        replace(src, dst)
+    with monkeypatch.context() as patch:
+        patch.setattr(eve_store._SegmentWriter, 'flush', flush_segment)
+        patch.setattr(os, 'replace', crash_after_append)
+        with pytest.raises(KeyboardInterrupt):
+            writer.flush()
+    assert appended and counts(store_dir) == {"dns": 10, "alert": 5}
+
+    writer = attach(store_dir, path)
+    assert counts(store_dir) == {"dns": 10, "alert": 5}
+    append_events(path, "alert", 1)
+    writer.follower.poll()
+    writer.flush()
+    assert counts(store_dir) == {"dns": 10, "alert": 6}
+    writer.stop()
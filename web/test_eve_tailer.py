@@ -0,0 +1,90 @@
+import json
+import time
+
+from eve_tailer import EveStatsState, EveTailer
+from log_follower import LogFollower
+
+
+def now_timestamp():
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000000+0000", time.gmtime())
+
+
+def event_line(event_type, **fields):
+    return json.dumps(dict(timestamp=now_timestamp(), event_type=event_type, **fields)).encode()
+
+
+def append(path, *lines):
+    with open(path, 'ab') as f:
+        f.write(b"".join(line + b"\n" for line in lines))
+
+
+def stats_line(packets, drops, uptime):
+    return event_line("stats", stats={"uptime": uptime, "capture": {"kernel_packets": packets,
+                                                                     "kernel_drops": drops}})
+
+
+def test_bootstrap_then_incremental_lines(tmp_path):
+    path = tmp_path / "eve.json"
+    append(path, event_line("alert", alert={"signature": "ET SCAN"}),
+           event_line("alert", alert={"signature": "ET SCAN"}),
+           event_line("flow", flow={"pkts_toserver": 1}))
+    follower = LogFollower(str(path), use_inotify=False)
+    state = EveStatsState()
+    tailer = EveTailer(follower, state, bootstrap_bytes=1024 * 1024)
+    tailer.start()
+    # L'historique récent amorce les compteurs dès l'enregistrement
+    assert state.top_signatures() == ([("ET SCAN", 2)], 1)
+    version = state.version
+
+    append(path, event_line("alert", alert={"signature": "ET POLICY"}),
+           b'{"event_type":"alert", not json',
+           event_line("dns", dns={"type": "query", "rrname": "example.org"}),
+           event_line("dns", dns={"type": "answer", "rrname": "example.org"}),
+           event_line("tls", tls={"sni": "example.net"}),
+           stats_line(1000, 10, 60))
+    follower.poll()
+    assert state.top_signatures() == ([("ET SCAN", 2), ("ET POLICY", 1)], 2)
+    assert state.top_dns() == ([("example.org", 1)], 1)
+    assert state.top_tls_sni() == ([("example.net", 1)], 1)
+    assert state.get_latest_stats()["stats"]["capture"]["kernel_packets"] == 1000
+    assert [point[1:] for point in state.get_capture_history()] == [(1000, 10)]
+    assert state.version > version
+
+    # Sans nouvelle ligne, rien ne change (le cache des réponses reste valide)
+    version = state.version
+    follower.poll()
+    assert state.version == version
+    tailer.stop()
+    append(path, event_line("alert", alert={"signature": "ET SCAN"}))
+    follower.poll()
+    assert state.top_signatures()[0][0] == ("ET SCAN", 2)
+
+
+def test_ingest_line_matches_ingest():
+    lines = [event_line("alert", alert={"signature": "A"}),
+             event_line("alert", alert={"signature": "B", "category": "event_type \"dns\""}),
+             event_line("dns", dns={"type": "query", "rrname": "a.example"}),
+             event_line("tls", tls={"version": "TLS 1.3"}),
+             event_line("http", http={"hostname": "event_type"}),
+             stats_line(10, 0, 1), stats_line(30, 2, 3)]
+    from_lines, from_events = EveStatsState(), EveStatsState()
+    for line in lines:
+        from_lines.ingest_line(line)
+        from_events.ingest(json.loads(line))
+    for state in (from_lines, from_events):
+        assert state.top_signatures() == ([("A", 1), ("B", 1)], 2)
+        assert state.top_dns() == ([("a.example", 1)], 1)
+        assert state.top_tls_sni() == ([], 0)
+    assert from_lines.snapshot() == from_events.snapshot()
+
+
+def test_snapshot_is_json_serializable():
+    state = EveStatsState()
+    state.ingest_line(event_line("alert", alert={"signature": "A"}))
+    state.ingest_line(stats_line(10, 1, 5))
+    snapshot = json.loads(json.dumps(state.snapshot(n=5)))
+    assert snapshot["top_n"] == 5
+    assert snapshot["tops"]["signatures"]
+    for window, (top, cardinality) in snapshot["tops"]["signatures"].items():
+        assert top == [["A", 1]] and cardinality == 1
+    assert snapshot["latest_stats"]["event_type"] == "stats"
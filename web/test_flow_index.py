@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+import shutil
+
+import app
+from eve_index import EveIndex
+from flow_index import FlowIndex, FlowIndexer
+from log_follower import LogFollower
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def event(flow_id, event_type, second):
+    return {"timestamp": "2026-10-18T10:00:%02d.000000+0000" % second, "flow_id": flow_id,
+            "event_type": event_type}
+
+
+def append(path, *events):
+    with open(path, 'a') as f:
+        f.writelines(json.dumps(e) + "\n" for e in events)
+
+
+def test_lru_eviction_marks_returning_flow_partial():
+    index = FlowIndex(max_flows=2)
+    index.add_many([(1, 10, 0), (2, 10, 100), (1, 10, 200)])
+    assert index.lookup(1) == ([(10, 0), (10, 200)], True)
+    index.add_many([(3, 10, 300)])  # évince le flux 2, le moins récemment actif
+    assert index.lookup(2) == ([], False)
+    index.add_many([(2, 10, 400)])
+    assert index.lookup(2) == ([(10, 400)], False)
+    assert index.lookup(3) == ([(10, 300)], True)
+
+
+def test_expired_flow_is_partial_when_it_comes_back():
+    clock = Clock()
+    index = FlowIndex(ttl=60, clock=clock)
+    index.add_many([(7, 10, 0)])
+    clock.now = 61
+    assert index.lookup(7) == ([], False)
+    index.add_many([(7, 10, 500), (8, 10, 600)])
+    assert index.lookup(7) == ([(10, 500)], False)
+    assert index.lookup(8)[1]
+
+
+def test_capped_flow_is_partial(monkeypatch):
+    monkeypatch.setattr('flow_index.MAX_EVENTS_PER_FLOW', 3)
+    index = FlowIndex()
+    index.add_many([(5, 10, offset) for offset in range(3)])
+    assert index.lookup(5)[1]
+    index.add_many([(5, 10, 3)])
+    assert index.lookup(5) == ([(10, 0), (10, 1), (10, 2)], False)
+
+
+def start_indexer(path, backfill_bytes=0):
+    """Retourne (indexeur démarré, horloge): les flux apparus avant clock.now = 60 (ttl) sont incomplets."""
+    clock = Clock()
+    follower = LogFollower(str(path), use_inotify=False)
+    indexer = FlowIndexer(follower, FlowIndex(ttl=60, clock=clock), backfill_bytes=backfill_bytes)
+    indexer.start()
+    return indexer, clock
+
+
+def test_indexer_reads_events_and_flags_flows_seen_at_startup(tmp_path):
+    path = tmp_path / "eve.json"
+    append(path, event(1, "dns", 0), event(2, "dns", 1))
+    indexer, clock = start_indexer(path, backfill_bytes=1 << 20)
+    follower = indexer.follower
+    append(path, event(5, "dns", 2))
+    follower.poll()
+    clock.now = 60
+    append(path, event(1, "flow", 2), event(3, "alert", 3), event(3, "flow", 4))
+    follower.poll()
+    # Flux 1 (historique relu) et 5 (apparu juste après le démarrage): ils ont pu commencer avant
+    assert indexer.events(1) == ([event(1, "dns", 0), event(1, "flow", 2)], False)
+    assert indexer.events(5) == ([event(5, "dns", 2)], False)
+    assert indexer.events(3) == ([event(3, "alert", 3), event(3, "flow", 4)], True)
+    assert indexer.events(4) == ([], False)
+    indexer.stop()
+
+
+def test_compressed_rotated_file_makes_flow_partial(tmp_path):
+    path = tmp_path / "eve.json"
+    append(path)
+    indexer, clock = start_indexer(path)
+    clock.now = 60
+    follower = indexer.follower
+    append(path, event(9, "alert", 0))
+    follower.poll()
+    os.rename(path, tmp_path / "eve.json.1")
+    append(path, event(9, "flow", 5))
+    follower.poll()
+    assert indexer.events(9) == ([event(9, "alert", 0), event(9, "flow", 5)], True)
+    # logrotate compresse eve.json.1: la position de l'alerte n'est plus lisible
+    with open(tmp_path / "eve.json.1", 'rb') as src, gzip.open(tmp_path / "eve.json.1.gz", 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.unlink(tmp_path / "eve.json.1")
+    assert indexer.events(9) == ([event(9, "flow", 5)], False)
+    indexer.stop()
+
+
+def test_bundle_merges_search_results_for_partial_flows(tmp_path, monkeypatch):
+    path = tmp_path / "eve.json"
+    append(path, event(9, "alert", 0), event(9, "alert", 0), event(4, "dns", 1))
+    indexer, clock = start_indexer(path)
+    follower = indexer.follower
+    append(path, event(9, "flow", 5))
+    follower.poll()
+    clock.now = 60
+    append(path, event(7, "dns", 3), event(7, "flow", 4))
+    follower.poll()
+    monkeypatch.setattr(app, '_flow_indexer', indexer)
+    monkeypatch.setattr(app, 'get_eve_index', lambda: EveIndex(str(path)))
+
+    # Flux apparu après le démarrage: l'index des flux suffit
+    payload, status = app.build_flow_bundle(7)
+    assert status == 200 and payload["source"] == "flow_index" and payload["count"] == 2
+
+    # Flux commencé avant l'index (alertes non indexées): complété par la recherche, sans doublon
+    payload, status = app.build_flow_bundle(9)
+    assert payload["source"] == "flow_index+search"
+    assert [e["event_type"] for e in payload["events"]] == ["alert", "alert", "flow"]
+    assert payload["count"] == 3
+    assert payload["event_types"] == {"alert": 2, "flow": 1}
+
+    payload, status = app.build_flow_bundle(4)  # vu seulement avant le démarrage de l'index
+    assert status == 200 and payload["source"] == "search" and payload["count"] == 1
+    assert app.build_flow_bundle(12345)[1] == 404
+    indexer.stop()
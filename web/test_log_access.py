@@ -0,0 +1,119 @@
+import pytest
+
+from log_access import (LineIndex, RangeNotSatisfiable, parse_range, read_line_page, read_offset_page,
+                        tail_start)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),       # suffixe plus long que le fichier
+    ("bytes=990-5000", (990, 999)),  # fin bornée à la taille
+    ("bytes=50-10", None),           # plage inversée: ignorée
+    ("bytes=0-1,5-6", None),         # plusieurs plages: réponse complète
+    ("items=0-10", None),
+    ("bytes=abc", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+def test_parse_range_suffix_on_empty_file():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-10", 0)
+
+
+def write_lines(path, lines):
+    data = b"".join(line + b"\n" for line in lines)
+    path.write_bytes(data)
+    return data
+
+
+def test_tail_start_aligns_on_line_start(tmp_path):
+    path = tmp_path / "eve.json"
+    data = write_lines(path, [b"aaaa", b"bbbb", b"cccc"])
+    size = len(data)
+    assert tail_start(str(path), size, size) == 0
+    assert tail_start(str(path), size, 10 * size) == 0
+    # Les 5 derniers octets commencent exactement au début de "cccc"
+    assert tail_start(str(path), size, 5) == 10
+    # Au milieu de "bbbb": on saute à la ligne suivante
+    assert tail_start(str(path), size, 7) == 10
+    # Juste après un saut de ligne
+    assert tail_start(str(path), size, 10) == 5
+
+
+def test_tail_start_inside_last_line(tmp_path):
+    path = tmp_path / "eve.json"
+    data = write_lines(path, [b"x" * 10, b"y" * 100])
+    # Aucune ligne ne commence dans les 50 derniers octets
+    assert tail_start(str(path), len(data), 50) == len(data)
+
+
+def test_line_index_extend_incremental(tmp_path):
+    path = tmp_path / "eve.json"
+    lines = [b"line %d" % i for i in range(25)]
+    write_lines(path, lines[:10])
+    with open(path, 'ab') as f:
+        f.write(b"partial")
+    index = LineIndex(str(path), 0, stride=4)
+    with open(path, 'rb') as f:
+        index.extend(f, path.stat().st_size)
+    assert index.lines == 10
+    # La ligne incomplète n'est pas indexée
+    assert index.indexed == sum(len(line) + 1 for line in lines[:10])
+
+    with open(path, 'ab') as f:
+        f.write(b"\n" + b"".join(line + b"\n" for line in lines[11:]))
+    with open(path, 'rb') as f:
+        index.extend(f, path.stat().st_size)
+        assert index.lines == 25
+        assert index.indexed == path.stat().st_size
+        # Un point d'index toutes les 4 lignes, chacun au début de sa ligne
+        assert len(index.offsets) == 25 // 4 + 1
+        for k, offset in enumerate(index.offsets):
+            f.seek(offset)
+            expected = b"partial" if k * 4 == 10 else lines[k * 4]
+            assert f.readline().rstrip(b"\n") == expected
+
+
+def test_line_index_truncation(tmp_path):
+    path = tmp_path / "eve.json"
+    write_lines(path, [b"a", b"b"])
+    index = LineIndex(str(path), 0)
+    with open(path, 'rb') as f:
+        index.extend(f, path.stat().st_size)
+    write_lines(path, [b"c"])
+    with open(path, 'rb') as f, pytest.raises(ValueError):
+        index.extend(f, path.stat().st_size)
+
+
+def test_read_line_page(tmp_path):
+    path = tmp_path / "eve.json"
+    write_lines(path, [b"l%d" % i for i in range(3000)])
+    page = read_line_page(str(path), 1500, 3)
+    assert page["lines"] == ["l1500", "l1501", "l1502"]
+    assert page["next_line"] == 1503
+    assert page["total_lines"] == 3000
+    last = read_line_page(str(path), -2, 10)
+    assert last["lines"] == ["l2998", "l2999"]
+    assert last["next_line"] is None
+
+
+def test_read_offset_page_skips_partial_line(tmp_path):
+    path = tmp_path / "eve.json"
+    write_lines(path, [b"first", b"second", b"third"])
+    page = read_offset_page(str(path), 2, 10)
+    assert page["offset"] == 6
+    assert page["lines"] == ["second", "third"]
+    assert page["next_offset"] is None
@@ -0,0 +1,168 @@
+import gzip
+import os
+import random
+
+import pytest
+
+import logset
+from logset import LogSet, build_index, get_index, list_log_files, open_log
+
+
+@pytest.fixture(autouse=True)
+def small_checkpoints(monkeypatch):
+    """Points de reprise rapprochés pour en avoir plusieurs par membre sur de petits fichiers."""
+    monkeypatch.setattr(logset, 'READ_SIZE', 4096)
+    monkeypatch.setattr(logset, 'CHECKPOINT_SPACING', 64 * 1024)
+    monkeypatch.setattr(logset, '_index_dir', None)
+    monkeypatch.setattr(logset, '_index_cache', logset.OrderedDict())
+
+
+def make_lines(count, start=0, seed=0):
+    rng = random.Random(seed)
+    return [b'{"event_type":"flow","i":%d,"pad":"%s"}' % (start + i, rng.randbytes(24).hex().encode())
+            for i in range(count)]
+
+
+def content(lines):
+    return b"".join(line + b"\n" for line in lines)
+
+
+def write_members(path, parts, compress):
+    """Archive formée d'un membre gzip (ou d'une trame zstd) par morceau."""
+    with open(path, 'wb') as f:
+        for part in parts:
+            f.write(compress(part))
+
+
+def check_random_reads(path, expected):
+    rng = random.Random(5)
+    index = get_index(path, logset.compression_of(path))
+    offsets = index.offsets + [rng.randrange(len(expected)) for _ in range(30)] + [len(expected) - 10]
+    rng.shuffle(offsets)
+    with open_log(path) as f:
+        assert f.read() == expected
+        for offset in offsets:
+            f.seek(offset)
+            assert f.read(1000) == expected[offset:offset + 1000]
+        assert f.seek(0, os.SEEK_END) == len(expected)
+
+
+def test_gzip_multi_member_checkpoints(tmp_path):
+    data = content(make_lines(12000))
+    path = str(tmp_path / "eve.json.2.gz")
+    parts = [data[:300000], data[300000:310000], data[310000:]]
+    write_members(path, parts, lambda part: gzip.compress(part, 6))
+    index = build_index(path, 'gzip')
+    assert index.complete and index.size == len(data)
+    # Débuts de membre (sans état) et points de reprise internes (état zlib copié)
+    assert 300000 in index.offsets and 310000 in index.offsets
+    assert any(state is not None for state in index.states)
+    check_random_reads(path, data)
+
+
+def test_zstd_multi_frame(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    data = content(make_lines(6000))
+    path = str(tmp_path / "eve.json.2.zst")
+    parts = [data[i:i + 100000] for i in range(0, len(data), 100000)]
+    write_members(path, parts, zstandard.ZstdCompressor().compress)
+    index = build_index(path, 'zstd')
+    assert index.complete and index.size == len(data)
+    assert index.offsets == list(range(0, len(data), 100000)) + [len(data)]
+    check_random_reads(path, data)
+
+
+def test_truncated_archive_is_incomplete(tmp_path):
+    data = content(make_lines(3000))
+    compressed = gzip.compress(data)
+    path = str(tmp_path / "eve.json.2.gz")
+    with open(path, 'wb') as f:
+        f.write(compressed[:len(compressed) // 2])  # compression par logrotate en cours
+    index = build_index(path, 'gzip')
+    assert not index.complete
+    with open_log(path) as f:
+        partial = f.read()
+    assert 0 < len(partial) < len(data) and data.startswith(partial)
+
+
+def test_index_is_persisted_and_states_recovered(tmp_path, monkeypatch):
+    data = content(make_lines(12000))
+    path = str(tmp_path / "eve.json.2.gz")
+    write_members(path, [data], gzip.compress)
+    index_dir = str(tmp_path / "log-index")
+    logset.set_index_dir(index_dir)
+    built = get_index(path, 'gzip')
+    assert len(os.listdir(index_dir)) == 2  # index et verrou
+
+    # Autre worker (ou redémarrage): l'index est relu, pas reconstruit
+    monkeypatch.setattr(logset, '_index_cache', logset.OrderedDict())
+
+    def fail(*args):
+        raise AssertionError("archive decompressed again")
+    monkeypatch.setattr(logset, 'build_index', fail)
+    loaded = get_index(path, 'gzip')
+    assert loaded is not built
+    assert (loaded.offsets, loaded.compressed_offsets, loaded.size) == (built.offsets, built.compressed_offsets,
+                                                                        built.size)
+    # Un seul membre: seuls son début et sa fin n'ont pas besoin d'état zlib
+    assert loaded.states[0] is None and loaded.states[-1] is None
+    assert all(state is logset._PENDING for state in loaded.states[1:-1]) and len(loaded.states) > 3
+    # Lecture en fin d'archive: les états intermédiaires sont reconstitués au passage
+    with open_log(path) as f:
+        f.seek(len(data) - 5000)
+        assert f.read() == data[-5000:]
+    assert all(state is not logset._PENDING for state in loaded.states[:-1])
+    check_random_reads(path, data)
+
+
+def test_rewritten_archive_replaces_its_index(tmp_path):
+    path = str(tmp_path / "eve.json.2.gz")
+    index_dir = str(tmp_path / "log-index")
+    logset.set_index_dir(index_dir)
+    write_members(path, [content(make_lines(100))], gzip.compress)
+    get_index(path, 'gzip')
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(content(make_lines(100, start=100))))
+    os.utime(path, ns=(1, 1))
+    assert get_index(path, 'gzip').size == len(content(make_lines(100)) + content(make_lines(100, start=100)))
+    assert len([name for name in os.listdir(index_dir) if name.endswith(logset.INDEX_SUFFIX)]) == 1
+
+
+@pytest.fixture
+def rotated_family(tmp_path):
+    """eve.json.2.gz, eve.json.1 et eve.json; retourne (chemin courant, lignes dans l'ordre)."""
+    archived, rotated, live = make_lines(8000), make_lines(3000, start=8000), make_lines(500, start=11000)
+    path = tmp_path / "eve.json"
+    write_members(str(tmp_path / "eve.json.2.gz"), [content(archived)], gzip.compress)
+    (tmp_path / "eve.json.1").write_bytes(content(rotated))
+    path.write_bytes(content(live) + b'{"event_type":"partial')
+    os.utime(tmp_path / "eve.json.2.gz", (1000, 1000))
+    os.utime(tmp_path / "eve.json.1", (2000, 2000))
+    return str(path), archived + rotated + live
+
+
+def test_family_order(rotated_family):
+    path, _ = rotated_family
+    assert [os.path.basename(f.path) for f in list_log_files(path)] == ["eve.json.2.gz", "eve.json.1", "eve.json"]
+    assert [os.path.basename(f.path) for f in list_log_files(path, include_compressed=False)] == ["eve.json.1",
+                                                                                                  "eve.json"]
+
+
+def test_last_lines_across_rotations(rotated_family):
+    path, lines = rotated_family
+    reverse = list(LogSet(path).iter_lines_reverse(block_size=4096))
+    # La ligne en cours d'écriture vient en premier, puis tout l'historique à rebours
+    assert reverse[0] == b'{"event_type":"partial'
+    assert reverse[1:] == lines[::-1]
+    assert [line for _, _, line in LogSet(path).iter_lines()] == lines
+
+
+def test_last_lines_bounded_by_max_bytes(rotated_family):
+    path, lines = rotated_family
+    live_size = os.path.getsize(path)
+    rotated_size = os.path.getsize(path + ".1")
+    # Assez pour le fichier courant, le fichier tourné et quelques lignes de l'archive
+    reverse = list(LogSet(path).iter_lines_reverse(max_bytes=live_size + rotated_size + 1000, block_size=4096))
+    assert reverse[-1] in lines[:8000]
+    assert reverse[1:] == lines[::-1][:len(reverse) - 1]
+    assert 3500 < len(reverse) < 3500 + 20
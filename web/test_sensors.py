@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from eve_tailer import EveStatsState
+from sensors import DEFAULT_SENSOR, MergedStatsState, load_sensors, parse_sensor_names
+
+
+def write_config(tmp_path, entries):
+    path = tmp_path / "sensors.json"
+    path.write_text(entries if isinstance(entries, str) else json.dumps(entries))
+    return str(path)
+
+
+def test_default_sensor_without_config():
+    [sensor] = load_sensors('', '/run/suricata.socket')
+    assert (sensor.name, sensor.socket_path, sensor.eve_path) == (DEFAULT_SENSOR, '/run/suricata.socket', None)
+    assert sensor.resolve_eve_path('/logs', 'eve.json') == '/logs/eve.json'
+
+
+def test_load_sensors(tmp_path):
+    path = write_config(tmp_path, [{"name": "nic0", "socket": "/run/nic0.socket", "eve": "/var/log/nic0/eve.json"},
+                                   {"name": "nic1", "socket": "/run/nic1.socket", "eve": "nic1/eve.json"}])
+    sensors = load_sensors(path, '/run/suricata.socket')
+    assert [sensor.name for sensor in sensors] == ["nic0", "nic1"]
+    assert [sensor.resolve_eve_path('/logs', 'eve.json') for sensor in sensors] == [
+        '/var/log/nic0/eve.json', '/logs/nic1/eve.json']
+    assert parse_sensor_names('nic1, nic0', sensors) == ("nic0", "nic1")
+    assert parse_sensor_names('', sensors) is None
+    with pytest.raises(ValueError):
+        parse_sensor_names('nic0,nic9', sensors)
+
+
+@pytest.mark.parametrize("entries", [
+    '[{"name": "nic0",',
+    '{"name": "nic0", "socket": "s", "eve": "e"}',
+    [],
+    ["nic0"],
+    [{"name": "nic 0", "socket": "s", "eve": "e"}],
+    [{"name": "nic0", "socket": "s", "eve": "e"}, {"name": "nic0", "socket": "t", "eve": "f"}],
+    [{"name": "nic0", "socket": "s"}],
+    [{"name": "nic0", "socket": 3, "eve": "e"}],
+])
+def test_malformed_config(tmp_path, entries):
+    with pytest.raises(ValueError):
+        load_sensors(write_config(tmp_path, entries), '/run/suricata.socket')
+
+
+def test_missing_config_file(tmp_path):
+    with pytest.raises(ValueError):
+        load_sensors(str(tmp_path / "missing.json"), '/run/suricata.socket')
+
+
+def test_app_starts_with_malformed_config(tmp_path):
+    """Un fichier de sondes invalide ne doit pas empêcher l'import de l'application."""
+    env = dict(os.environ, SURICATA_SENSORS_FILE=write_config(tmp_path, '[{"name": "nic0"}]'),
+               SURICATA_SOCKET_PATH=str(tmp_path / "suricata.socket"))
+    script = "import json, app; print(json.dumps(app.build_sensors()))"
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    payload = json.loads(result.stdout.splitlines()[-1])
+    assert [sensor["name"] for sensor in payload["sensors"]] == [DEFAULT_SENSOR]
+    assert "nic0" in payload["config_error"]
+
+
+def timestamp(offset=0):
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000000+0000", time.gmtime(time.time() - 30 + offset))
+
+
+def alert(signature):
+    return {"timestamp": timestamp(), "event_type": "alert", "alert": {"signature": signature}}
+
+
+def stats(offset, packets, drops, **extra):
+    return {"timestamp": timestamp(offset), "event_type": "stats",
+            "stats": {"uptime": 10 + offset, "capture": {"kernel_packets": packets, "kernel_drops": drops}, **extra}}
+
+
+def test_merged_state():
+    nic0, nic1 = EveStatsState(), EveStatsState()
+    for signature in ("A", "A", "B"):
+        nic0.ingest(alert(signature))
+    for signature in ("B", "B", "C"):
+        nic1.ingest(alert(signature))
+    nic0.ingest(stats(0, 100, 1, flow={"memuse": 5}))
+    nic1.ingest(stats(1, 1000, 10))
+    nic0.ingest(stats(2, 200, 2, flow={"memuse": 7}))
+    merged = MergedStatsState({"nic0": nic0, "nic1": nic1})
+
+    assert merged.top_signatures(2, '1h') == ([("B", 3), ("A", 2)], 4)
+    assert merged.top_dns() == ([], 0)
+    latest = merged.get_latest_stats()
+    assert latest["timestamp"] == timestamp(2)
+    assert latest["stats"]["capture"] == {"kernel_packets": 1200, "kernel_drops": 12}
+    assert latest["stats"]["flow"] == {"memuse": 7} and "uptime" not in latest["stats"]
+    # Pas de point tant que nic1 n'a rien publié, puis sommes des dernières valeurs
+    assert merged.get_capture_history() == [(timestamp(1), 1100, 11), (timestamp(2), 1200, 12)]
+
+    version = merged.version
+    nic1.ingest(alert("C"))
+    assert merged.version != version
+
+
+def test_merged_state_without_stats():
+    merged = MergedStatsState({"nic0": EveStatsState(), "nic1": EveStatsState()})
+    assert merged.get_latest_stats() is None
+    assert merged.get_capture_history() == []
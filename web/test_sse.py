@@ -0,0 +1,121 @@
+import json
+import zlib
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from sse import SSEEncoder, SSEStream, format_batch, line_payload, negotiate_encoding
+from stream_filters import StreamFilter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def line(i):
+    return b'{"event_type":"dns","i":%d}' % i
+
+
+def make_stream(clock, **kwargs):
+    return SSEStream(StreamFilter.from_args(MultiDict()), clock=clock, **kwargs)
+
+
+def batch_items(frame):
+    event, data = frame.rstrip("\n").split("\n")
+    assert event == "event: batch"
+    return json.loads(data[len("data: "):])
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("br", None),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("deflate", "deflate"),
+    ("GZIP", "gzip"),
+    ("gzip;q=0, deflate", "deflate"),
+    ("gzip; q=0.0", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_line_payload_wraps_non_json_lines():
+    assert line_payload(line(1)) == line(1).decode()
+    for raw in (b'<Info> - all 4 packet processing threads', b'{"event_type":"alert","src_ip":"1.2',
+                b'{"event_type": "alert", "x": }', b'{"bad":"\xff"}x'):
+        assert json.loads(line_payload(raw)) == {"raw_line": raw.decode('utf-8', errors='replace')}
+    # Dans un lot, une ligne tronquée ne rend pas le tableau illisible
+    assert batch_items(format_batch([line(1), b'{"event_type":"al', line(2)])) == [
+        {"event_type": "dns", "i": 1}, {"raw_line": '{"event_type":"al'}, {"event_type": "dns", "i": 2}]
+
+
+@pytest.mark.parametrize("encoding, wbits", [("gzip", 16 + zlib.MAX_WBITS), ("deflate", zlib.MAX_WBITS)])
+def test_each_compressed_frame_is_decodable_immediately(encoding, wbits):
+    encoder = SSEEncoder(encoding)
+    decoder = zlib.decompressobj(wbits)
+    frames = [": connected\n\n", "data: %s\n\n" % line(1).decode(), ": heartbeat\n\n"]
+    for frame in frames:
+        # Z_SYNC_FLUSH: le client lit la trame sans attendre la suite du flux
+        assert decoder.decompress(encoder.encode(frame)).decode() == frame
+    assert decoder.decompress(encoder.close()) == b""
+    assert decoder.eof
+    assert encoder.close() == b""
+
+
+def test_uncompressed_encoder():
+    encoder = SSEEncoder()
+    assert encoder.encode("data: é\n\n") == "data: é\n\n".encode()
+    assert encoder.close() == b""
+
+
+def test_lines_without_batching_are_sent_one_per_frame():
+    clock = Clock()
+    stream = make_stream(clock)
+    assert stream.opening() == [": connected\n\n"]
+    assert stream.on_lines([line(1), line(2)], dropped=3) == [
+        'data: {"dropped": 3}\n\n', "data: %s\n\n" % line(1).decode(), "data: %s\n\n" % line(2).decode()]
+
+
+def test_batch_is_sent_at_deadline():
+    clock = Clock()
+    stream = make_stream(clock, batch_ms=200, heartbeat_interval=15)
+    stream.opening()
+    assert stream.on_lines([line(1)]) == []
+    assert stream.timeout() == pytest.approx(0.2)
+    clock.now = 0.1
+    assert stream.on_lines([line(2)]) == []
+    # L'échéance part de la première ligne en attente, pas de la dernière
+    assert stream.timeout() == pytest.approx(0.1)
+    clock.now = 0.2
+    frames = stream.on_lines([])
+    assert [batch_items(frame) for frame in frames] == [[{"event_type": "dns", "i": 1}, {"event_type": "dns", "i": 2}]]
+    assert stream.timeout() == pytest.approx(15)
+
+
+def test_full_batches_are_split_by_size():
+    clock = Clock()
+    stream = make_stream(clock, batch_ms=1000, batch_size=3)
+    frames = stream.on_lines([line(i) for i in range(7)])
+    assert [[item["i"] for item in batch_items(frame)] for frame in frames] == [[0, 1, 2], [3, 4, 5], [6]]
+    assert stream.on_lines([]) == []
+
+
+def test_heartbeat_only_after_silence():
+    clock = Clock()
+    stream = make_stream(clock, heartbeat_interval=15)
+    stream.opening()
+    clock.now = 14
+    assert stream.on_lines([]) == []
+    assert stream.timeout() == pytest.approx(1)
+    clock.now = 10 + 14
+    assert stream.on_lines([line(1)]) != []  # une trame repousse le heartbeat
+    clock.now = 10 + 28
+    assert stream.on_lines([]) == []
+    clock.now = 10 + 29
+    assert stream.on_lines([]) == [": heartbeat\n\n"]
+    assert stream.timeout() == pytest.approx(15)
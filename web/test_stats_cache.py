@@ -0,0 +1,117 @@
+import json
+import time
+from email.utils import formatdate
+
+import pytest
+
+import app
+from eve_tailer import EveStatsState
+from stats_cache import StatsCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Compute:
+    """compute() pour StatsCache.get: compte les appels."""
+
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.payload, self.status
+
+
+def test_entry_is_reused_until_the_version_changes():
+    clock = Clock()
+    cache = StatsCache(clock=clock)
+    compute = Compute({"labels": ["a"], "values": [1]})
+    entry = cache.get(('top_dns', '1h', None), 1, compute)
+    assert json.loads(entry.body) == compute.payload
+    assert cache.get(('top_dns', '1h', None), 1, compute) is entry and compute.calls == 1
+
+    # Nouvelle version, même résultat: mêmes validateurs
+    clock.now += 60
+    same = cache.get(('top_dns', '1h', None), 2, compute)
+    assert compute.calls == 2 and (same.etag, same.last_modified) == (entry.etag, entry.last_modified)
+
+    compute.payload = {"labels": ["a"], "values": [2]}
+    changed = cache.get(('top_dns', '1h', None), 3, compute)
+    assert changed.etag != entry.etag and changed.last_modified == clock.now
+
+
+def test_each_key_keeps_its_own_entry():
+    cache = StatsCache()
+    keys = [('top_dns', '5m', None), ('top_dns', '1h', None), ('top_dns', '1h', ('nic0',)),
+            ('dashboard', '1h', ('top_dns',), None)]
+    entries = {key: cache.get(key, 1, Compute({"key": repr(key)})) for key in keys}
+    assert len({entry.etag for entry in entries.values()}) == len(keys)
+    for key in keys:
+        compute = Compute(None)
+        assert cache.get(key, 1, compute) is entries[key] and compute.calls == 0
+
+
+def test_least_recently_served_entry_is_evicted():
+    cache = StatsCache(max_entries=2)
+    cache.get('a', 1, Compute(1))
+    cache.get('b', 1, Compute(2))
+    cache.get('a', 1, Compute(1))  # 'a' redevient la plus récente
+    cache.get('c', 1, Compute(3))
+    for key, calls in (('a', 0), ('c', 0), ('b', 1)):
+        compute = Compute(0)
+        cache.get(key, 1, compute)
+        assert compute.calls == calls
+
+
+def test_not_modified():
+    entry = StatsCache(clock=Clock()).get('k', 1, Compute({"a": 1}))
+    assert entry.not_modified(entry.etag)
+    assert entry.not_modified(f'"other", W/{entry.etag}')
+    assert entry.not_modified('*')
+    assert not entry.not_modified('"other"')
+    # If-None-Match prime sur If-Modified-Since
+    assert not entry.not_modified('"other"', formatdate(entry.last_modified + 10, usegmt=True))
+    assert entry.not_modified(None, formatdate(entry.last_modified, usegmt=True))
+    assert not entry.not_modified(None, formatdate(entry.last_modified - 10, usegmt=True))
+    assert not entry.not_modified(None, 'not a date')
+    error = StatsCache().get('e', 1, Compute({"error": "x"}, 500))
+    assert not error.not_modified('*') and 'ETag' not in error.headers
+
+
+@pytest.fixture
+def client(monkeypatch):
+    state = EveStatsState()
+    monkeypatch.setattr(app, 'get_eve_state', lambda sensors=None: state)
+    monkeypatch.setattr(app, '_stats_cache', StatsCache())
+    return app.app.test_client(), state
+
+
+def alert(signature):
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S.000000+0000", time.gmtime())
+    return {"timestamp": timestamp, "event_type": "alert", "alert": {"signature": signature}}
+
+
+def test_conditional_get_returns_304(client):
+    client, state = client
+    state.ingest(alert("ET SCAN"))
+    first = client.get('/api/stats/top_signatures?window=1h')
+    assert first.status_code == 200 and first.json["labels"] == ["ET SCAN"]
+    etag = first.headers['ETag']
+
+    again = client.get('/api/stats/top_signatures?window=1h', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b"" and again.headers['ETag'] == etag
+    # Autre fenêtre: autre entrée, autre réponse
+    assert client.get('/api/stats/top_signatures?window=5m', headers={'If-None-Match': etag}).status_code == 200
+
+    state.ingest(alert("ET POLICY"))
+    changed = client.get('/api/stats/top_signatures?window=1h', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert changed.json["labels"] == ["ET SCAN", "ET POLICY"]
@@ -0,0 +1,57 @@
+from stats_series import StatsSeries
+
+RESOLUTIONS = {'1s': (1, 100), '1m': (60, 10)}
+
+
+def test_first_sample_is_only_a_reference():
+    series = StatsSeries(RESOLUTIONS)
+    assert series.add_counters(100, {'packets': 1000}) is None
+    assert series.add_counters(101, {'packets': 1500}) == (101, 1, {'packets': 500}, {})
+
+
+def test_older_sample_is_ignored():
+    series = StatsSeries(RESOLUTIONS)
+    series.add_counters(100, {'packets': 1000})
+    series.add_counters(110, {'packets': 2000})
+    assert series.add_counters(105, {'packets': 1500}) is None
+    assert sum(bucket[2]['packets'] for bucket in series.buckets('1s')) == 1000
+
+
+def test_restart_detected_by_uptime():
+    series = StatsSeries(RESOLUTIONS)
+    series.add_counters(100, {'packets': 5000, 'drops': 10}, uptime=500)
+    # Redémarrage 3 s avant le relevé: les compteurs repartent de zéro
+    _, interval, deltas, _ = series.add_counters(108, {'packets': 300, 'drops': 20}, uptime=3)
+    assert series.resets == 1
+    assert interval == 3
+    # drops a augmenté mais c'est aussi un compteur remis à zéro: sa valeur est le delta
+    assert deltas == {'packets': 300, 'drops': 20}
+
+
+def test_restart_detected_by_counter_without_uptime():
+    series = StatsSeries(RESOLUTIONS)
+    series.add_counters(100, {'packets': 5000, 'drops': 10})
+    _, _, deltas, _ = series.add_counters(101, {'packets': 40, 'drops': 12})
+    assert series.resets == 1
+    assert deltas == {'packets': 40, 'drops': 12}
+
+
+def test_thread_counter_reset_only_affects_that_thread():
+    series = StatsSeries(RESOLUTIONS)
+    series.add_counters(100, {'packets': 100}, {'W#01': {'packets': 60}, 'W#02': {'packets': 40}}, uptime=10)
+    _, _, deltas, groups = series.add_counters(
+        101, {'packets': 150}, {'W#01': {'packets': 100}, 'W#02': {'packets': 5}}, uptime=11)
+    assert series.resets == 0
+    assert deltas == {'packets': 50}
+    assert groups == {'W#01': {'packets': 40}, 'W#02': {'packets': 5}}
+
+
+def test_buckets_aggregate_per_resolution():
+    series = StatsSeries(RESOLUTIONS)
+    series.add_counters(0, {'packets': 0})
+    for t in range(1, 121):
+        series.add_counters(t, {'packets': t * 10})
+    minutes = series.buckets('1m')
+    assert [bucket[0] for bucket in minutes] == [0, 60, 120]
+    assert [bucket[2]['packets'] for bucket in minutes] == [590, 600, 10]
+    assert len(series.buckets('1s')) == 100  # tampon circulaire borné
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from stream_filters import StreamFilter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def line(event_type="alert", src_ip="10.0.0.1", dest_ip="192.168.1.10", **fields):
+    return json.dumps(dict(event_type=event_type, src_ip=src_ip, dest_ip=dest_ip, **fields)).encode()
+
+
+ALERT = line(alert={"signature_id": 2100498, "severity": 1})
+DNS = line("dns", src_ip="10.1.2.3", dest_ip="8.8.8.8", dns={"rrname": "a.com", "type": "query"})
+TLS_V6 = line("tls", src_ip="2001:db8::1", dest_ip="2001:db8::2", tls={"sni": "b.org"})
+LINES = [ALERT, DNS, TLS_V6, b"18/10/2026 -- 10:00:00 - <Info> - suricata.log line"]
+
+
+@pytest.mark.parametrize("args, expected", [
+    ({}, LINES),
+    ({"event_type": "alert, dns"}, [ALERT, DNS]),
+    ({"src_ip": "10.0.0.0/16"}, [ALERT]),
+    ({"dest_ip": "8.8.8.8"}, [DNS]),
+    ({"ip": "2001:db8::/32"}, [TLS_V6]),
+    ({"ip": "10.0.0.0/8"}, [ALERT, DNS]),
+    ({"signature_id": "2100498,1"}, [ALERT]),
+    ({"match": ["dns.rrname==a.com"]}, [DNS]),
+    ({"match": ["event_type!=alert", "tls.sni!=x"]}, [DNS, TLS_V6]),
+    ({"event_type": "tls", "match": ["tls.sni==b.org"]}, [TLS_V6]),
+])
+def test_filtering(args, expected):
+    stream_filter = StreamFilter.from_args(MultiDict(args))
+    assert stream_filter.apply(LINES) == expected
+
+
+def test_passthrough_keeps_lines_untouched():
+    stream_filter = StreamFilter.from_args(MultiDict())
+    assert stream_filter.is_passthrough and not stream_filter.needs_decode
+    assert stream_filter.apply(LINES) is LINES
+
+
+def test_event_type_only_skips_full_decode():
+    stream_filter = StreamFilter.from_args(MultiDict({"event_type": "alert"}))
+    assert stream_filter.needs_decode and not stream_filter.needs_full_decode
+    # Préfiltre au niveau octet: une ligne tronquée du bon type passe, une ligne suricata.log non
+    assert stream_filter.apply([b'{"event_type":"alert","src_ip":', b'<Info> event_type "alert"']) == [
+        b'{"event_type":"alert","src_ip":']
+
+
+@pytest.mark.parametrize("args", [
+    {"sample": "0"},
+    {"sample": "-2"},
+    {"reservoir": "x"},
+    {"reservoir_interval": "0"},
+    {"max_rate": "-1"},
+    {"src_ip": "10.0.0.0/33"},
+    {"match": ["==a"]},
+    {"match": ["dns.rrname"]},
+    {"signature_id": "abc"},
+])
+def test_invalid_arguments(args):
+    with pytest.raises(ValueError):
+        StreamFilter.from_args(MultiDict(args))
+
+
+def test_sample_keeps_one_in_n():
+    stream_filter = StreamFilter.from_args(MultiDict({"sample": "3"}))
+    lines = [line(i=i) for i in range(10)]
+    assert stream_filter.apply(lines[:4]) + stream_filter.apply(lines[4:]) == [lines[2], lines[5], lines[8]]
+
+
+def test_reservoir_holds_a_bounded_sample_until_the_interval_ends():
+    stream_filter = StreamFilter.from_args(MultiDict({"reservoir": "5", "reservoir_interval": "10"}))
+    lines = [line(i=i) for i in range(100)]
+    assert stream_filter.apply(lines) == []
+    assert 0 < stream_filter.wait_timeout(60) <= 10
+    stream_filter._reservoir_deadline = 0  # intervalle écoulé
+    sample = stream_filter.flush_due()
+    assert len(sample) == 5 and set(sample) <= set(lines)
+    assert stream_filter.flush_due() == []
+    # Nouvel intervalle: le réservoir repart de zéro
+    stream_filter.apply(lines[:2])
+    stream_filter._reservoir_deadline = 0
+    assert stream_filter.flush_due() == lines[:2]
+
+
+def test_token_bucket_limits_rate():
+    clock = Clock()
+    bucket = TokenBucket(10, clock=clock)
+    assert sum(bucket.allow() for _ in range(50)) == 10  # rafale initiale
+    clock.now = 0.5
+    assert sum(bucket.allow() for _ in range(50)) == 5
+    clock.now = 100
+    assert sum(bucket.allow() for _ in range(50)) == 10  # pas d'accumulation au-delà d'une rafale
+
+
+def test_max_rate_counts_dropped_lines():
+    stream_filter = StreamFilter.from_args(MultiDict({"max_rate": "20"}))
+    assert len(stream_filter.apply([line(i=i) for i in range(50)])) == 20
+    assert stream_filter.rate_limited == 30
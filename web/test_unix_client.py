@@ -0,0 +1,136 @@
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from unix_client import JsonFrameDecoder, SuricataCommandError, SuricataSocketPool
+
+MESSAGES = [
+    {"return": "OK", "message": {"a": 1}},
+    {"return": "OK", "message": "accolades {dans} une \"chaîne\" \\ {"},
+    {"return": "NOK", "message": [{"nested": {"deep": [1, 2, {"x": "}"}]}}]},
+]
+
+
+def test_decoder_whole_messages():
+    data = b"".join(json.dumps(message).encode() for message in MESSAGES)
+    assert JsonFrameDecoder().feed(data) == MESSAGES
+
+
+def test_decoder_byte_by_byte():
+    data = b"".join(json.dumps(message, ensure_ascii=False).encode() for message in MESSAGES)
+    decoder = JsonFrameDecoder()
+    decoded = []
+    for i in range(len(data)):
+        decoded.extend(decoder.feed(data[i:i + 1]))
+    assert decoded == MESSAGES
+
+
+def test_decoder_split_inside_escape():
+    data = json.dumps({"message": 'a\\"b{'}).encode()
+    cut = data.index(b'\\')
+    decoder = JsonFrameDecoder()
+    assert decoder.feed(data[:cut + 1]) == []
+    assert decoder.feed(data[cut + 1:]) == [{"message": 'a\\"b{'}]
+
+
+def test_decoder_max_size():
+    decoder = JsonFrameDecoder(max_size=100)
+    with pytest.raises(SuricataCommandError):
+        decoder.feed(b'{"message": "' + b"x" * 200)
+
+
+class FakeSuricata:
+    """Socket de commande minimal; drop=True ferme la connexion après avoir reçu une commande,
+    delay retarde chaque réponse (secondes)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.commands = []
+        self.drop = False
+        self.delay = 0
+        self.connections = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        decoder = JsonFrameDecoder()
+        while True:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            for message in decoder.feed(data):
+                if 'version' in message:
+                    conn.sendall(b'{"return": "OK"}')
+                    continue
+                self.commands.append(message['command'])
+                if self.drop:
+                    conn.shutdown(socket.SHUT_RDWR)
+                    return
+                time.sleep(self.delay)
+                conn.sendall(json.dumps({"return": "OK", "message": message['command']}).encode())
+
+    def restart(self):
+        self.server.close()
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        os.unlink(self.path)
+        self.__init__(self.path)
+
+
+@pytest.fixture
+def suricata(tmp_path):
+    server = FakeSuricata(str(tmp_path / "command.socket"))
+    yield server
+    server.server.close()
+
+
+def test_pool_reconnects_after_restart(suricata):
+    pool = SuricataSocketPool(suricata.path, timeout=2)
+    assert pool.execute({"command": "uptime"})["message"] == "uptime"
+    suricata.restart()
+    assert pool.execute({"command": "uptime"})["message"] == "uptime"
+    assert suricata.commands == ["uptime"]  # la nouvelle instance n'a reçu la commande qu'une fois
+    pool.close()
+
+
+def test_pool_does_not_replay_sent_command(suricata):
+    pool = SuricataSocketPool(suricata.path, timeout=2)
+    pool.execute({"command": "uptime"})
+    suricata.drop = True
+    with pytest.raises(OSError):
+        pool.execute({"command": "reload-rules"})
+    assert suricata.commands == ["uptime", "reload-rules"]
+    pool.close()
+
+
+def test_pool_waits_for_slow_commands_by_default(suricata):
+    # Un reload-rules sur un gros jeu de règles: pas de limite sans timeout explicite
+    suricata.delay = 0.5
+    pool = SuricataSocketPool(suricata.path)
+    assert pool.execute({"command": "reload-rules"})["message"] == "reload-rules"
+    pool.close()
+    pool = SuricataSocketPool(suricata.path, timeout=0.1)
+    with pytest.raises(socket.timeout):
+        pool.execute({"command": "reload-rules"})
+    pool.close()
@@ -0,0 +1,345 @@
+"""Client du socket de commande Unix de Suricata, avec pool de connexions.
+
+Les connexions sont gardées ouvertes entre deux commandes: la négociation
+de version ({"version": "0.1"}) n'est faite qu'une fois par connexion et une
+commande ne coûte plus qu'un aller-retour. Chaque connexion ne traite qu'une
+commande à la fois (elle est sortie du pool pendant l'échange). Une
+connexion inactive fermée par Suricata (redémarrage) est écartée avant
+réutilisation. Une commande n'est rejouée sur une connexion neuve que si son
+envoi a échoué: après l'envoi, Suricata a pu l'exécuter, et la rejouer
+(reload-rules, shutdown...) l'exécuterait deux fois.
+
+Les réponses sont découpées par JsonFrameDecoder: un parcours incrémental,
+conscient des chaînes et des échappements, qui détecte la fin exacte de
+chaque objet JSON quelle que soit la façon dont il est fragmenté.
+"""
+import asyncio
+import json
+import logging
+import queue
+import re
+import select
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "0.1"
+RECV_SIZE = 64 * 1024
+# Taille maximale d'une réponse (dump-counters sur de nombreux threads peut peser plusieurs Mo)
+DEFAULT_MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+# Jetons significatifs: une chaîne JSON entière (sautée d'un bloc, accolades
+# et échappements compris) ou une accolade. Une chaîne sans guillemet fermant
+# (groupe 'end' vide) est coupée en fin de tampon.
+_TOKENS = re.compile(rb'"(?:[^"\\]+|\\.)*(?P<end>"?)|[{}]', re.DOTALL)
+
+
+class SuricataCommandError(Exception):
+    """Erreur de communication avec le socket de commande de Suricata."""
+
+
+class JsonFrameDecoder:
+    """Découpe un flux d'octets en objets JSON de premier niveau.
+
+    Les données reçues sont ajoutées à un bytearray extensible; le parcours
+    reprend là où il s'était arrêté (profondeur d'accolades) et saute les
+    chaînes d'un bloc, si bien que le coût total est linéaire en la taille
+    des données, sans recopie quadratique. Un message incomplet dépassant max_size lève
+    SuricataCommandError.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_MESSAGE_SIZE):
+        self.max_size = max_size
+        self._buf = bytearray()
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+
+    def feed(self, data):
+        """Ajoute des octets et retourne la liste des objets JSON complétés."""
+        self._buf += data
+        messages = []
+        buf = self._buf
+        for match in _TOKENS.finditer(buf, self._pos):
+            token = buf[match.start()]
+            if token == 0x22:  # '"'
+                if not match.group('end'):
+                    # Chaîne coupée en fin de tampon: la reprendre au prochain appel
+                    self._pos = match.start()
+                    break
+                continue
+            if token == 0x7b:  # '{'
+                if self._depth == 0:
+                    self._start = match.start()
+                self._depth += 1
+            elif self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    end = match.end()
+                    messages.append(self._decode(self._start, end))
+                    self._start = None
+                    self._pos = end
+        else:
+            self._pos = len(buf)
+
+        # Libérer le préfixe déjà décodé (suppression en tête peu coûteuse pour un bytearray)
+        consumed = self._start if self._start is not None else self._pos
+        if consumed:
+            del buf[:consumed]
+            self._pos -= consumed
+            if self._start is not None:
+                self._start = 0
+        if self._start is not None and len(buf) > self.max_size:
+            raise SuricataCommandError(f"Response from Suricata exceeds maximum size ({self.max_size} bytes)")
+        return messages
+
+    def _decode(self, start, end):
+        try:
+            return json.loads(bytes(memoryview(self._buf)[start:end]))
+        except ValueError as e:
+            raise SuricataCommandError(f"Failed to decode JSON response from Suricata: {e}") from e
+
+
+class SuricataConnection:
+    """Une connexion authentifiée (version négociée) au socket de commande."""
+
+    def __init__(self, path, timeout=None, max_message_size=DEFAULT_MAX_MESSAGE_SIZE):
+        self.path = path
+        self._decoder = JsonFrameDecoder(max_message_size)
+        self._pending = []
+        self._recv_buffer = bytearray(RECV_SIZE)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+            self._handshake()
+        except Exception:
+            self.sock.close()
+            raise
+
+    def _handshake(self):
+        response = self._exchange({"version": PROTOCOL_VERSION})
+        if response.get('return') != 'OK':
+            raise SuricataCommandError(f"Version negotiation refused by Suricata: {response}")
+        logger.info(f"Connected to Suricata command socket {self.path}")
+
+    def _exchange(self, message):
+        self.send(message)
+        return self._recv_message()
+
+    def send(self, message):
+        self.sock.sendall(json.dumps(message).encode('utf-8'))
+
+    def receive(self):
+        return self._recv_message()
+
+    def is_stale(self):
+        """Vrai si Suricata a fermé la connexion pendant qu'elle était inactive."""
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            return bool(readable) and not self.sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except OSError:
+            return True
+
+    def _recv_message(self):
+        """Lit jusqu'à obtenir un objet JSON complet et le retourne décodé."""
+        view = memoryview(self._recv_buffer)
+        while not self._pending:
+            received = self.sock.recv_into(self._recv_buffer)
+            if not received:
+                raise ConnectionError("Connection closed by Suricata")
+            self._pending.extend(self._decoder.feed(view[:received]))
+        return self._pending.pop(0)
+
+    def command(self, command_data):
+        """Envoie une commande et retourne la réponse décodée."""
+        return self._exchange(command_data)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class SuricataSocketPool:
+    """Pool de connexions persistantes vers un socket de commande Suricata.
+
+    timeout borne chaque opération sur le socket (None: aucune limite, comme
+    un socket bloquant). Une commande qui expire après son envoi a pu être
+    exécutée par Suricata (un reload-rules long, par exemple).
+    """
+
+    def __init__(self, path, max_connections=4, timeout=None, max_message_size=DEFAULT_MAX_MESSAGE_SIZE):
+        self.path = path
+        self.timeout = timeout
+        self.max_message_size = max_message_size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def _acquire(self):
+        """Retourne (connexion, réutilisée?)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return SuricataConnection(self.path, self.timeout, self.max_message_size), False
+            if not conn.is_stale():
+                return conn, True
+            conn.close()
+
+    def execute(self, command_data):
+        """Exécute une commande et retourne la réponse JSON de Suricata.
+
+        Lève SuricataCommandError, ou OSError si le socket est injoignable.
+        """
+        with self._slots:
+            conn, reused = self._acquire()
+            try:
+                conn.send(command_data)
+            except OSError as e:
+                conn.close()
+                if not reused or isinstance(e, socket.timeout):
+                    raise
+                # Connexion périmée (Suricata redémarré) et commande non envoyée: la rejouer
+                logger.info(f"Stale connection to {self.path} ({e}), reconnecting")
+                conn = SuricataConnection(self.path, self.timeout, self.max_message_size)
+                try:
+                    conn.send(command_data)
+                except Exception:
+                    conn.close()
+                    raise
+            try:
+                response = conn.receive()
+            except Exception:
+                # Commande déjà envoyée: pas de rejeu
+                conn.close()
+                raise
+            self._idle.put(conn)
+            return response
+
+    def close(self):
+        """Ferme les connexions inactives."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class AsyncSuricataConnection:
+    """Équivalent asyncio de SuricataConnection (mode de service asyncio)."""
+
+    def __init__(self, path, reader, writer, max_message_size=DEFAULT_MAX_MESSAGE_SIZE):
+        self.path = path
+        self.reader = reader
+        self.writer = writer
+        self._decoder = JsonFrameDecoder(max_message_size)
+        self._pending = []
+
+    @classmethod
+    async def open(cls, path, max_message_size=DEFAULT_MAX_MESSAGE_SIZE):
+        reader, writer = await asyncio.open_unix_connection(path, limit=RECV_SIZE)
+        conn = cls(path, reader, writer, max_message_size)
+        try:
+            response = await conn.command({"version": PROTOCOL_VERSION})
+            if response.get('return') != 'OK':
+                raise SuricataCommandError(f"Version negotiation refused by Suricata: {response}")
+        except BaseException:
+            conn.close()
+            raise
+        logger.info(f"Connected to Suricata command socket {path} (asyncio)")
+        return conn
+
+    async def command(self, command_data):
+        """Envoie une commande et retourne la réponse décodée."""
+        await self.send(command_data)
+        return await self.receive()
+
+    async def send(self, command_data):
+        self.writer.write(json.dumps(command_data).encode('utf-8'))
+        await self.writer.drain()
+
+    def is_stale(self):
+        """Vrai si Suricata a fermé la connexion pendant qu'elle était inactive."""
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    async def receive(self):
+        while not self._pending:
+            data = await self.reader.read(RECV_SIZE)
+            if not data:
+                raise ConnectionError("Connection closed by Suricata")
+            self._pending.extend(self._decoder.feed(data))
+        return self._pending.pop(0)
+
+    def close(self):
+        try:
+            self.writer.close()
+        except (OSError, RuntimeError):
+            pass
+
+
+class AsyncSuricataSocketPool:
+    """Pool de connexions persistantes utilisable depuis des coroutines.
+
+    Même politique que SuricataSocketPool: une commande à la fois par
+    connexion, rejeu unique sur une connexion neuve seulement si l'envoi sur
+    une connexion réutilisée a échoué.
+    """
+
+    def __init__(self, path, max_connections=4, timeout=None, max_message_size=DEFAULT_MAX_MESSAGE_SIZE):
+        self.path = path
+        self.timeout = timeout
+        self.max_message_size = max_message_size
+        self.max_connections = max_connections
+        self._idle = []
+        self._slots = None
+
+    async def execute(self, command_data):
+        """Exécute une commande et retourne la réponse JSON de Suricata.
+
+        Lève SuricataCommandError, OSError, ou asyncio.TimeoutError après `timeout`
+        secondes (None: pas de limite).
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            return await asyncio.wait_for(self._execute(command_data), self.timeout)
+
+    async def _execute(self, command_data):
+        while self._idle and self._idle[-1].is_stale():
+            self._idle.pop().close()
+        reused = bool(self._idle)
+        conn = self._idle.pop() if reused else await AsyncSuricataConnection.open(self.path, self.max_message_size)
+        try:
+            await conn.send(command_data)
+        except OSError as e:
+            conn.close()
+            if not reused:
+                raise
+            # Connexion périmée (Suricata redémarré) et commande non envoyée: la rejouer
+            logger.info(f"Stale connection to {self.path} ({e}), reconnecting")
+            conn = await AsyncSuricataConnection.open(self.path, self.max_message_size)
+            try:
+                await conn.send(command_data)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            # Y compris l'annulation (timeout): l'état de la connexion est inconnu
+            conn.close()
+            raise
+        try:
+            response = await conn.receive()
+        except BaseException:
+            # Commande déjà envoyée: pas de rejeu
+            conn.close()
+            raise
+        self._idle.append(conn)
+        return response
+
+    def close(self):
+        """Ferme les connexions inactives."""
+        while self._idle:
+            self._idle.pop().close()